@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+圧縮コーデックの抽象化と適応的選択ポリシー
+- コーデック: none / zlib / zstd / zstd-dict（自前の会話コーパスで学習した辞書）
+- メッセージごとにコーデックタグを保存し、展開時はタグから復元
+- 小さいペイロードは圧縮しない、それ以外は実測した圧縮率とCPU時間で選択
+- 実測はサイズ帯（2の冪 + 使える候補の組）ごとに COMPRESSION_REMEASURE_EVERY 件に1回だけ行い、間のメッセージは
+  その帯の勝者で1回だけ圧縮する（全候補の実測は /analyze/compression の統計用）
+
+Codec tag format: ``name[:level][@dict_id]`` e.g. ``none``, ``zlib:6``,
+``zstd:3``, ``zstd-dict:3@1803449087``.
+"""
+
+import logging
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    import zstandard
+except ImportError:  # optional dependency: zstd codecs are skipped without it
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Redis keys for trained dictionaries
+DICTIONARY_HASH_KEY = "compression:dictionaries"   # dict_id -> raw dictionary bytes
+ACTIVE_DICTIONARY_KEY = "compression:dictionary:active"
+
+DEFAULT_CODEC_TAG = "zlib:6"   # bodies written before codec tags existed
+
+class CompressionCodec:
+    """Base codec: subclasses implement compress/decompress on bytes"""
+
+    name = "none"
+
+    def __init__(self, level: Optional[int] = None):
+        self.level = level
+
+    @property
+    def tag(self) -> str:
+        return self.name if self.level is None else f"{self.name}:{self.level}"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+class IdentityCodec(CompressionCodec):
+    """Stores the payload as-is (tiny or incompressible messages)"""
+
+    name = "none"
+
+    def __init__(self):
+        super().__init__(None)
+
+class ZlibCodec(CompressionCodec):
+    name = "zlib"
+
+    def __init__(self, level: int = 6):
+        super().__init__(level)
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+class ZstdCodec(CompressionCodec):
+    """
+    zstd at a fixed level
+
+    zstandard compressors and decompressors must not be used from several threads
+    at once, and codecs are shared (worker threads compress and enrich), so each
+    thread gets its own pair.
+    """
+
+    name = "zstd"
+
+    def __init__(self, level: int = 3):
+        if zstandard is None:
+            raise RuntimeError("zstandard is not installed")
+        super().__init__(level)
+        self._local = threading.local()
+
+    def _new_compressor(self):
+        return zstandard.ZstdCompressor(level=self.level)
+
+    def _new_decompressor(self):
+        return zstandard.ZstdDecompressor()
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = getattr(self._local, "compressor", None)
+        if compressor is None:
+            compressor = self._local.compressor = self._new_compressor()
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = getattr(self._local, "decompressor", None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = self._new_decompressor()
+        return decompressor.decompress(data)
+
+class ZstdDictCodec(ZstdCodec):
+    """zstd with a dictionary trained on our own stored messages"""
+
+    name = "zstd-dict"
+
+    def __init__(self, dictionary: bytes, level: int = 3):
+        super().__init__(level)
+        self.dictionary = dictionary
+        self._dict = zstandard.ZstdCompressionDict(dictionary)
+        self.dict_id = self._dict.dict_id()
+
+    @property
+    def tag(self) -> str:
+        return f"{self.name}:{self.level}@{self.dict_id}"
+
+    def _new_compressor(self):
+        return zstandard.ZstdCompressor(level=self.level, dict_data=self._dict)
+
+    def _new_decompressor(self):
+        return zstandard.ZstdDecompressor(dict_data=self._dict)
+
+@dataclass
+class CodecMeasurement:
+    """Result of trying one candidate codec"""
+    codec: str
+    compressed_length: int
+    compression_ratio: float
+    compress_ms: float
+
+@dataclass
+class CompressionResult:
+    data: bytes
+    codec: str
+    original_length: int
+    compressed_length: int
+    compression_ratio: float
+    candidates: List[CodecMeasurement] = field(default_factory=list)
+
+def parse_codec_tag(tag: str):
+    """Split a codec tag into (name, level, dict_id)"""
+    tag, _, dict_id = tag.partition("@")
+    name, _, level = tag.partition(":")
+    return name, (int(level) if level else None), (int(dict_id) if dict_id else None)
+
+def train_dictionary(samples: List[bytes], dict_size: int = 112 * 1024) -> bytes:
+    """Train a zstd dictionary from message bodies (needs a few hundred samples)"""
+    if zstandard is None:
+        raise RuntimeError("zstandard is not installed")
+    samples = [sample for sample in samples if sample]
+    if len(samples) < 10:
+        raise ValueError(f"Need at least 10 non-empty samples to train a dictionary, got {len(samples)}")
+    return zstandard.train_dictionary(dict_size, samples).as_bytes()
+
+class CodecRegistry:
+    """
+    Resolves codec tags and owns the adaptive compression policy
+    - Payloads below min_size are stored uncompressed (zlib inflates short chat messages),
+      except that a trained dictionary is still tried down to dict_min_size
+    - Larger payloads: each candidate compresses a leading sample, and the codec with the
+      lowest ratio + cpu_weight * (ms per MB) wins; identity wins if nothing saves space
+    - The winner is remembered per size bucket (power of two, the active dictionary and the allowed
+      candidates) and reused for the next remeasure_every payloads of that bucket, so most writes
+      compress once
+    Dictionaries are registered by the managers, which load them from Redis. The registry is
+    shared by the event loop and worker threads, so its caches are updated under a lock.
+    """
+
+    def __init__(self, candidates: Optional[List[str]] = None, min_size: int = 200,
+                 dict_min_size: int = 48, sample_size: int = 16 * 1024, cpu_weight: float = 0.0005,
+                 remeasure_every: int = 64):
+        self.min_size = min_size
+        self.dict_min_size = dict_min_size
+        self.sample_size = sample_size
+        self.cpu_weight = cpu_weight
+        self.remeasure_every = remeasure_every
+        self._lock = threading.Lock()
+        # (size bucket, active dictionary, allowed tags) -> [winning tag, payloads compressed with it since measured]
+        self._choices: Dict[Tuple[int, Optional[int], Tuple[str, ...]], list] = {}
+        self.dictionaries: Dict[int, ZstdDictCodec] = {}
+        self.active_dict_id: Optional[int] = None
+        self._codecs: Dict[str, CompressionCodec] = {}
+        self.candidate_tags = [tag for tag in (candidates or self.default_candidates()) if self._available(tag)]
+
+    @classmethod
+    def from_env(cls) -> "CodecRegistry":
+        """Build from COMPRESSION_CODECS / COMPRESSION_MIN_SIZE / COMPRESSION_DICT_MIN_SIZE / COMPRESSION_CPU_WEIGHT"""
+        candidates = os.getenv('COMPRESSION_CODECS')
+        return cls(
+            candidates=[tag.strip() for tag in candidates.split(',') if tag.strip()] if candidates else None,
+            min_size=int(os.getenv('COMPRESSION_MIN_SIZE', 200)),
+            dict_min_size=int(os.getenv('COMPRESSION_DICT_MIN_SIZE', 48)),
+            cpu_weight=float(os.getenv('COMPRESSION_CPU_WEIGHT', 0.0005)),
+            remeasure_every=int(os.getenv('COMPRESSION_REMEASURE_EVERY', 64))
+        )
+
+    @staticmethod
+    def default_candidates() -> List[str]:
+        if zstandard is None:
+            return ["zlib:1", "zlib:6"]
+        return ["zlib:6", "zstd:3", "zstd:9", "zstd-dict:3"]
+
+    @staticmethod
+    def _available(tag: str) -> bool:
+        name = parse_codec_tag(tag)[0]
+        if name in ("zstd", "zstd-dict") and zstandard is None:
+            logger.warning(f"Codec {tag} disabled: zstandard is not installed")
+            return False
+        return name in ("none", "zlib", "zstd", "zstd-dict")
+
+    # --- dictionaries ---
+
+    def add_dictionary(self, dictionary: bytes, activate: bool = False) -> int:
+        codec = ZstdDictCodec(dictionary)
+        with self._lock:
+            self.dictionaries[codec.dict_id] = codec
+            if activate:
+                self.active_dict_id = codec.dict_id
+        return codec.dict_id
+
+    def missing_dictionaries(self, tags: Iterable[str]) -> Set[int]:
+        """Dictionary ids referenced by tags that are not loaded yet"""
+        missing = set()
+        for tag in tags:
+            dict_id = parse_codec_tag(tag)[2]
+            if dict_id is not None and dict_id not in self.dictionaries:
+                missing.add(dict_id)
+        return missing
+
+    # --- codec resolution ---
+
+    def get(self, tag: str) -> CompressionCodec:
+        """Codec for a stored tag (or a candidate tag like ``zstd-dict:3``)"""
+        name, level, dict_id = parse_codec_tag(tag)
+        if name == "zstd-dict":
+            dict_id = dict_id if dict_id is not None else self.active_dict_id
+            if dict_id not in self.dictionaries:
+                raise KeyError(f"zstd dictionary {dict_id} is not loaded")
+            tag = f"zstd-dict:{level or 3}@{dict_id}"
+
+        with self._lock:
+            codec = self._codecs.get(tag)
+            if codec is None:
+                codec = self._codecs[tag] = self._build(tag, name, level, dict_id)
+        return codec
+
+    def _build(self, tag: str, name: str, level: Optional[int], dict_id: Optional[int]) -> CompressionCodec:
+        """New codec instance for a tag not cached yet (called under the lock)"""
+        if name == "none":
+            return IdentityCodec()
+        if name == "zlib":
+            return ZlibCodec(level if level is not None else 6)
+        if name == "zstd":
+            return ZstdCodec(level if level is not None else 3)
+        if name == "zstd-dict":
+            codec = self.dictionaries[dict_id]
+            if level is not None and level != codec.level:
+                codec = ZstdDictCodec(codec.dictionary, level)
+            return codec
+        raise KeyError(f"Unknown codec: {tag}")
+
+    def _active_candidates(self, small: bool = False) -> List[str]:
+        """Candidates usable now; for payloads below min_size only dictionary codecs"""
+        return [
+            tag for tag in self.candidate_tags
+            if (parse_codec_tag(tag)[0] != "zstd-dict" and not small)
+            or (parse_codec_tag(tag)[0] == "zstd-dict" and self.active_dict_id is not None)
+        ]
+
+    # --- compress / decompress ---
+
+    def measure(self, data: bytes, tags: Optional[List[str]] = None) -> List[CodecMeasurement]:
+        """Compress data with each candidate and report size and time"""
+        measurements = []
+        for tag in tags or self._active_candidates():
+            codec = self.get(tag)
+            started = time.perf_counter()
+            compressed_length = len(codec.compress(data))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            measurements.append(CodecMeasurement(
+                codec=codec.tag,
+                compressed_length=compressed_length,
+                compression_ratio=compressed_length / len(data) if data else 1.0,
+                compress_ms=round(elapsed_ms, 4)
+            ))
+        return measurements
+
+    def _cost(self, measurement: CodecMeasurement, sample_length: int) -> float:
+        ms_per_mb = measurement.compress_ms * (1024 * 1024) / max(sample_length, 1)
+        return measurement.compression_ratio + self.cpu_weight * ms_per_mb
+
+    def _choose(self, data: bytes, tags: List[str], measure: bool) -> Tuple[str, List[CodecMeasurement]]:
+        """Codec tag for data: its size bucket's remembered winner, or measured (and remembered)"""
+        # the allowed tags are part of the key: payloads below min_size share a bit length with
+        # larger ones but may only use dictionary codecs
+        bucket = (len(data).bit_length(), self.active_dict_id, tuple(tags))
+        with self._lock:
+            choice = self._choices.get(bucket)
+            if choice is not None and choice[1] < self.remeasure_every and not measure:
+                choice[1] += 1
+                return choice[0], []
+
+        sample = data[:self.sample_size]
+        candidates = self.measure(sample, tags)
+        best = min(candidates, key=lambda m: self._cost(m, len(sample)), default=None)
+        tag = IdentityCodec().tag if best is None or best.compression_ratio >= 1.0 else best.codec
+        with self._lock:
+            self._choices[bucket] = [tag, 1]
+        return tag, candidates
+
+    def compress(self, data: bytes, measure: bool = False) -> CompressionResult:
+        """Compress with the adaptive policy; measure=True always measures every candidate (reported in candidates)"""
+        original_length = len(data)
+        small = original_length < self.min_size
+        tags = self._active_candidates(small)
+        if not tags or original_length < self.dict_min_size:
+            return CompressionResult(data, IdentityCodec().tag, original_length, original_length, 1.0)
+
+        tag, candidates = self._choose(data, tags, measure)
+        if tag == IdentityCodec().tag:
+            return CompressionResult(data, tag, original_length, original_length, 1.0, candidates)
+
+        codec = self.get(tag)
+        compressed = codec.compress(data)
+        if len(compressed) >= original_length:
+            return CompressionResult(data, IdentityCodec().tag, original_length, original_length, 1.0, candidates)
+
+        return CompressionResult(
+            data=compressed,
+            codec=codec.tag,
+            original_length=original_length,
+            compressed_length=len(compressed),
+            compression_ratio=len(compressed) / original_length,
+            candidates=candidates
+        )
+
+    def decompress(self, tag: Optional[str], data: bytes) -> bytes:
+        return self.get(tag or DEFAULT_CODEC_TAG).decompress(data)
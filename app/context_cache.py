@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+会話コンテキストのバージョン付きキャッシュ
+- get_conversation_context / export_for_ai_context の結果を（世代タグ, limit, detail_level, format_type, token_budget）で保持
+- メッセージ保存・知見保存・エンリッチメント完了時に Redis の世代カウンタ（context:version の generation）が進み、古い結果は自動的に無効
+- 世代タグは「エポック:世代:日付」。エポックは同じハッシュに置くランダム値で、FLUSHDB・再起動・追い出しで
+  カウンタが 0 から数え直しても古いエントリと一致しない（ABA 防止）
+- 日付（集計窓の基準日）を含めるため、書き込みが無くても日付が変わると直近 N 日の集計・当日セッションを読み直す
+- memory: プロセス内 LRU / redis: 複数 uvicorn ワーカーで共有（context:cache:* ハッシュ、TTL付き） / off: 無効
+"""
+
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+CONTEXT_CACHE_MODES = ("memory", "redis", "off")
+CONTEXT_CACHE_KEY_PREFIX = "context:cache:"
+
+class ContextCache:
+    """
+    Context results keyed by (limit, detail_level, format_type, token_budget) and tagged with a generation
+
+    The generation counter lives in Redis in every mode, so a write from any
+    process invalidates every cache. The manager reads the epoch:generation:day tag
+    (and, in redis mode, the cached entry in the same pipeline) and asks the cache
+    whether the entry still matches; a stale entry is simply overwritten on the
+    next store. A None tag (no epoch in Redis yet) never matches.
+    """
+
+    def __init__(self, mode: str = "memory", max_entries: int = 64, ttl: int = 300):
+        if mode not in CONTEXT_CACHE_MODES:
+            raise ValueError(f"Unknown context cache mode: {mode} (expected one of {CONTEXT_CACHE_MODES})")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[str, Any]]" = OrderedDict()
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "ContextCache":
+        """Build from CONTEXT_CACHE_MODE / CONTEXT_CACHE_MAX_ENTRIES / CONTEXT_CACHE_TTL"""
+        return cls(
+            mode=os.getenv('CONTEXT_CACHE_MODE', 'memory'),
+            max_entries=int(os.getenv('CONTEXT_CACHE_MAX_ENTRIES', 64)),
+            ttl=int(os.getenv('CONTEXT_CACHE_TTL', 300))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    @staticmethod
+    def key(limit: int, detail_level: str, format_type: Optional[str], token_budget: Optional[int] = None) -> str:
+        """Cache key; format_type None is the raw context dict"""
+        key = f"{CONTEXT_CACHE_KEY_PREFIX}{limit}:{detail_level}:{format_type or 'raw'}"
+        return key if token_budget is None else f"{key}:{token_budget}"
+
+    def queue_read(self, pipe, key: str) -> None:
+        """Queue the shared entry read next to the generation read (redis mode only)"""
+        if self.mode == "redis":
+            pipe.hmget(key, ["generation", "payload"])
+
+    def lookup(self, key: str, generation: Optional[str], shared_entry: Optional[List[Any]] = None) -> Optional[Any]:
+        """Cached result for key at this generation tag, or None (counted as a miss)"""
+        if generation is None:
+            result = None
+        elif self.mode == "redis":
+            cached_generation, payload = shared_entry or (None, None)
+            result = json.loads(payload) if payload is not None and cached_generation == generation else None
+        else:
+            cached = self._entries.get(key)
+            result = None
+            if cached is not None and cached[0] == generation:
+                self._entries.move_to_end(key)
+                result = cached[1]
+
+        self.counters["hits" if result is not None else "misses"] += 1
+        return result
+
+    def store(self, pipe, key: str, generation: str, result: Any) -> bool:
+        """Remember result; in redis mode the write is queued on pipe (returns whether it was)"""
+        self.counters["stores"] += 1
+        if self.mode == "redis":
+            pipe.hset(key, mapping={"generation": generation, "payload": json.dumps(result, ensure_ascii=False)})
+            pipe.expire(key, self.ttl)
+            return True
+
+        self._entries[key] = (generation, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries) if self.mode == "memory" else None,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            **self.counters
+        }
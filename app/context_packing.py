@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+トークン予算によるコンテキストのパッキング
+- 各メッセージの表現（短い要約 / 中程度の要約 / 本文）ごとのトークン推定値は書き込み時に保存（tokens_short / tokens_medium / tokens_full）
+- 読み出し時は保存済みの推定値だけで表現を選択（再トークナイズなし）
+- 新しいメッセージほど重い重み（半減期 RECENCY_HALF_LIFE 件）を付けた情報量を、予算内で最大化する多肢選択ナップサックを貪欲法で解く
+"""
+
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+# Information credited to each representation (source name as used by _context_source)
+REPRESENTATION_INFORMATION = {'summary_short': 1.0, 'summary_medium': 2.0, 'body': 3.0}
+# A message's weight halves every RECENCY_HALF_LIFE timeline positions
+RECENCY_HALF_LIFE = 10
+# Role, timestamp, topics and other metadata rendered with every packed message
+MESSAGE_OVERHEAD_TOKENS = 16
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap tokenizer-free estimate: one token per non-ASCII character (CJK text tokenizes
+    at roughly a character per token) plus one per four ASCII characters
+    """
+    if not text:
+        return 0
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+def token_estimates(content: str, summary_short: str, summary_medium: str) -> Dict[str, int]:
+    """tokens_* hash fields; a missing summary renders the body, so it costs as much"""
+    tokens_full = estimate_tokens(content)
+    return {
+        'tokens_short': estimate_tokens(summary_short) if summary_short else tokens_full,
+        'tokens_medium': estimate_tokens(summary_medium) if summary_medium else tokens_full,
+        'tokens_full': tokens_full
+    }
+
+def _upgrade_path(options: List[Tuple[str, int, float]]) -> List[Tuple[str, int, float]]:
+    """
+    Representations worth upgrading through, cheapest first: the upper concave hull of
+    (tokens, information) starting from "not included", so each upgrade buys less
+    information per token than the one before and greedy selection stays sound
+    """
+    best: Dict[int, Tuple[str, int, float]] = {}
+    for source, cost, value in options:
+        if cost not in best or value > best[cost][2]:
+            best[cost] = (source, cost, value)
+
+    hull: List[Tuple[str, int, float]] = []
+    for point in sorted(best.values(), key=lambda option: option[1]):
+        if hull and point[2] <= hull[-1][2]:
+            continue  # costs more, informs no more
+        while hull:
+            base_cost, base_value = (hull[-2][1], hull[-2][2]) if len(hull) > 1 else (0, 0.0)
+            last = hull[-1]
+            if (last[2] - base_value) * (point[1] - base_cost) > (point[2] - base_value) * (last[1] - base_cost):
+                break
+            hull.pop()
+        hull.append(point)
+    return hull
+
+def pack_by_budget(costs: List[Dict[str, int]], token_budget: int) -> Tuple[List[Optional[str]], int]:
+    """
+    Choose a representation per message (newest first) within token_budget
+
+    costs[i] maps each representation to its estimated tokens. Returns the chosen
+    source per message (None = left out) and the tokens spent.
+    """
+    paths = []
+    heap: List[Tuple[float, int, int]] = []
+    for position, message_costs in enumerate(costs):
+        weight = 0.5 ** (position / RECENCY_HALF_LIFE)
+        path = _upgrade_path([
+            (source, tokens + MESSAGE_OVERHEAD_TOKENS, weight * REPRESENTATION_INFORMATION[source])
+            for source, tokens in message_costs.items()
+        ])
+        paths.append(path)
+        if path:
+            heapq.heappush(heap, (-path[0][2] / path[0][1], position, 0))
+
+    chosen: List[Optional[str]] = [None] * len(costs)
+    spent = 0
+    while heap:
+        _, position, step = heapq.heappop(heap)
+        path = paths[position]
+        previous_cost, previous_value = (path[step - 1][1], path[step - 1][2]) if step else (0, 0.0)
+        source, cost, value = path[step]
+        if spent + cost - previous_cost > token_budget:
+            continue  # this message stays at its current representation
+        spent += cost - previous_cost
+        chosen[position] = source
+        if step + 1 < len(path):
+            next_source, next_cost, next_value = path[step + 1]
+            heapq.heappush(heap, (-(next_value - value) / (next_cost - cost), position, step + 1))
+    return chosen, spent
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+会話コンテキストのレンダラー（取得 → 集計 → 描画 の描画段）
+- 集計済みのコンテキスト（get_conversation_context の結果）を Redis に触れずに文字列化
+- structured: 整形JSON / narrative: AI向けの要約文 / bullet: 箇条書きの一覧
+- 文字列は ContextWriter（io.StringIO）へ逐次書き込み、リストの join や本文の再スライスを避ける
+- bullet はストリーム（stream_conversation_context のイベント）からも1行ずつ描画可能
+- 未知の format_type は ValueError（API では 400）。別の形式に黙って切り替えない
+"""
+
+import io
+import json
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, List
+
+PREVIEW_CHARS = 200
+
+class ContextWriter:
+    """
+    Streaming string builder for renderers
+
+    Lines are separated (not terminated) by newlines, so the output matches
+    "\\n".join(lines). clip() writes at most limit characters of a text without
+    copying the rest of it.
+    """
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+        self._started = False
+
+    @property
+    def stream(self) -> io.StringIO:
+        """The underlying buffer, for writers such as json.dump"""
+        self._started = True
+        return self._buffer
+
+    def line(self, *parts: str) -> "ContextWriter":
+        if self._started:
+            self._buffer.write("\n")
+        self._started = True
+        for part in parts:
+            self._buffer.write(part)
+        return self
+
+    def section(self, title: str) -> "ContextWriter":
+        return self.line("\n### ", title, ":")
+
+    def write(self, text: str) -> "ContextWriter":
+        """Append to the current line"""
+        self._buffer.write(text)
+        return self
+
+    def clip(self, text: str, limit: int = PREVIEW_CHARS) -> "ContextWriter":
+        self._buffer.write(text if len(text) <= limit else text[:limit])
+        return self
+
+    def getvalue(self) -> str:
+        return self._buffer.getvalue()
+
+def _recent_user_messages(messages: List[Dict[str, Any]], window: int = 10, count: int = 3) -> List[Dict[str, Any]]:
+    """The last count user messages among the last window entries, in list order"""
+    picked = []
+    for index in range(len(messages) - 1, max(len(messages) - window, 0) - 1, -1):
+        if messages[index]['role'] == 'user':
+            picked.append(messages[index])
+            if len(picked) == count:
+                break
+    picked.reverse()
+    return picked
+
+def _counted(out: ContextWriter, pairs: Iterable, limit: int = 5) -> None:
+    for name, count in islice(pairs, limit):
+        out.line("- ", str(name), " (", str(count), "回)")
+
+def render_structured(context: Dict[str, Any], out: ContextWriter) -> None:
+    json.dump(context, out.stream, indent=2, ensure_ascii=False)
+
+def render_narrative(context: Dict[str, Any], out: ContextWriter) -> None:
+    """
+    Enhanced narrative summary for AI
+    【優先度3解決】: AI文脈理解の大幅改善
+    """
+    out.line("## 会話履歴の要約")
+    out.line(f"総メッセージ数: {context['total_messages']}")
+
+    total_saved = context.get('compression_stats', {}).get('total_bytes_saved', 0)
+    if total_saved > 0:
+        out.line(f"圧縮効率: {total_saved:,} bytes saved")
+
+    if context['frequent_topics']:
+        out.section("頻出トピック")
+        _counted(out, context['frequent_topics'])
+
+    if context.get('technical_terms'):
+        out.section("技術用語")
+        _counted(out, context['technical_terms'])
+
+    if context['key_insights']:
+        out.section("重要な知見")
+        for insight in islice(context['key_insights'], 3):
+            out.line("- [", insight['type'], "] ")
+            if 'summary' in insight:
+                out.write(insight['summary'])
+            else:
+                out.clip(insight['content'])
+            out.write("...")
+            for action in islice(insight.get('actionable_items') or (), 2):
+                out.line("  • アクション: ", action)
+
+    out.section("最近の会話傾向")
+    recent_user_msgs = _recent_user_messages(context['recent_messages'])
+    if recent_user_msgs:
+        out.line("ユーザーは以下の領域に関心を示している:")
+        for msg in recent_user_msgs:
+            out.line("- ").clip(msg['content']).write("...")
+            # Add key points if available
+            for point in islice(msg.get('key_points') or (), 2):
+                out.line("  • ", point)
+
+def write_bullet_header(context: Dict[str, Any], out: ContextWriter) -> None:
+    """Title, aggregates and insights; context may also be a stream header event"""
+    detail_level = context.get('compression_stats', {}).get('detail_level_used', '')
+    out.line(f"## 会話コンテキスト (総メッセージ数: {context['total_messages']}, {detail_level})")
+
+    for title, key in (("頻出トピック", 'frequent_topics'), ("キーワード", 'frequent_keywords'),
+                       ("技術用語", 'technical_terms')):
+        pairs = context.get(key) or []
+        if pairs:
+            out.line("- ", title, ": ", ", ".join(f"{name} ({count})" for name, count in islice(pairs, 5)))
+
+    if context['key_insights']:
+        out.line("- 重要な知見:")
+        for insight in islice(context['key_insights'], 3):
+            out.line("  - [", insight['type'], "] ").clip(insight.get('summary') or insight['content'])
+
+    out.line("- メッセージ:")
+
+def write_bullet_message(msg: Dict[str, Any], out: ContextWriter) -> None:
+    out.line("  - [", msg['role'], " ", msg['timestamp'], "] ").clip(msg['content'])
+    if len(msg['content']) > PREVIEW_CHARS:
+        out.write("…")
+
+def render_bullet(context: Dict[str, Any], out: ContextWriter) -> None:
+    """One bullet per aggregate and per message (newest first), content clipped to PREVIEW_CHARS"""
+    write_bullet_header(context, out)
+    for msg in context['recent_messages']:
+        write_bullet_message(msg, out)
+
+def bullet_event(event: Dict[str, Any]) -> str:
+    """Newline-terminated bullet text for one context stream event ('' for events without any)"""
+    out = ContextWriter()
+    if event['type'] == 'context':
+        write_bullet_header(event, out)
+    elif event['type'] == 'message':
+        write_bullet_message(event, out)
+    else:
+        return ""
+    return out.write("\n").getvalue()
+
+CONTEXT_RENDERERS: Dict[str, Callable[[Dict[str, Any], ContextWriter], None]] = {
+    "structured": render_structured,
+    "narrative": render_narrative,
+    "bullet": render_bullet,
+}
+
+def check_format_type(format_type: str) -> None:
+    """Raise ValueError for a format_type without a renderer"""
+    if format_type not in CONTEXT_RENDERERS:
+        raise ValueError(f"Unknown format_type: {format_type} (expected one of {tuple(CONTEXT_RENDERERS)})")
+
+def render_context(context: Dict[str, Any], format_type: str) -> str:
+    """Render an assembled context payload with the format_type renderer (ValueError if unknown)"""
+    check_format_type(format_type)
+    out = ContextWriter()
+    CONTEXT_RENDERERS[format_type](context, out)
+    return out.getvalue()
@@ -6,21 +6,52 @@
 - 優先度3: AI文脈理解制限（C1） - 多層構造による高精度文脈提供
 """
 
+import asyncio
 import base64
 import datetime
 import hashlib
 import json
 import logging
-import re
+import math
+import os
 import zlib
-from dataclasses import asdict, dataclass
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from itertools import islice
 # load .env with explicit path
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
 import redis
+import redis.asyncio
+from compression_codecs import (ACTIVE_DICTIONARY_KEY, DEFAULT_CODEC_TAG,
+                                DICTIONARY_HASH_KEY, CodecMeasurement,
+                                CodecRegistry, CompressionResult,
+                                train_dictionary)
+from context_packing import estimate_tokens, pack_by_budget, token_estimates
+from context_renderers import bullet_event, render_context
 from dotenv import load_dotenv
+from fulltext import (BM25_B, BM25_K1, BM25_MAX_DF, BM25_SCAN_LIMIT,
+                      FULLTEXT_BACKFILL_KEY, FULLTEXT_INDEX,
+                      FULLTEXT_TOKENIZER_VERSION,
+                      SUMMARY_BACKFILL_KEY, SUMMARY_FIELDS, SUMMARY_INDEX,
+                      TextIndex, index_terms, query_terms, summary_text)
+from redis_scripts import (CLAIM_ENRICHMENT_SCRIPT, FULLTEXT_SEARCH_SCRIPT,
+                           INCREMENT_FREQUENCIES_SCRIPT, SAVE_MESSAGES_SCRIPT)
+from search_cache import SEARCH_EPOCH_FIELD, SEARCH_GENERATIONS_KEY, SearchHits
+from search_query import (QueryPlan, canonical_query, compile_query,
+                          parse_query, query_term_values, terms_query)
+from text_analyzer import (MEDIUM_SUMMARY_DELIMITERS, SHORT_SUMMARY_DELIMITERS,
+                           TextAnalysis, analyze_text, split_sentences)
+from vector_index import (VECTOR_BACKFILL_KEY, VECTOR_CHUNK_ROWS, VECTOR_DIM,
+                          VECTOR_IDS_KEY, VECTOR_MATRIX_KEY, VECTOR_META_KEY,
+                          VECTOR_REBUILD_LOCK_KEY, VECTOR_REBUILD_LOCK_TTL,
+                          VECTOR_STALE_RATIO, VECTOR_VERSION, VectorIndex,
+                          chunk_count, matrix_chunk_key, quantize,
+                          queue_row_appends, term_vector)
+from vocabulary import (VOCABULARY_KEYWORDS_KEY, VOCABULARY_TERMS_KEY,
+                        VOCABULARY_VERSION_KEY, Vocabulary, install_vocabulary)
 
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -29,14 +60,108 @@ load_dotenv(dotenv_path=env_path)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Storage format of message:{id} hashes
+# - v1: plain content only (pre-enhanced)
+# - v2: content + base64 compressed_content, summaries duplicated in message:{id}:summary
+# - v3: body stored once as raw compressed bytes in message:{id}:body, summaries only in the hash,
+#       compressed with the codec named by the hash's `codec` tag (zlib:6 when absent)
+STORAGE_FORMAT_VERSION = 3
+
+# Write-behind enrichment (ingest_mode="deferred"): the raw message is stored at once and
+# summaries, key points, technical terms and compression are filled in by enrichment workers
+INGEST_MODES = ("sync", "deferred")
+ENRICHMENT_QUEUE_KEY = "enrichment:queue"
+# In-flight jobs of one worker pool: enrichment:processing:{pool id}; the bare key is the
+# shared list of older pools and is always recovered
+ENRICHMENT_PROCESSING_KEY = "enrichment:processing"
+ENRICHMENT_DONE_CHANNEL = "enrichment:done:{}"
+# Set of live pool ids, each with a heartbeat key that expires when the pool dies
+ENRICHMENT_WORKERS_KEY = "enrichment:workers"
+ENRICHMENT_HEARTBEAT_KEY = "enrichment:heartbeat:{}"
+
+# Daily default session (session:{date}) lifetime
+SESSION_TTL_SECONDS = 86400
+# Per-session indexes, maintained by the save script so one conversation is a single range read:
+# - session:{id}:timeline   the session's message ids scored like messages:timeline
+# - session:{id}:stats      counters: messages, content_chars, stored_bytes (compressed bodies),
+#                           first_activity / last_activity (timeline scores)
+# - sessions:by_activity    session ids scored by last activity (session listings)
+# The unordered session:{id}:messages sets of earlier versions are converted by backfill_session_indexes
+SESSION_ACTIVITY_KEY = "sessions:by_activity"
+SESSION_BACKFILL_KEY = "sessions:backfilled"
+SESSION_COUNTER_FIELDS = ('messages', 'content_chars', 'stored_bytes')
+# Tag postings topic:{topic} / keyword:{keyword} / tech:{term} / role:{role}: message ids scored
+# like messages:timeline, so the newest messages with a tag are one ZREVRANGE. With TAG_POSTINGS_CAP
+# set, each key keeps only its newest N messages (older ones stay reachable through the timeline
+# and the full-text index), so tag-scope and boolean results are exact only within that window:
+# search_truncated reports when a posting a query reads is at the cap. The plain sets of earlier
+# versions are converted by backfill_tag_postings
+TAG_POSTINGS_CAP = int(os.getenv('TAG_POSTINGS_CAP', 0))
+TAG_POSTING_PREFIXES = ("topic:", "keyword:", "tech:", "role:")
+TAG_BACKFILL_KEY = "tags:backfilled"
+# Length of the analytics:word_counts / analytics:content_lengths history lists
+ANALYTICS_HISTORY_LENGTH = 1000
+
+# Hash {epoch, generation}: generation is bumped by every write that changes what context reads
+# return (saves, insights, enrichment, migration); epoch is a random nonce set by the first reader
+# (HSETNX). Cached context results are only served for the epoch:generation:day tag they were built at,
+# so a counter that restarts after FLUSHDB, a restart without persistence or eviction of this key
+# can never match an old entry again, and the rolling aggregates and today's session move on at
+# midnight without a write.
+CONTEXT_GENERATION_KEY = "context:version"
+
+# Topic / keyword / technical term frequencies, maintained at write time with ZINCRBY:
+# - freq:{kind}:all          all-time counts (/analytics)
+# - freq:{kind}:day:{date}   day buckets by message date, expiring once outside the window
+# - freq:{kind}:rolling      sum of the buckets of the last FREQUENCY_WINDOW_DAYS days (/context);
+#                            rebuilt with ZUNIONSTORE by the first reader of each day
+FREQUENCY_KINDS = {'topics': 'topics', 'keywords': 'keywords', 'technical_terms': 'tech'}
+FREQUENCY_WINDOW_DAYS = 7
+FREQUENCY_ROLLING_DAY_KEY = "freq:rolling:day"
+FREQUENCY_BACKFILL_KEY = "freq:backfilled"
+# Top-k returned per aggregate in context payloads
+FREQUENCY_TOP_K = {'frequent_topics': ('topics', 10), 'frequent_keywords': ('keywords', 15),
+                   'technical_terms': ('tech', 10)}
+
+# Hash fields read per message when building context (HMGET projection); summaries and
+# key points are added per timeline position, bodies are fetched separately only when rendered
+CONTEXT_BASE_FIELDS = (
+    'role', 'timestamp', 'topics', 'keywords', 'content_length',
+    'compression_ratio', 'format_version', 'codec', 'enrichment_status'
+)
+# With a token_budget every message is read with both summaries and their stored token
+# estimates, and packing picks the representation per message instead of per position
+TOKEN_BUDGET_LEVEL = "token_budget"
+TOKEN_BUDGET_FIELDS = ('summary_short', 'summary_medium', 'tokens_short', 'tokens_medium', 'tokens_full')
+REPRESENTATION_NAMES = {'body': 'full', 'summary_medium': 'medium', 'summary_short': 'short'}
+# Messages hydrated per pipelined round trip by the stream_* methods (bounds their memory)
+STREAM_CHUNK_SIZE = 25
+# Search scopes ranked by BM25 over a text index (the others match tag postings, newest first)
+RANKED_SEARCH_SCOPES = {'fulltext': FULLTEXT_INDEX, 'summaries': SUMMARY_INDEX}
+# Cosine similarity of hashed term vectors (vector_index.py); query_terms are joined into one text
+VECTOR_SEARCH_SCOPE = "similar"
+# Hash fields of a summary-scope search hit (HMGET projection; the body is not read)
+SUMMARY_RESULT_FIELDS = ('role', 'timestamp', *SUMMARY_FIELDS, 'technical_terms', 'topics', 'keywords')
+# Timeline pages (get_timeline_page): projected hash fields, decoded by type; "content" is the body
+TIMELINE_DEFAULT_FIELDS = ('role', 'timestamp', 'session_id', 'topics', 'keywords', 'summary_short')
+TIMELINE_ORDERS = ("asc", "desc")
+MESSAGE_JSON_FIELDS = ('topics', 'keywords', 'key_points', 'technical_terms')
+MESSAGE_INT_FIELDS = ('content_length', 'compressed_length', 'format_version',
+                      'tokens_short', 'tokens_medium', 'tokens_full')
+MESSAGE_FLOAT_FIELDS = ('compression_ratio',)
+INSIGHT_SUMMARY_FIELDS = (
+    'insight_type', 'content', 'summary', 'business_area', 'relevance_score',
+    'impact_level', 'actionable_items', 'source_messages'
+)
+
 @dataclass
 class ConversationMessage:
     """Enhanced conversation message with compression support"""
     id: str
     timestamp: str
     role: str
-    content: str
-    compressed_content: str  # zlib compressed version
+    content: str             # in-memory only; persisted as compressed_content
+    compressed_content: bytes  # raw codec output (stored in message:{id}:body)
     summary_short: str       # 100-150 chars
     summary_medium: str      # 300-400 chars
     key_points: List[str]    # Bullet points of key information
@@ -47,6 +172,12 @@ class ConversationMessage:
     session_id: str
     content_length: int
     compression_ratio: float
+    codec: str = DEFAULT_CODEC_TAG
+    enrichment_status: str = "done"  # pending / done / failed
+    format_version: int = STORAGE_FORMAT_VERSION
+    tokens_short: int = 0    # estimated tokens per representation (context_packing.token_estimates)
+    tokens_medium: int = 0
+    tokens_full: int = 0
 
 @dataclass 
 class ConversationInsight:
@@ -62,12 +193,26 @@ class ConversationInsight:
     impact_level: str
     actionable_items: List[str]
 
+@dataclass
+class ContextSnapshot:
+    """Everything read from Redis for one context payload (fetch stage output)"""
+    detail_level: str
+    hydrated: List[Tuple[str, Dict[str, str]]]  # (message id, projected hash) in timeline order
+    bodies: Dict[str, str]
+    top_insights: List[Dict]
+    total_saved: int
+    total_messages: int
+    aggregates: Dict[str, List[Tuple[str, int]]]
+    retrieval_stats: Dict[str, int]
+    sources: Optional[List[Optional[str]]] = None  # token_budget packing: representation per message
+    packing: Optional[Dict[str, Any]] = None
+
 class SmartTextProcessor:
     """Intelligent text processing for compression and summarization"""
     
     @staticmethod
     def compress_text(text: str) -> Tuple[str, float]:
-        """Compress text using zlib and return compression ratio"""
+        """Compress text using zlib and return compression ratio (v2 base64 format)"""
         if not text:
             return "", 1.0
             
@@ -79,7 +224,7 @@ class SmartTextProcessor:
     
     @staticmethod
     def decompress_text(compressed_b64: str) -> str:
-        """Decompress zlib compressed text"""
+        """Decompress zlib compressed text (v2 base64 format)"""
         if not compressed_b64:
             return ""
         try:
@@ -90,14 +235,17 @@ class SmartTextProcessor:
             return ""
     
     @staticmethod
-    def generate_summary_short(text: str) -> str:
+    def generate_summary_short(text: str, analysis: Optional[TextAnalysis] = None) -> str:
         """Generate 100-150 character summary preserving key information"""
         if len(text) <= 150:
             return text
             
-        # Extract first meaningful sentence or key phrase
-        sentences = re.split(r'[.。!！?？\n]', text)
-        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+        # Extract first meaningful sentence or key phrase (a plain split when called on its own)
+        if analysis:
+            sentences = [s for _, s in analysis.sentences(SHORT_SUMMARY_DELIMITERS)]
+        else:
+            sentences = split_sentences(text, SHORT_SUMMARY_DELIMITERS)
+        meaningful_sentences = [s for s in sentences if len(s) > 20]
         
         if meaningful_sentences:
             summary = meaningful_sentences[0]
@@ -128,13 +276,13 @@ class SmartTextProcessor:
         return summary
     
     @staticmethod
-    def generate_summary_medium(text: str) -> str:
+    def generate_summary_medium(text: str, analysis: Optional[TextAnalysis] = None) -> str:
         """Generate 300-400 character summary with key technical details"""
         if len(text) <= 400:
             return text
             
-        sentences = re.split(r'[.。!！?？]', text)
-        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
+        analysis = analysis or analyze_text(text)
+        meaningful_sentences = [s for _, s in analysis.sentences(MEDIUM_SUMMARY_DELIMITERS) if len(s) > 10]
         
         summary = ""
         
@@ -145,158 +293,159 @@ class SmartTextProcessor:
             else:
                 break
         
-        # Second pass: extract technical terms and key information
-        remaining_text = text[len(summary):]
-        
-        # Extract technical terms
-        tech_patterns = [
-            r'\b[A-Z][a-z]*[A-Z][a-zA-Z]*\b',  # CamelCase (React, PostgreSQL)
-            r'\b[A-Z]{2,}\b',                   # Acronyms (API, SQL, HTTP)
-            r'\b\w+\.[a-z]+\b',                # File extensions
-            r'(?:Docker|Kubernetes|Redis|PostgreSQL|MySQL|MongoDB|AWS|Azure|GCP|GoogleCloud|Terraform|FastAPI|React|Vue|Angular)',
-            r'(?:システム|データベース|サーバー|API|エラー|実装|設定|最適化|解決)'
-        ]
-        
-        tech_terms = set()
-        for pattern in tech_patterns:
-            matches = re.findall(pattern, remaining_text, re.IGNORECASE)
-            tech_terms.update(matches[:5])  # Limit to 5 most important terms
+        # Second pass: technical terms from the text not covered by the summary
+        tech_terms = analysis.technical_terms(limit=3, offset=len(summary))
         
         # Add technical information if space allows
         if tech_terms and len(summary) < 350:
-            tech_info = " [技術要素: " + ", ".join(list(tech_terms)[:3]) + "]"
+            tech_info = " [技術要素: " + ", ".join(tech_terms) + "]"
             if len(summary + tech_info) <= 400:
                 summary += tech_info
         
         return summary if summary else text[:397] + "..."
     
     @staticmethod
-    def extract_key_points(text: str) -> List[str]:
+    def extract_key_points(text: str, analysis: Optional[TextAnalysis] = None) -> List[str]:
         """Extract key points as bullet points with intelligent analysis"""
-        points = []
-        
-        # Look for explicit numbered lists
-        numbered_items = re.findall(r'(?:^|\n)\s*[0-9]+\.\s*([^.。\n]+[.。]?)', text, re.MULTILINE)
-        points.extend([item.strip() for item in numbered_items[:5]])
-        
-        # Look for bullet points
-        bullet_patterns = [
-            r'(?:^|\n)\s*[•\-\*]\s*([^.。\n]+)',
-            r'(?:^|\n)\s*-\s+([^.。\n]+)',
-            r'(?:^|\n)\s*\*\s+([^.。\n]+)'
-        ]
+        analysis = analysis or analyze_text(text)
         
-        for pattern in bullet_patterns:
-            bullet_items = re.findall(pattern, text, re.MULTILINE)
-            points.extend([item.strip() for item in bullet_items[:3]])
+        # Explicit numbered lists, then bullet points
+        points = analysis.numbered_items[:5] + analysis.bullet_items[:3]
         
-        # Extract sentences with important keywords (technical focus)
-        important_keywords = [
-            '実装', '解決', '課題', '改善', '最適化', '設計', 'エラー', '修正',
-            '構築', '開発', '導入', '設定', '統合', 'デプロイ', 'システム',
-            'データベース', 'API', 'フレームワーク', 'インフラ', 'セキュリティ'
-        ]
-        
-        sentences = re.split(r'[.。!！]', text)
-        for sentence in sentences:
-            if any(keyword in sentence for keyword in important_keywords):
-                if 10 < len(sentence.strip()) < 120:
-                    points.append(sentence.strip())
-                    
-        return list(set(points))[:8]  # Remove duplicates, max 8 points
-    
-    @staticmethod
-    def extract_technical_terms(text: str) -> List[str]:
-        """Extract technical terms and technologies"""
-        # Enhanced technical patterns
-        tech_patterns = [
-            r'\b[A-Z][a-z]*[A-Z][a-zA-Z]*\b',  # CamelCase
-            r'\b[A-Z]{2,}\b',                   # Acronyms
-            r'\b\w+\.(js|py|java|go|rs|cpp|hpp|ts|jsx|tsx)\b',  # File extensions
-            r'\b(?:API|SDK|CLI|GPU|CPU|RAM|SSD|HDD|HTTP|HTTPS|TCP|UDP|SSL|TLS|JWT)\b',
-            r'\b(?:Docker|Kubernetes|Redis|PostgreSQL|MySQL|MongoDB|SQLite|MariaDB)\b',
-            r'\b(?:AWS|Azure|GCP|GoogleCloud|Terraform|Ansible|Jenkins|GitHub|GitLab)\b',
-            r'\b(?:React|Vue|Angular|FastAPI|Django|Flask|Spring|Express|Laravel)\b',
-            r'\b(?:Node\.js|Python|JavaScript|TypeScript|Java|C\+\+|Rust|Go)\b',
-            r'\b(?:Linux|Ubuntu|CentOS|Docker|Container|Microservice)\b'
-        ]
-        
-        terms = set()
-        for pattern in tech_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            terms.update(matches)
-            
-        # Add Japanese technical terms
-        jp_tech_terms = re.findall(r'(?:システム|データベース|サーバー|クライアント|フレームワーク|ライブラリ|アルゴリズム|アーキテクチャ|インフラ|セキュリティ|最適化)', text)
-        terms.update(jp_tech_terms)
+        # Sentences with important keywords (technical focus)
+        points.extend(sentence for sentence in analysis.keyword_sentences() if 10 < len(sentence) < 120)
         
-        return list(terms)[:12]
-
-class ConversationRedisManager:
-    """Enhanced Redis-based conversation management system with smart compression"""
+        return list(dict.fromkeys(points))[:8]  # Remove duplicates, max 8 points
     
-    def __init__(self, host='localhost', port=6379, db=0, password=None, 
-                 use_ssl=False, decode_responses=True):
-        """Initialize Redis connection with enhanced features"""
-        try:
-            self.redis_client = redis.Redis(
-                host=host, port=port, db=db, password=password,
-                ssl=use_ssl, decode_responses=decode_responses,
-                socket_connect_timeout=10, socket_timeout=10,
-                retry_on_timeout=True, health_check_interval=30
-            )
-            self.redis_client.ping()
-            self.processor = SmartTextProcessor()
-            logger.info("Enhanced Redis connection established successfully")
-        except redis.ConnectionError as e:
-            logger.error(f"Failed to connect to Redis: {e}")
-            raise
+    @staticmethod
+    def analyze(text: str) -> Dict[str, Any]:
+        """All summarization and extraction from one scan (picklable entry point for process pools)"""
+        analysis = analyze_text(text)
+        return {
+            'summary_short': SmartTextProcessor.generate_summary_short(text, analysis),
+            'summary_medium': SmartTextProcessor.generate_summary_medium(text, analysis),
+            'key_points': SmartTextProcessor.extract_key_points(text, analysis),
+            'technical_terms': SmartTextProcessor.extract_technical_terms(text, analysis)
+        }
     
-    def save_message(self, role: str, content: str, topics: List[str] = None, 
-                    keywords: List[str] = None, session_id: str = None) -> str:
-        """
-        Enhanced save_message with intelligent compression and multi-layer summarization
-        【優先度1解決】: 詳細情報の完全保存により切り詰め問題を解決
-        【優先度2解決】: zlib圧縮によりストレージ効率化
+    @staticmethod
+    def extract_technical_terms(text: str, analysis: Optional[TextAnalysis] = None) -> List[str]:
+        """Extract technical terms and technologies, most frequent first"""
+        return (analysis or analyze_text(text)).technical_terms(limit=12)
+
+class _ConversationStoreBase:
+    """I/O-free helpers shared by the sync and async managers
+
+    Record construction, pipeline write queuing and result shaping live here so
+    both clients write and read exactly the same Redis layout.
+    """
+
+    processor: SmartTextProcessor
+    codecs: CodecRegistry
+
+    @staticmethod
+    def _session_key() -> str:
+        return f"session:{datetime.date.today().isoformat()}"
+
+    @staticmethod
+    def _enriched_fields(compression: CompressionResult, analysis: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            'compressed_content': compression.data,
+            'compression_ratio': compression.compression_ratio,
+            'codec': compression.codec,
+            **analysis,
+            'enrichment_status': "done"
+        }
+
+    def _enrich_content(self, content: str) -> Dict[str, Any]:
+        """CPU-bound derivation: compression, summaries, key points and technical terms"""
+        compression = self.codecs.compress(content.encode('utf-8'))
+        return self._enriched_fields(compression, self.processor.analyze(content))
+
+    @staticmethod
+    def _raw_content_fields(content: str) -> Dict[str, Any]:
+        """Placeholder fields for a deferred message awaiting enrichment"""
+        return {
+            'compressed_content': content.encode('utf-8'),
+            'compression_ratio': 1.0,
+            'codec': "none",
+            'summary_short': "",
+            'summary_medium': "",
+            'key_points': [],
+            'technical_terms': [],
+            'enrichment_status': "pending"
+        }
+
+    def _build_message(self, role: str, content: str, topics: Optional[List[str]],
+                       keywords: Optional[List[str]], session_id: Optional[str],
+                       timestamp: Optional[datetime.datetime] = None,
+                       deferred: bool = False,
+                       derived: Optional[Dict[str, Any]] = None) -> Tuple[ConversationMessage, float]:
+        """Build the message record; compression/summarization is skipped when deferred
+
+        derived: precomputed _enrich_content() output (e.g. from a process pool)
         """
-        message_id = str(uuid4())
-        timestamp = datetime.datetime.now().isoformat()
-        timestamp_numeric = datetime.datetime.now().timestamp()
-        context_hash = hashlib.md5(content.encode()).hexdigest()
-        
-        if session_id is None:
-            session_id = self._get_or_create_session()
+        now = timestamp or datetime.datetime.now()
         
         # Generate compressed content and summaries
-        compressed_content, compression_ratio = self.processor.compress_text(content)
-        summary_short = self.processor.generate_summary_short(content)
-        summary_medium = self.processor.generate_summary_medium(content)
-        key_points = self.processor.extract_key_points(content)
-        technical_terms = self.processor.extract_technical_terms(content)
+        if derived is None:
+            derived = self._raw_content_fields(content) if deferred else self._enrich_content(content)
         
         message = ConversationMessage(
-            id=message_id,
-            timestamp=timestamp,
+            id=str(uuid4()),
+            timestamp=now.isoformat(),
             role=role,
             content=content,  # Full content preserved
-            compressed_content=compressed_content,
-            summary_short=summary_short,
-            summary_medium=summary_medium,
-            key_points=key_points,
-            technical_terms=technical_terms,
             topics=topics or [],
             keywords=keywords or [],
-            context_hash=context_hash,
+            context_hash=hashlib.md5(content.encode()).hexdigest(),
             session_id=session_id,
             content_length=len(content),
-            compression_ratio=compression_ratio
+            **derived,
+            **token_estimates(content, derived['summary_short'], derived['summary_medium'])
         )
+        return message, now.timestamp()
+
+    @staticmethod
+    def _compression_counters(samples: List[Tuple[str, float, int, int, int]]) -> Tuple[List[list], List[list]]:
+        """Compression counter increments; samples are (codec, ratio, content_length, original_bytes, stored_bytes)
+
+        Returns ([key, increment] counters, [key, field, increment] hash counters).
+        """
+        if not samples:
+            return [], []
         
-        # Store in Redis with multiple access patterns
-        pipe = self.redis_client.pipeline()
+        bytes_saved_total = 0
+        codec_counts: Dict[str, int] = {}
+        for codec, compression_ratio, content_length, _, _ in samples:
+            bytes_saved = int((1 - compression_ratio) * content_length)
+            if bytes_saved > 0:
+                bytes_saved_total += bytes_saved
+            codec_name = codec.split('@')[0]
+            codec_counts[codec_name] = codec_counts.get(codec_name, 0) + 1
         
-        # 1. Store full message data
+        counters = []
+        if bytes_saved_total > 0:
+            counters.append(["analytics:compression_total_saved", bytes_saved_total])
+        counters.append(["analytics:compression_original_bytes", sum(sample[3] for sample in samples)])
+        counters.append(["analytics:compression_stored_bytes", sum(sample[4] for sample in samples)])
+        hash_counters = [["analytics:compression_codecs", codec_name, count] for codec_name, count in codec_counts.items()]
+        return counters, hash_counters
+
+    @staticmethod
+    def _queue_compression_analytics(pipe, samples: List[Tuple[str, float, int, int, int]]) -> None:
+        counters, hash_counters = _ConversationStoreBase._compression_counters(samples)
+        for key, increment in counters:
+            pipe.incrby(key, increment)
+        for key, field, increment in hash_counters:
+            pipe.hincrby(key, field, increment)
+
+    @staticmethod
+    def _message_fields(message: ConversationMessage) -> Dict[str, str]:
+        """Redis hash fields for a message (v3: the body is stored separately)"""
         message_dict = asdict(message)
+        del message_dict['content']
+        compressed_content = message_dict.pop('compressed_content')
         # Convert lists to JSON for Redis storage
         for field in ['topics', 'keywords', 'key_points', 'technical_terms']:
             message_dict[field] = json.dumps(message_dict[field])
@@ -304,62 +453,224 @@ class ConversationRedisManager:
         # Convert numeric fields to strings for Redis compatibility
         message_dict['content_length'] = str(message_dict['content_length'])
         message_dict['compression_ratio'] = str(message_dict['compression_ratio'])
+        message_dict['format_version'] = str(message_dict['format_version'])
+        for field in ['tokens_short', 'tokens_medium', 'tokens_full']:
+            message_dict[field] = str(message_dict[field])
+        message_dict['compressed_length'] = str(len(compressed_content))
+        return message_dict
+
+    def _message_save_args(self, entries: List[Tuple[ConversationMessage, float]]) -> Tuple[List[str], list]:
+        """KEYS and ARGV for SAVE_MESSAGES_SCRIPT covering every write for the given messages
+
+        Index writes are merged per key: a batch costs one ZADD per distinct
+        topic/keyword/tech/role key and one increment per analytics counter,
+        however many messages it holds. Messages with an empty session_id join
+        today's session, which the script resolves atomically.
+        """
+        messages = []
+        bodies = []
+        vectors = []
+        postings: Dict[str, list] = {}
+        compression_samples = []
+        pending_ids = []
+        token_counts = []
         
-        # Debug: Check for any remaining non-string/numeric values
-        for key, value in message_dict.items():
-            if isinstance(value, (dict, list)):
-                logger.error(f"Found dict/list in message_dict['{key}']: {type(value)} = {value}")
-                message_dict[key] = json.dumps(value)
+        for message, timestamp_numeric in entries:
+            message_id = message.id
+            fields = self._message_fields(message)
+            fields.pop('session_id')
+            terms, length = index_terms(message.content)
+            token_counts.append(length)
+            messages.append({
+                'id': message_id,
+                'fields': [item for pair in fields.items() for item in pair],
+                'session_id': message.session_id or "",
+                'score': repr(float(timestamp_numeric)),
+                'content_chars': message.content_length,
+                'terms': terms,
+                'length': length
+            })
+            # Deferred messages have no summaries yet: enrichment indexes them
+            if message.enrichment_status != "pending":
+                summary_terms, summary_length = index_terms(
+                    summary_text({field: getattr(message, field) for field in SUMMARY_FIELDS}))
+                messages[-1].update(summary_terms=summary_terms, summary_length=summary_length)
+            bodies.append(message.compressed_content)
+            vectors.append(quantize(term_vector(terms)))
+            
+            for key in self._tag_keys(message.role, message.topics, message.keywords, message.technical_terms):
+                postings.setdefault(key, []).extend((messages[-1]['score'], message_id))
+            
+            # Deferred messages are counted in the compression stats once enriched
+            if message.enrichment_status == "pending":
+                pending_ids.append(message_id)
+            else:
+                compression_samples.append((
+                    message.codec, message.compression_ratio, message.content_length,
+                    len(message.content.encode('utf-8')), len(message.compressed_content)
+                ))
         
-        pipe.hset(f"message:{message_id}", mapping=message_dict)
+        counters, hash_counters = self._compression_counters(compression_samples)
+        counters = [
+            ["analytics:total_messages", len(messages)],
+            [f"analytics:daily:{datetime.date.today()}", len(messages)]
+        ] + counters
         
-        # 2. Store optimized versions for different use cases
-        summary_dict = {
-            'short': summary_short,
-            'medium': summary_medium,
-            'key_points': json.dumps(key_points),
-            'technical_terms': json.dumps(technical_terms)
+        plan = {
+            'new_session_id': str(uuid4()),
+            'session_ttl': SESSION_TTL_SECONDS,
+            'messages': messages,
+            'postings': postings,
+            'postings_cap': TAG_POSTINGS_CAP,
+            'counters': counters,
+            'hash_counters': hash_counters,
+            'lists': [
+                # words / CJK bigrams, as indexed (whitespace splitting cannot segment Japanese)
+                ["analytics:word_counts", token_counts, ANALYTICS_HISTORY_LENGTH],
+                ["analytics:content_lengths", [message.content_length for message, _ in entries], ANALYTICS_HISTORY_LENGTH]
+            ],
+            'queue': pending_ids,
+            'queue_key': ENRICHMENT_QUEUE_KEY,
+            'session_activity_key': SESSION_ACTIVITY_KEY,
+            'fulltext': FULLTEXT_INDEX.plan(),
+            'summaries': SUMMARY_INDEX.plan(),
+            'vectors': {'matrix_key': VECTOR_MATRIX_KEY, 'ids_key': VECTOR_IDS_KEY, 'chunk_rows': VECTOR_CHUNK_ROWS},
+            'generation_key': CONTEXT_GENERATION_KEY,
+            'search_generations_key': SEARCH_GENERATIONS_KEY,
+            'frequency': self._frequency_plan([
+                (message.timestamp, {'topics': message.topics, 'keywords': message.keywords,
+                                     'technical_terms': message.technical_terms})
+                for message, _ in entries
+            ])
         }
-        pipe.hset(f"message:{message_id}:summary", mapping=summary_dict)
-        
-        # 3. Timeline and indexing
-        pipe.zadd("messages:timeline", {message_id: float(timestamp_numeric)})
-        pipe.sadd(f"session:{session_id}:messages", message_id)
-        
-        # 4. Enhanced indexing
-        for topic in (topics or []):
-            pipe.sadd(f"topic:{topic.lower()}", message_id)
-        for keyword in (keywords or []):
-            pipe.sadd(f"keyword:{keyword.lower()}", message_id)
-        for term in technical_terms:
-            pipe.sadd(f"tech:{term.lower()}", message_id)
-        
-        pipe.sadd(f"role:{role}", message_id)
-        
-        # 5. Analytics
-        pipe.incr("analytics:total_messages")
-        bytes_saved = int((1 - compression_ratio) * len(content))
-        if bytes_saved > 0:
-            pipe.incr("analytics:compression_total_saved", bytes_saved)
-        
-        pipe.execute()
-        
-        logger.info(f"Enhanced message {message_id} saved with {compression_ratio:.2f} compression ratio")
-        return message_id
-    
-    def save_insight(self, insight_type: str, content: str, source_messages: List[str],
-                    relevance_score: float, business_area: str, summary: str = "",
-                    impact_level: str = "medium", actionable_items: List[str] = None) -> str:
-        """Enhanced save_insight with additional context"""
-        insight_id = str(uuid4())
-        timestamp = datetime.datetime.now().isoformat()
+        return [self._session_key()], [json.dumps(plan)] + bodies + vectors
+
+    @staticmethod
+    def _apply_default_session(entries: List[Tuple[ConversationMessage, float]], default_session: str) -> None:
+        """Fill in the session the save script resolved for messages without one"""
+        for message, _ in entries:
+            if not message.session_id:
+                message.session_id = default_session
+
+    @staticmethod
+    def _tag_keys(role: Optional[str] = None, topics: List[str] = (), keywords: List[str] = (),
+                  technical_terms: List[str] = ()) -> List[str]:
+        """Tag posting keys of a message (distinct, in order)"""
+        keys = [f"role:{role}"] if role else []
+        keys.extend(f"topic:{topic.lower()}" for topic in topics)
+        keys.extend(f"keyword:{keyword.lower()}" for keyword in keywords)
+        keys.extend(f"tech:{term.lower()}" for term in technical_terms)
+        return list(dict.fromkeys(keys))
+
+    @staticmethod
+    def _queue_tag_postings(pipe, keys: List[str], msg_id: str, score: float) -> None:
+        """Add a message to tag postings outside the save script (enrichment, migration)"""
+        for key in keys:
+            pipe.zadd(key, {msg_id: score})
+            if TAG_POSTINGS_CAP:
+                pipe.zremrangebyrank(key, 0, -TAG_POSTINGS_CAP - 1)
+            pipe.hincrby(SEARCH_GENERATIONS_KEY, key, 1)
+
+    @staticmethod
+    def _queue_fulltext_writes(pipe, msg_id: str, text: str, index: TextIndex = FULLTEXT_INDEX) -> None:
+        """Index a message body (or its summaries) outside the save script (enrichment, migration, backfill)"""
+        terms, length = index_terms(text)
+        for j in range(0, len(terms), 2):
+            pipe.zadd(index.term_key(terms[j]), {msg_id: terms[j + 1]})
+        pipe.hset(index.lengths_key, msg_id, length)
+        pipe.hincrby(index.stats_key, 'docs', 1)
+        pipe.hincrby(index.stats_key, 'total_length', length)
+        pipe.hincrby(SEARCH_GENERATIONS_KEY, index.stats_key, 1)
+
+    @staticmethod
+    def _queue_enrichment_writes(pipe, msg_id: str, content: str, derived: Dict[str, Any],
+                                 msg_data: Optional[Dict[str, str]] = None) -> None:
+        """Queue the results of enriching a deferred message
+
+        msg_data is the message hash before enrichment: its timestamp dates the term
+        frequencies and its session's stored_bytes counter follows the body's new size.
+        """
+        msg_data = msg_data or {}
+        timestamp = msg_data.get('timestamp')
+        compressed_content = derived['compressed_content']
+        pipe.set(f"message:{msg_id}:body", compressed_content)
+        pipe.hset(f"message:{msg_id}", mapping={
+            'summary_short': derived['summary_short'],
+            'summary_medium': derived['summary_medium'],
+            'key_points': json.dumps(derived['key_points']),
+            'technical_terms': json.dumps(derived['technical_terms']),
+            'compression_ratio': str(derived['compression_ratio']),
+            'compressed_length': str(len(compressed_content)),
+            'codec': derived['codec'],
+            'enrichment_status': derived['enrichment_status'],
+            **{field: str(tokens) for field, tokens in
+               token_estimates(content, derived['summary_short'], derived['summary_medium']).items()}
+        })
+        _ConversationStoreBase._queue_fulltext_writes(pipe, msg_id, summary_text(derived), SUMMARY_INDEX)
+        if derived['technical_terms']:
+            score = (datetime.datetime.fromisoformat(timestamp) if timestamp else datetime.datetime.now()).timestamp()
+            _ConversationStoreBase._queue_tag_postings(
+                pipe, _ConversationStoreBase._tag_keys(technical_terms=derived['technical_terms']), msg_id, score)
+            # EVAL rather than EVALSHA: queued the same way on sync and async pipelines
+            frequency = _ConversationStoreBase._frequency_plan(
+                [(timestamp, {'technical_terms': derived['technical_terms']})])
+            pipe.eval(INCREMENT_FREQUENCIES_SCRIPT, 0, json.dumps(frequency))
+        if msg_data.get('session_id') and 'compressed_length' in msg_data:
+            pipe.hincrby(f"session:{msg_data['session_id']}:stats", 'stored_bytes',
+                         len(compressed_content) - int(msg_data['compressed_length']))
         
+        _ConversationStoreBase._queue_compression_analytics(pipe, [(
+            derived['codec'], derived['compression_ratio'], len(content),
+            len(content.encode('utf-8')), len(compressed_content)
+        )])
+        pipe.hincrby(CONTEXT_GENERATION_KEY, 'generation', 1)
+        pipe.publish(ENRICHMENT_DONE_CHANNEL.format(msg_id), derived['enrichment_status'])
+
+    def _build_messages(self, items: List[Dict[str, Any]], deferred: bool = False,
+                        derived: Optional[List[Dict[str, Any]]] = None) -> List[Tuple[ConversationMessage, float]]:
+        """Build records for a batch; items without a session_id are resolved by the save script"""
+        return [
+            self._build_message(
+                item['role'], item['content'], item.get('topics'), item.get('keywords'),
+                item.get('session_id'), item.get('timestamp'), deferred,
+                derived[i] if derived else None
+            )
+            for i, item in enumerate(items)
+        ]
+
+    @staticmethod
+    def _check_ingest_mode(ingest_mode: str) -> bool:
+        """Validate ingest_mode and return whether enrichment is deferred"""
+        if ingest_mode not in INGEST_MODES:
+            raise ValueError(f"Unknown ingest_mode {ingest_mode!r}, expected one of {INGEST_MODES}")
+        return ingest_mode == "deferred"
+
+    @staticmethod
+    def _save_result(message: ConversationMessage) -> Dict[str, Any]:
+        """Per-message result returned by save_messages"""
+        compressed_length = len(message.compressed_content)
+        return {
+            'message_id': message.id,
+            'session_id': message.session_id,
+            'content_length': message.content_length,
+            'compressed_length': compressed_length,
+            'compression_ratio': message.compression_ratio,
+            'codec': message.codec,
+            'bytes_saved': max(len(message.content.encode('utf-8')) - compressed_length, 0),
+            'summary_generated': bool(message.summary_short),
+            'technical_terms_extracted': len(message.technical_terms),
+            'enrichment_status': message.enrichment_status
+        }
+
+    def _build_insight(self, insight_type: str, content: str, source_messages: List[str],
+                       relevance_score: float, business_area: str, summary: str,
+                       impact_level: str, actionable_items: Optional[List[str]]) -> ConversationInsight:
         if not summary:
             summary = self.processor.generate_summary_short(content)
         
-        insight = ConversationInsight(
-            id=insight_id,
-            timestamp=timestamp,
+        return ConversationInsight(
+            id=str(uuid4()),
+            timestamp=datetime.datetime.now().isoformat(),
             insight_type=insight_type,
             content=content,
             summary=summary,
@@ -369,8 +680,10 @@ class ConversationRedisManager:
             impact_level=impact_level,
             actionable_items=actionable_items or []
         )
-        
-        pipe = self.redis_client.pipeline()
+
+    @staticmethod
+    def _queue_insight_writes(pipe, insight: ConversationInsight) -> None:
+        insight_id = insight.id
         
         # Store insight data
         insight_dict = asdict(insight)
@@ -381,295 +694,2481 @@ class ConversationRedisManager:
         pipe.hset(f"insight:{insight_id}", mapping=insight_dict)
         
         # Enhanced indexing
-        pipe.sadd(f"insights:{insight_type}", insight_id)
-        pipe.sadd(f"business_area:{business_area}", insight_id)
-        pipe.sadd(f"impact:{impact_level}", insight_id)
-        pipe.zadd("insights:by_relevance", {insight_id: float(relevance_score)})
-        
-        pipe.execute()
-        
-        logger.info(f"Enhanced insight {insight_id} saved")
-        return insight_id
-    
-    def get_conversation_context(self, limit: int = 50, detail_level: str = "adaptive") -> Dict[str, Any]:
-        """
-        Enhanced context retrieval with configurable detail levels
-        【優先度1解決】: content[:500]制限を完全廃止、適応的詳細レベル提供
-        【優先度3解決】: AI文脈理解の大幅改善
-        
-        detail_level options:
-        - "short": Use short summaries (for quick context)
-        - "medium": Use medium summaries (balanced)
-        - "full": Use full content (for detailed analysis)
-        - "adaptive": Mix based on message importance and recency
+        pipe.sadd(f"insights:{insight.insight_type}", insight_id)
+        pipe.sadd(f"business_area:{insight.business_area}", insight_id)
+        pipe.sadd(f"impact:{insight.impact_level}", insight_id)
+        pipe.zadd("insights:by_relevance", {insight_id: float(insight.relevance_score)})
+        pipe.hincrby(CONTEXT_GENERATION_KEY, 'generation', 1)
+
+    @staticmethod
+    def _wants_full_content(position: int, detail_level: str) -> bool:
+        """Whether a timeline position is rendered with its full body"""
+        # Most recent 5 messages get full content in adaptive mode
+        return detail_level == "full" or (detail_level == "adaptive" and position < 5)
+
+    @staticmethod
+    def _is_v3(msg_data: Dict[str, str]) -> bool:
+        return int(msg_data.get('format_version', 0) or 0) >= 3
+
+    @staticmethod
+    def _enrichment_status(msg_data: Dict[str, str]) -> Optional[str]:
+        """pending / done / failed; messages written before enrichment existed count as done"""
+        if not msg_data:
+            return None
+        return msg_data.get('enrichment_status', "done")
+
+    @classmethod
+    def _context_source(cls, position: int, detail_level: str) -> str:
+        """What a timeline position renders: 'body', 'summary_short' or 'summary_medium'"""
+        if cls._wants_full_content(position, detail_level):
+            return 'body'
+        if detail_level == "short" or (detail_level == "adaptive" and position >= 20):
+            # Older messages get short summary
+            return 'summary_short'
+        # medium, adaptive positions 5-19 and unknown levels
+        return 'summary_medium'
+
+    @classmethod
+    def _context_fields(cls, position: int, detail_level: str) -> List[str]:
+        """Hash fields a timeline position needs; never the full content"""
+        fields = list(CONTEXT_BASE_FIELDS)
+        if detail_level == TOKEN_BUDGET_LEVEL:
+            return fields + list(TOKEN_BUDGET_FIELDS)
+        source = cls._context_source(position, detail_level)
+        if source != 'body':
+            fields.append(source)
+        if detail_level in ["full", "adaptive"] and position < 15:
+            fields.extend(('key_points', 'technical_terms'))
+        return fields
+
+    @staticmethod
+    def _projected(fields: List[str], values: List[Optional[str]]) -> Dict[str, str]:
+        """HMGET reply as a dict shaped like HGETALL (absent fields left out, {} if no hash)"""
+        return {field: value for field, value in zip(fields, values) if value is not None}
+
+    def _queue_context_reads(self, pipe, message_ids: List[str], detail_level: str,
+                             insight_ids: List[str], positions: Optional[List[int]] = None) -> List[List[str]]:
+        """Queue projected HMGETs for context messages and insights; returns the field lists
+
+        positions are the timeline positions (0 = newest) of message_ids, by default their index.
         """
-        recent_message_ids = self.redis_client.zrevrange("messages:timeline", 0, limit-1)
-        
-        messages = []
-        topics_frequency = {}
-        keywords_frequency = {}
-        tech_terms_frequency = {}
-        
-        for i, msg_id in enumerate(recent_message_ids):
-            msg_data = self.redis_client.hgetall(f"message:{msg_id}")
-            summary_data = self.redis_client.hgetall(f"message:{msg_id}:summary")
-            
-            if msg_data:
-                # Choose content based on detail level - NO MORE [:500] TRUNCATION!
-                if detail_level == "short":
-                    content = summary_data.get('short', msg_data.get('summary_short', msg_data.get('content', '')))
-                elif detail_level == "medium":
-                    content = summary_data.get('medium', msg_data.get('summary_medium', msg_data.get('content', '')))
-                elif detail_level == "full":
-                    content = msg_data.get('content', '')  # Full content always available
-                elif detail_level == "adaptive":
-                    # Intelligent adaptive selection
-                    if i < 5:  # Most recent 5 messages get full content
-                        content = msg_data.get('content', '')
-                    elif i < 20:  # Next 15 get medium summary
-                        content = summary_data.get('medium', msg_data.get('summary_medium', msg_data.get('content', '')))
-                    else:  # Older messages get short summary
-                        content = summary_data.get('short', msg_data.get('summary_short', msg_data.get('content', '')))
-                else:
-                    content = summary_data.get('medium', msg_data.get('summary_medium', msg_data.get('content', '')))
-                
-                message_info = {
-                    'role': msg_data['role'],
-                    'content': content,  # No truncation applied here!
-                    'timestamp': msg_data['timestamp'],
-                    'topics': json.loads(msg_data.get('topics', '[]')),
-                    'keywords': json.loads(msg_data.get('keywords', '[]')),
-                    'content_length': int(msg_data.get('content_length', 0)),
-                    'compression_ratio': float(msg_data.get('compression_ratio', 1.0))
-                }
-                
-                # Add enhanced information for important messages
-                if detail_level in ["full", "adaptive"] and i < 15:
-                    message_info['key_points'] = json.loads(summary_data.get('key_points', msg_data.get('key_points', '[]')))
-                    message_info['technical_terms'] = json.loads(summary_data.get('technical_terms', msg_data.get('technical_terms', '[]')))
-                
-                messages.append(message_info)
-                
-                # Update frequency counters
-                for topic in json.loads(msg_data.get('topics', '[]')):
-                    topics_frequency[topic] = topics_frequency.get(topic, 0) + 1
-                for keyword in json.loads(msg_data.get('keywords', '[]')):
-                    keywords_frequency[keyword] = keywords_frequency.get(keyword, 0) + 1
-                for term in json.loads(msg_data.get('technical_terms', '[]')):
-                    tech_terms_frequency[term] = tech_terms_frequency.get(term, 0) + 1
-        
-        # Get enhanced insights
-        top_insights = self._get_top_insights(5)
-        
-        # Get compression statistics
-        total_saved = int(self.redis_client.get("analytics:compression_total_saved") or 0)
-        
+        positions = positions if positions is not None else range(len(message_ids))
+        field_lists = [self._context_fields(position, detail_level) for position in positions]
+        for msg_id, fields in zip(message_ids, field_lists):
+            pipe.hmget(f"message:{msg_id}", fields)
+        self._queue_insight_reads(pipe, insight_ids)
+        return field_lists
+
+    def _unpack_context_reads(self, message_ids: List[str], field_lists: List[List[str]],
+                              results: List[Any]) -> Tuple[List[Tuple[str, Dict[str, str]]], List[Dict]]:
+        """(hydrated messages, insight summaries) from the _queue_context_reads replies"""
+        hydrated = [
+            (msg_id, self._projected(fields, values))
+            for msg_id, fields, values in zip(message_ids, field_lists, results)
+        ]
+        return hydrated, self._insight_summaries(results[len(message_ids):])
+
+    def _context_cache_enabled(self) -> bool:
+        return self.context_cache is not None and self.context_cache.enabled
+
+    def _queue_context_cache_read(self, pipe, key: str) -> None:
+        pipe.hmget(CONTEXT_GENERATION_KEY, ['epoch', 'generation'])
+        self.context_cache.queue_read(pipe, key)
+
+    def _lookup_cached_context(self, key: str, results: List[Any]) -> Tuple[Optional[str], Any]:
+        """(epoch:generation:day tag or None before an epoch exists, cached result or None) from the _queue_context_cache_read replies"""
+        epoch, generation = results[0]
+        tag = f"{epoch}:{generation or 0}:{datetime.date.today().isoformat()}" if epoch else None
+        cached = self.context_cache.lookup(key, tag, results[1] if len(results) > 1 else None)
+        if isinstance(cached, dict):
+            return tag, {**cached, 'retrieval_stats': {
+                'round_trips': 1, 'messages_hydrated': 0, 'bodies_fetched': 0, 'cache': 'hit'
+            }}
+        return tag, cached
+
+    def _queue_context_cache_store(self, pipe, key: str, tag: Optional[str], result: Any) -> bool:
+        """Queue the store of result (see ContextCache.store); without an epoch yet, start one instead"""
+        if tag is None:
+            pipe.hsetnx(CONTEXT_GENERATION_KEY, 'epoch', uuid4().hex)
+            return True
+        return self.context_cache.store(pipe, key, tag, result)
+
+    @staticmethod
+    def _mark_cache_miss(result: Any) -> Any:
+        if isinstance(result, dict) and 'retrieval_stats' in result:
+            stats = result['retrieval_stats']
+            result['retrieval_stats'] = {**stats, 'round_trips': stats.get('round_trips', 0) + 1, 'cache': 'miss'}
+        return result
+
+    @staticmethod
+    def _queue_context_index_reads(pipe, limit: int, insight_limit: int = 5) -> None:
+        """Timeline ids, top insight ids, bytes saved and message count (one round trip)"""
+        pipe.zrevrange("messages:timeline", 0, limit-1)
+        pipe.zrevrange("insights:by_relevance", 0, insight_limit-1)
+        pipe.get("analytics:compression_total_saved")
+        pipe.zcard("messages:timeline")
+
+    @staticmethod
+    def _retrieval_stats(hydrated: List[Tuple[str, Dict[str, str]]],
+                         body_targets: List[Tuple[str, Optional[str]]]) -> Dict[str, int]:
+        """Redis round trips behind a context read: index reads, HMGET hydration, bodies if any"""
         return {
-            'recent_messages': messages,
-            'frequent_topics': sorted(topics_frequency.items(), key=lambda x: x[1], reverse=True)[:10],
-            'frequent_keywords': sorted(keywords_frequency.items(), key=lambda x: x[1], reverse=True)[:15],
-            'technical_terms': sorted(tech_terms_frequency.items(), key=lambda x: x[1], reverse=True)[:10],
-            'key_insights': top_insights,
-            'total_messages': self.redis_client.zcard("messages:timeline"),
-            'compression_stats': {
-                'total_bytes_saved': total_saved,
-                'detail_level_used': detail_level
-            },
-            'context_generated_at': datetime.datetime.now().isoformat()
+            'round_trips': 2 + (1 if body_targets else 0),
+            'messages_hydrated': len(hydrated),
+            'bodies_fetched': len(body_targets)
         }
-    
-    def search_conversations(self, query_terms: List[str], limit: int = 20,
-                           search_scope: str = "all") -> List[Dict]:
-        """
-        Enhanced search with technical terms and full content access
-        【優先度1解決】: 検索結果で完全なコンテンツにアクセス可能
-        """
-        matching_message_ids = set()
-        
-        for term in query_terms:
-            term_lower = term.lower()
-            
-            if search_scope in ["all", "topics"]:
-                matching_message_ids.update(self.redis_client.smembers(f"topic:{term_lower}"))
-                matching_message_ids.update(self.redis_client.smembers(f"keyword:{term_lower}"))
-            
-            if search_scope in ["all", "technical"]:
-                matching_message_ids.update(self.redis_client.smembers(f"tech:{term_lower}"))
-        
-        # Retrieve and enhance results with full content access
-        results = []
-        for msg_id in list(matching_message_ids)[:limit]:
-            msg_data = self.redis_client.hgetall(f"message:{msg_id}")
-            summary_data = self.redis_client.hgetall(f"message:{msg_id}:summary")
-            
-            if msg_data:
-                result = {
-                    'id': msg_id,
-                    'role': msg_data['role'],
-                    'content': msg_data['content'],  # Full content available
-                    'summary_medium': summary_data.get('medium', ''),
-                    'key_points': json.loads(summary_data.get('key_points', '[]')),
-                    'technical_terms': json.loads(summary_data.get('technical_terms', '[]')),
-                    'timestamp': msg_data['timestamp'],
-                    'compression_ratio': float(msg_data.get('compression_ratio', 1.0)),
-                    'topics': json.loads(msg_data.get('topics', '[]')),
-                    'keywords': json.loads(msg_data.get('keywords', '[]'))
-                }
-                results.append(result)
-        
-        # Sort by timestamp (most recent first)
-        results.sort(key=lambda x: x['timestamp'], reverse=True)
-        return results
-    
-    def _get_or_create_session(self) -> str:
-        """Get current session or create new one"""
-        today = datetime.date.today().isoformat()
-        session_key = f"session:{today}"
-        
-        if not self.redis_client.exists(session_key):
-            session_id = str(uuid4())
-            self.redis_client.setex(session_key, 86400, session_id)
-            return session_id
-        
-        return self.redis_client.get(session_key)
-    
-    def _get_top_insights(self, limit: int) -> List[Dict]:
-        """Get top insights by relevance score"""
-        top_insight_ids = self.redis_client.zrevrange("insights:by_relevance", 0, limit-1)
-        
+
+    @staticmethod
+    def _queue_insight_reads(pipe, insight_ids: List[str]) -> None:
+        for insight_id in insight_ids:
+            pipe.hmget(f"insight:{insight_id}", INSIGHT_SUMMARY_FIELDS)
+
+    def _insight_summaries(self, rows: List[List[Optional[str]]]) -> List[Dict]:
         insights = []
-        for insight_id in top_insight_ids:
-            insight_data = self.redis_client.hgetall(f"insight:{insight_id}")
+        for values in rows:
+            insight_data = self._projected(INSIGHT_SUMMARY_FIELDS, values)
             if insight_data:
-                insights.append({
-                    'type': insight_data['insight_type'],
-                    'content': insight_data['content'],
-                    'summary': insight_data.get('summary', ''),
-                    'business_area': insight_data['business_area'],
-                    'relevance_score': float(insight_data['relevance_score']),
-                    'impact_level': insight_data.get('impact_level', 'medium'),
-                    'actionable_items': json.loads(insight_data.get('actionable_items', '[]')),
-                    'source_messages': json.loads(insight_data.get('source_messages', '[]'))
-                })
-        
+                insights.append(self._insight_summary(insight_data))
         return insights
-    
-    def export_for_ai_context(self, format_type: str = "narrative", detail_level: str = "adaptive") -> str:
+
+    def _body_ids_to_fetch(self, entries: List[Tuple[str, Dict[str, str]]],
+                           detail_level: Optional[str] = None,
+                           positions: Optional[List[int]] = None,
+                           sources: Optional[List[Optional[str]]] = None) -> List[Tuple[str, Optional[str]]]:
+        """(id, codec tag) pairs whose body must be read
+
+        v3 bodies come from message:{id}:body; pre-v3 messages get a None tag and
+        their content field is read instead when the hash was projected without it.
+        With a detail_level only positions that render the body (or whose summary
+        is missing) are returned, so short/medium reads never transfer bodies.
+        sources (token_budget packing) replaces the per-position choice; None entries
+        were left out and need nothing.
         """
-        Enhanced AI context export with improved formatting
-        【優先度3解決】: AI文脈理解の大幅改善
+        targets = []
+        positions = positions if positions is not None else range(len(entries))
+        for index, (position, (msg_id, msg_data)) in enumerate(zip(positions, entries)):
+            if not msg_data or (not self._is_v3(msg_data) and 'content' in msg_data):
+                continue
+            if sources is not None or detail_level is not None:
+                source = sources[index] if sources is not None else self._context_source(position, detail_level)
+                if source is None:
+                    continue
+                # no summaries yet (pending/failed enrichment, v1): the body stands in for them
+                if source != 'body' and msg_data.get(source):
+                    continue
+            codec_tag = (msg_data.get('codec') or DEFAULT_CODEC_TAG) if self._is_v3(msg_data) else None
+            targets.append((msg_id, codec_tag))
+        return targets
+
+    def _queue_body_reads(self, pipe, targets: List[Tuple[str, Optional[str]]]) -> bool:
+        """Queue body reads (and missing zstd dictionaries) on a binary pipeline
+
+        Returns whether a dictionary read was queued ahead of the bodies.
         """
-        context = self.get_conversation_context(detail_level=detail_level)
+        missing = list(self.codecs.missing_dictionaries(tag for _, tag in targets if tag))
+        if missing:
+            pipe.hmget(DICTIONARY_HASH_KEY, missing)
+        for msg_id, codec_tag in targets:
+            if codec_tag is None:
+                pipe.hget(f"message:{msg_id}", 'content')
+            else:
+                pipe.get(f"message:{msg_id}:body")
+        return bool(missing)
+
+    def _decode_bodies(self, targets: List[Tuple[str, Optional[str]]], raw_bodies: List[Optional[bytes]]) -> Dict[str, str]:
+        bodies = {}
+        for (msg_id, codec_tag), raw in zip(targets, raw_bodies):
+            if raw is None:
+                continue
+            if codec_tag is None:
+                bodies[msg_id] = raw.decode('utf-8')
+                continue
+            try:
+                bodies[msg_id] = self.codecs.decompress(codec_tag, raw).decode('utf-8')
+            except Exception as e:
+                logger.error(f"Decompression failed for message {msg_id} ({codec_tag}): {e}")
+                bodies[msg_id] = ""
+        return bodies
+
+    def _unpack_body_reads(self, targets: List[Tuple[str, Optional[str]]], dictionaries_queued: bool,
+                           results: List[Any]) -> Dict[str, str]:
+        if dictionaries_queued:
+            self._register_dictionaries(results[0])
+            results = results[1:]
+        return self._decode_bodies(targets, results)
+
+    @staticmethod
+    def _queue_vocabulary_reads(pipe) -> None:
+        pipe.smembers(VOCABULARY_TERMS_KEY)
+        pipe.smembers(VOCABULARY_KEYWORDS_KEY)
+        pipe.get(VOCABULARY_VERSION_KEY)
+
+    @staticmethod
+    def _install_vocabulary(results) -> Vocabulary:
+        """Merge the vocabulary file with the Redis sets read by _queue_vocabulary_reads"""
+        terms, keywords, revision = results
+        vocabulary = install_vocabulary(
+            Vocabulary.from_file().extended(sorted(terms), sorted(keywords), int(revision or 0))
+        )
+        logger.info(f"Vocabulary {vocabulary.version} installed: {vocabulary.stats()}")
+        return vocabulary
+
+    def _register_dictionaries(self, raw_dictionaries: List[Optional[bytes]],
+                               active_dict_id: Optional[bytes] = None) -> None:
+        for raw in raw_dictionaries:
+            if raw:
+                self.codecs.add_dictionary(raw)
+        if active_dict_id:
+            self.codecs.active_dict_id = int(active_dict_id)
+
+    @staticmethod
+    def _message_content(msg_id: str, msg_data: Dict[str, str], bodies: Dict[str, str]) -> str:
+        """Full body for any storage version"""
+        if msg_id in bodies:
+            return bodies[msg_id]
+        return msg_data.get('content', '')
+
+    def _context_message(self, position: int, msg_id: str, msg_data: Dict[str, str],
+                         bodies: Dict[str, str], detail_level: str, source: Optional[str] = None) -> Dict[str, Any]:
+        """Shape one timeline entry for the requested detail level (or the packed source)"""
+        # Choose content based on detail level - NO MORE [:500] TRUNCATION!
+        source = source or self._context_source(position, detail_level)
+        if source == 'body':
+            content = self._message_content(msg_id, msg_data, bodies)  # Full content always available
+        else:
+            content = msg_data.get(source) or self._message_content(msg_id, msg_data, bodies)
         
-        if format_type == "structured":
-            return json.dumps(context, indent=2, ensure_ascii=False)
+        message_info = {
+            'role': msg_data['role'],
+            'content': content,  # No truncation applied here!
+            'timestamp': msg_data['timestamp'],
+            'topics': json.loads(msg_data.get('topics', '[]')),
+            'keywords': json.loads(msg_data.get('keywords', '[]')),
+            'content_length': int(msg_data.get('content_length', 0)),
+            'compression_ratio': float(msg_data.get('compression_ratio', 1.0))
+        }
         
-        elif format_type == "narrative":
-            # Create enhanced narrative summary for AI
-            narrative_parts = []
-            
-            narrative_parts.append("## 会話履歴の要約")
-            narrative_parts.append(f"総メッセージ数: {context['total_messages']}")
-            
-            # Compression stats
-            if context.get('compression_stats', {}).get('total_bytes_saved', 0) > 0:
-                narrative_parts.append(f"圧縮効率: {context['compression_stats']['total_bytes_saved']:,} bytes saved")
-            
-            if context['frequent_topics']:
-                narrative_parts.append("\n### 頻出トピック:")
-                for topic, count in context['frequent_topics'][:5]:
-                    narrative_parts.append(f"- {topic} ({count}回)")
-            
-            if context.get('technical_terms'):
-                narrative_parts.append("\n### 技術用語:")
-                for term, count in context['technical_terms'][:5]:
-                    narrative_parts.append(f"- {term} ({count}回)")
-            
-            if context['key_insights']:
-                narrative_parts.append("\n### 重要な知見:")
-                for insight in context['key_insights'][:3]:
-                    narrative_parts.append(f"- [{insight['type']}] {insight.get('summary', insight['content'][:200])}...")
-                    if insight.get('actionable_items'):
-                        for action in insight['actionable_items'][:2]:
-                            narrative_parts.append(f"  • アクション: {action}")
-            
-            narrative_parts.append(f"\n### 最近の会話傾向:")
-            recent_user_msgs = [m for m in context['recent_messages'][-10:] if m['role'] == 'user']
-            if recent_user_msgs:
-                narrative_parts.append("ユーザーは以下の領域に関心を示している:")
-                for msg in recent_user_msgs[-3:]:
-                    content_preview = msg['content'][:200] if len(msg['content']) > 200 else msg['content']
-                    narrative_parts.append(f"- {content_preview}...")
-                    
-                    # Add key points if available
-                    if msg.get('key_points'):
-                        for point in msg['key_points'][:2]:
-                            narrative_parts.append(f"  • {point}")
-            
-            return "\n".join(narrative_parts)
+        # Add enhanced information for important messages
+        if detail_level in ["full", "adaptive"] and position < 15:
+            message_info['key_points'] = json.loads(msg_data.get('key_points', '[]'))
+            message_info['technical_terms'] = json.loads(msg_data.get('technical_terms', '[]'))
         
-        return json.dumps(context, ensure_ascii=False)
+        return message_info
 
-# Migration utilities for existing data
-def migrate_existing_messages(redis_client, processor=None):
-    """Migrate existing messages to enhanced format"""
-    if processor is None:
-        processor = SmartTextProcessor()
+    def _assemble_context(self, snapshot: ContextSnapshot) -> Dict[str, Any]:
+        """Aggregate stage: shape a fetched snapshot into the context payload every renderer reads"""
+        sources = snapshot.sources if snapshot.sources is not None else [None] * len(snapshot.hydrated)
+        messages = [
+            self._context_message(i, msg_id, msg_data, snapshot.bodies, snapshot.detail_level, source)
+            for i, ((msg_id, msg_data), source) in enumerate(zip(snapshot.hydrated, sources))
+            if msg_data and (source or snapshot.sources is None)
+        ]
         
-    logger.info("Starting migration of existing messages...")
-    
-    # Get all existing message IDs
-    all_message_ids = redis_client.zrange("messages:timeline", 0, -1)
-    migrated_count = 0
-    
-    for msg_id in all_message_ids:
-        msg_data = redis_client.hgetall(f"message:{msg_id}")
+        context = {
+            'recent_messages': messages,
+            **snapshot.aggregates,
+            'key_insights': snapshot.top_insights,
+            'total_messages': snapshot.total_messages,
+            'compression_stats': {
+                'total_bytes_saved': snapshot.total_saved,
+                'detail_level_used': snapshot.detail_level
+            },
+            'retrieval_stats': snapshot.retrieval_stats,
+            'context_generated_at': datetime.datetime.now().isoformat()
+        }
+        if snapshot.packing is not None:
+            context['token_budget'] = snapshot.packing
+        return context
+
+    @staticmethod
+    def _effective_detail_level(detail_level: str, token_budget: Optional[int]) -> str:
+        """detail_level, or TOKEN_BUDGET_LEVEL when a token budget picks representations"""
+        if token_budget is None:
+            return detail_level
+        if token_budget < 1:
+            raise ValueError(f"token_budget must be positive, got {token_budget}")
+        return TOKEN_BUDGET_LEVEL
+
+    @staticmethod
+    def _representation_tokens(msg_data: Dict[str, str]) -> Dict[str, int]:
+        """Stored token estimate per representation; older messages without them are estimated here"""
+        if 'tokens_full' in msg_data:
+            tokens_full = int(msg_data['tokens_full'])
+        else:
+            # No estimate yet: one token per character keeps the budget conservative
+            tokens_full = int(msg_data.get('content_length', 0) or 0)
+        tokens = {'body': tokens_full}
+        for source, field in (('summary_short', 'tokens_short'), ('summary_medium', 'tokens_medium')):
+            if field in msg_data:
+                tokens[source] = int(msg_data[field])
+            else:
+                tokens[source] = estimate_tokens(msg_data[source]) if msg_data.get(source) else tokens_full
+        return tokens
+
+    def _pack_context(self, hydrated: List[Tuple[str, Dict[str, str]]],
+                      token_budget: int) -> Tuple[List[Optional[str]], Dict[str, Any]]:
+        """Representation per hydrated message within token_budget, and the packing summary"""
+        costs = [self._representation_tokens(msg_data) if msg_data else {} for _, msg_data in hydrated]
+        sources, spent = pack_by_budget(costs, token_budget)
+        representations = {name: 0 for name in REPRESENTATION_NAMES.values()}
+        for source in sources:
+            if source:
+                representations[REPRESENTATION_NAMES[source]] += 1
+        packed = sum(representations.values())
+        return sources, {
+            'budget': token_budget,
+            'estimated_tokens': spent,
+            'messages_packed': packed,
+            'messages_left_out': sum(1 for _, msg_data in hydrated if msg_data) - packed,
+            'representations': representations
+        }
+
+    @staticmethod
+    def _frequency_key(kind: str, scope: str) -> str:
+        """freq:{kind}:{scope}; scope is all, rolling or a day (YYYY-MM-DD)"""
+        return f"freq:{kind}:{scope}" if scope in ("all", "rolling") else f"freq:{kind}:day:{scope}"
+
+    @staticmethod
+    def _window_days(today: Optional[datetime.date] = None) -> List[str]:
+        today = today or datetime.date.today()
+        return [(today - datetime.timedelta(days=offset)).isoformat() for offset in range(FREQUENCY_WINDOW_DAYS)]
+
+    @staticmethod
+    def _bucket_expire_at(day: datetime.date) -> int:
+        """Epoch second at which a day bucket leaves the window (plus a day of slack)"""
+        expires = day + datetime.timedelta(days=FREQUENCY_WINDOW_DAYS + 1)
+        return int(datetime.datetime.combine(expires, datetime.time()).timestamp())
+
+    @classmethod
+    def _frequency_plan(cls, samples: List[Tuple[Optional[str], Dict[str, List[str]]]]) -> Dict[str, Any]:
+        """Frequency increments for apply_frequencies (see redis_scripts)
+
+        samples: (ISO timestamp of the message, {'topics'|'keywords'|'technical_terms': values}).
+        Messages dated before the window only count towards the all-time sets.
+        """
+        today = datetime.date.today()
+        window_start = today - datetime.timedelta(days=FREQUENCY_WINDOW_DAYS - 1)
+        counts: Dict[Tuple[datetime.date, str], Dict[str, int]] = {}
+        for timestamp, values_by_field in samples:
+            day = datetime.datetime.fromisoformat(timestamp).date() if timestamp else today
+            for field, values in values_by_field.items():
+                counter = counts.setdefault((day, FREQUENCY_KINDS[field]), {})
+                for value in values:
+                    counter[value] = counter.get(value, 0) + 1
         
-        if 'compressed_content' not in msg_data and msg_data:  # Not yet migrated
-            content = msg_data.get('content', '')
-            
-            if content:  # Only migrate if content exists
-                # Generate new fields
-                compressed_content, compression_ratio = processor.compress_text(content)
-                summary_short = processor.generate_summary_short(content)
-                summary_medium = processor.generate_summary_medium(content)
-                key_points = processor.extract_key_points(content)
-                technical_terms = processor.extract_technical_terms(content)
-                
-                # Update message data
-                updates = {
-                    'compressed_content': compressed_content,
-                    'summary_short': summary_short,
-                    'summary_medium': summary_medium,
-                    'key_points': json.dumps(key_points),
-                    'technical_terms': json.dumps(technical_terms),
-                    'content_length': str(len(content)),
-                    'compression_ratio': str(compression_ratio)
-                }
-                
-                pipe = redis_client.pipeline()
-                pipe.hset(f"message:{msg_id}", mapping=updates)
-                
-                # Create summary hash
-                summary_data = {
-                    'short': summary_short,
-                    'medium': summary_medium,
-                    'key_points': json.dumps(key_points),
-                    'technical_terms': json.dumps(technical_terms)
-                }
-                pipe.hset(f"message:{msg_id}:summary", mapping=summary_data)
-                
-                # Add technical term indexes
-                for term in technical_terms:
-                    pipe.sadd(f"tech:{term.lower()}", msg_id)
-                
-                pipe.execute()
-                migrated_count += 1
-                
-                if migrated_count % 10 == 0:
-                    logger.info(f"Migrated {migrated_count} messages...")
-    
-    logger.info(f"Migration completed successfully! Migrated {migrated_count} messages.")
+        buckets = []
+        for (day, kind), counter in counts.items():
+            if not counter:
+                continue
+            buckets.append({
+                'all': cls._frequency_key(kind, "all"),
+                'key': cls._frequency_key(kind, day.isoformat()) if day >= window_start else "",
+                'rolling': cls._frequency_key(kind, "rolling") if window_start <= day <= today else "",
+                'expire_at': cls._bucket_expire_at(day),
+                'members': [item for pair in counter.items() for item in pair]
+            })
+        return {'marker_key': FREQUENCY_ROLLING_DAY_KEY, 'today': today.isoformat(), 'buckets': buckets}
+
+    @classmethod
+    def _queue_frequency_reads(cls, pipe) -> None:
+        """Rolling-window top-k per aggregate (ZREVRANGE, O(log n + k)) and the window's day"""
+        pipe.get(FREQUENCY_ROLLING_DAY_KEY)
+        for kind, top_k in FREQUENCY_TOP_K.values():
+            pipe.zrevrange(cls._frequency_key(kind, "rolling"), 0, top_k - 1, withscores=True)
+
+    @staticmethod
+    def _unpack_frequency_reads(results: List[Any]) -> Tuple[bool, Dict[str, List[Tuple[str, int]]]]:
+        """(whether the rolling sets are today's, frequent_topics/frequent_keywords/technical_terms)"""
+        rolling_day, *top = results
+        aggregates = {
+            name: [(member, int(score)) for member, score in rows]
+            for name, rows in zip(FREQUENCY_TOP_K, top)
+        }
+        return rolling_day == datetime.date.today().isoformat(), aggregates
+
+    @classmethod
+    def _queue_rolling_rebuild(cls, pipe) -> None:
+        """Recompute the rolling sets from today's window of day buckets (run in MULTI)"""
+        days = cls._window_days()
+        for kind in FREQUENCY_KINDS.values():
+            pipe.zunionstore(cls._frequency_key(kind, "rolling"), [cls._frequency_key(kind, day) for day in days])
+        pipe.set(FREQUENCY_ROLLING_DAY_KEY, days[0], ex=2 * 86400)
+
+    @staticmethod
+    def _parse_context_cursor(since: str) -> Tuple[Optional[float], Optional[str]]:
+        """(timeline score, None) for a numeric cursor, (None, message id) otherwise"""
+        try:
+            score = float(since)
+        except ValueError:
+            return None, since
+        if math.isnan(score):
+            raise ValueError(f"Invalid cursor: {since}")
+        return score, None
+
+    @staticmethod
+    def _queue_delta_index_reads(pipe, cursor_score: Optional[float], cursor_id: Optional[str],
+                                 limit: int) -> None:
+        """Messages after the cursor (oldest first), their count and the total
+
+        Members sharing the cursor message's score are read separately: the sorted
+        set orders them by id, so the ones after cursor_id are newer too.
+        """
+        if cursor_score is None:
+            # initial sync: the newest `limit` messages
+            pipe.zrevrange("messages:timeline", 0, limit-1, withscores=True)
+        else:
+            pipe.zrangebyscore("messages:timeline", f"({cursor_score!r}", "+inf", start=0, num=limit, withscores=True)
+            pipe.zcount("messages:timeline", f"({cursor_score!r}", "+inf")
+            if cursor_id is not None:
+                pipe.zrangebyscore("messages:timeline", cursor_score, cursor_score, withscores=True)
+        pipe.zcard("messages:timeline")
+
+    @staticmethod
+    def _unpack_delta_index_reads(cursor_score: Optional[float], cursor_id: Optional[str], limit: int,
+                                  results: List[Any]) -> Tuple[List[Tuple[str, float]], int, int]:
+        """(new (id, score) pairs oldest first, count newer than the cursor, total)"""
+        if cursor_score is None:
+            newest, total_messages = results
+            return list(reversed(newest)), len(newest), total_messages
+        if cursor_id is None:
+            after, newer_count, total_messages = results
+            return after, newer_count, total_messages
+        after, newer_count, ties, total_messages = results
+        ties_after = [(member, score) for member, score in ties if member > cursor_id]
+        return (ties_after + after)[:limit], newer_count + len(ties_after), total_messages
+
+    def _assemble_delta(self, since: Optional[str], new_entries: List[Tuple[str, float]],
+                        hydrated: List[Tuple[str, Dict[str, str]]], positions: List[int],
+                        bodies: Dict[str, str], detail_level: str, newer_count: int,
+                        aggregates: Dict[str, List[Tuple[str, int]]], total_messages: int,
+                        retrieval_stats: Dict[str, int]) -> Dict[str, Any]:
+        """Delta payload: new messages oldest first, the next cursor and current aggregates"""
+        messages = []
+        for (msg_id, msg_data), position, (_, score) in zip(hydrated, positions, new_entries):
+            if msg_data:
+                messages.append({'id': msg_id, 'timeline_score': score,
+                                 **self._context_message(position, msg_id, msg_data, bodies, detail_level)})
+        
+        return {
+            'messages': messages,
+            # the newest message returned; pass it back as `since` on the next call
+            'cursor': new_entries[-1][0] if new_entries else since,
+            'cursor_score': new_entries[-1][1] if new_entries else None,
+            'has_more': newer_count > len(new_entries),
+            'remaining': max(newer_count - len(new_entries), 0),
+            **aggregates,
+            'total_messages': total_messages,
+            'detail_level_used': detail_level,
+            'retrieval_stats': retrieval_stats,
+            'context_generated_at': datetime.datetime.now().isoformat()
+        }
+
+    @staticmethod
+    def _timeline_bound(value: Optional[str], default: float) -> float:
+        """Timeline score for an ISO 8601 timestamp (naive = local time, as stored) or epoch seconds"""
+        if value is None or value == "":
+            return default
+        try:
+            score = float(value)
+        except ValueError:
+            try:
+                score = datetime.datetime.fromisoformat(value).timestamp()
+            except ValueError:
+                raise ValueError(f"Invalid timestamp: {value} (expected ISO 8601 or epoch seconds)")
+        if math.isnan(score):
+            raise ValueError(f"Invalid timestamp: {value}")
+        return score
+
+    @staticmethod
+    def _timeline_key(session_id: Optional[str] = None) -> str:
+        """messages:timeline, or one session's timeline"""
+        return f"session:{session_id}:timeline" if session_id else "messages:timeline"
+
+    @staticmethod
+    def _encode_timeline_cursor(order: str, start: float, end: float, score: float, msg_id: str,
+                                session_id: Optional[str] = None) -> str:
+        state = [order, start, end, score, msg_id] + ([session_id] if session_id else [])
+        encoded = json.dumps(state, separators=(',', ':'))
+        return base64.urlsafe_b64encode(encoded.encode('utf-8')).decode('ascii').rstrip('=')
+
+    @staticmethod
+    def _decode_timeline_cursor(cursor: str) -> Tuple[str, float, float, float, str, Optional[str]]:
+        """(order, start, end, last score, last id, session id or None) from an opaque cursor"""
+        try:
+            state = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            order, start, end, score, msg_id = state[:5]
+            session_id = state[5] if len(state) == 6 else None
+            if order not in TIMELINE_ORDERS or len(state) not in (5, 6):
+                raise ValueError(order)
+            return order, float(start), float(end), float(score), str(msg_id), session_id and str(session_id)
+        except (ValueError, TypeError, KeyError):
+            raise ValueError(f"Invalid cursor: {cursor}")
+
+    @staticmethod
+    def _timeline_fields(requested: Optional[List[str]]) -> Tuple[List[str], List[str]]:
+        """(fields to return, hash fields to HMGET); raises ValueError for unknown fields"""
+        available = {field.name for field in fields(ConversationMessage)} - {'compressed_content', 'id'}
+        available.add('compressed_length')
+        output = [field for field in (requested or TIMELINE_DEFAULT_FIELDS) if field != 'id']
+        unknown = sorted(set(output) - available)
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown} (available: {sorted(available)})")
+        # format_version and codec locate and decode the body; they also tell a missing hash apart
+        hash_fields = [field for field in output if field != 'content']
+        hash_fields += [field for field in ('format_version', 'codec') if field not in hash_fields]
+        return output, hash_fields
+
+    @staticmethod
+    def _queue_timeline_reads(pipe, order: str, start: float, end: float,
+                              after: Optional[Tuple[float, str]], limit: int,
+                              timeline_key: str = "messages:timeline") -> None:
+        """One page of (id, score) past `after` within [start, end), plus the range size
+
+        limit + 1 entries are read to tell whether another page follows. Members sharing
+        the last score are read separately: the sorted set orders them by id.
+        """
+        low, high = repr(start), f"({end!r}"
+        if after is not None:
+            last_score = after[0]
+            if order == "asc":
+                pipe.zrangebyscore(timeline_key, last_score, last_score)
+                low = f"({last_score!r}"
+            else:
+                pipe.zrevrangebyscore(timeline_key, last_score, last_score)
+                high = f"({last_score!r}"
+        if order == "asc":
+            pipe.zrangebyscore(timeline_key, low, high, start=0, num=limit + 1, withscores=True)
+        else:
+            pipe.zrevrangebyscore(timeline_key, high, low, start=0, num=limit + 1, withscores=True)
+        pipe.zcount(timeline_key, repr(start), f"({end!r}")
+
+    @staticmethod
+    def _unpack_timeline_reads(order: str, after: Optional[Tuple[float, str]], limit: int,
+                               results: List[Any]) -> Tuple[List[Tuple[str, float]], bool, int]:
+        """(page of (id, score), has_more, messages in range)"""
+        if after is None:
+            entries, in_range = results
+        else:
+            ties, rest, in_range = results
+            last_score, last_id = after
+            ties_after = [member for member in ties if (member > last_id if order == "asc" else member < last_id)]
+            entries = [(member, last_score) for member in ties_after] + rest
+        return entries[:limit], len(entries) > limit, in_range
+
+    @staticmethod
+    def _timeline_value(field: str, value: str) -> Any:
+        if field in MESSAGE_JSON_FIELDS:
+            return json.loads(value)
+        if field in MESSAGE_INT_FIELDS:
+            return int(value)
+        if field in MESSAGE_FLOAT_FIELDS:
+            return float(value)
+        return value
+
+    def _timeline_page(self, order: str, start: float, end: float, entries: List[Tuple[str, float]],
+                       hydrated: List[Tuple[str, Dict[str, str]]], output_fields: List[str],
+                       bodies: Dict[str, str], has_more: bool, in_range: int,
+                       retrieval_stats: Dict[str, int], session_id: Optional[str] = None) -> Dict[str, Any]:
+        messages = []
+        for (msg_id, score), (_, msg_data) in zip(entries, hydrated):
+            if not msg_data:
+                continue  # deleted since the index read
+            message = {'id': msg_id, 'timeline_score': score}
+            for field in output_fields:
+                if field == 'content':
+                    message['content'] = self._message_content(msg_id, msg_data, bodies)
+                elif field in msg_data:
+                    message[field] = self._timeline_value(field, msg_data[field])
+            messages.append(message)
+        
+        return {
+            'messages': messages,
+            'next_cursor': (self._encode_timeline_cursor(order, start, end, entries[-1][1], entries[-1][0], session_id)
+                            if has_more else None),
+            'has_more': has_more,
+            'messages_in_range': in_range,
+            'order': order,
+            'session_id': session_id,
+            'start': start if math.isfinite(start) else None,
+            'end': end if math.isfinite(end) else None,
+            'retrieval_stats': retrieval_stats
+        }
+
+    def _timeline_request(self, start: Optional[str], end: Optional[str], cursor: Optional[str], order: str,
+                          session_id: Optional[str] = None) -> Tuple[str, float, float, Optional[Tuple[float, str]], Optional[str]]:
+        """(order, start score, end score, last (score, id) or None, session id); a cursor carries all of them"""
+        if cursor:
+            order, start_score, end_score, last_score, last_id, cursor_session = self._decode_timeline_cursor(cursor)
+            if session_id and session_id != cursor_session:
+                raise ValueError(f"Cursor does not belong to session {session_id}")
+            return order, start_score, end_score, (last_score, last_id), cursor_session
+        if order not in TIMELINE_ORDERS:
+            raise ValueError(f"order must be one of {TIMELINE_ORDERS}")
+        start_score = self._timeline_bound(start, -math.inf)
+        end_score = self._timeline_bound(end, math.inf)
+        if start_score > end_score:
+            raise ValueError("start must not be after end")
+        return order, start_score, end_score, None, session_id or None
+
+    @staticmethod
+    def _activity_time(score: Optional[str]) -> Optional[str]:
+        """ISO timestamp (local time, like stored message timestamps) for a timeline score"""
+        return datetime.datetime.fromtimestamp(float(score)).isoformat() if score else None
+
+    @classmethod
+    def _session_summary(cls, session_id: str, stats: Dict[str, str]) -> Dict[str, Any]:
+        """A session:{id}:stats hash as returned by the session endpoints"""
+        return {
+            'session_id': session_id,
+            **{field: int(stats.get(field, 0)) for field in SESSION_COUNTER_FIELDS},
+            'first_activity': cls._activity_time(stats.get('first_activity')),
+            'last_activity': cls._activity_time(stats.get('last_activity'))
+        }
+
+    @staticmethod
+    def _queue_session_list_reads(pipe, limit: int, offset: int) -> None:
+        """Session ids by last activity (newest first) and the number of sessions"""
+        if limit < 1 or offset < 0:
+            raise ValueError("limit must be positive and offset must not be negative")
+        pipe.zrevrange(SESSION_ACTIVITY_KEY, offset, offset + limit - 1)
+        pipe.zcard(SESSION_ACTIVITY_KEY)
+
+    def _session_list(self, session_ids: List[str], stats: List[Dict[str, str]],
+                      total_sessions: int, limit: int, offset: int) -> Dict[str, Any]:
+        return {
+            'sessions': [self._session_summary(session_id, session_stats)
+                         for session_id, session_stats in zip(session_ids, stats) if session_stats],
+            'total_sessions': total_sessions,
+            'limit': limit,
+            'offset': offset,
+            'has_more': offset + len(session_ids) < total_sessions
+        }
+
+    @classmethod
+    def _queue_session_context_reads(cls, pipe, session_id: str, limit: int) -> None:
+        """The session's `limit` newest message ids (one range read) and its counters"""
+        pipe.zrevrange(cls._timeline_key(session_id), 0, limit - 1)
+        pipe.hgetall(f"session:{session_id}:stats")
+
+    @staticmethod
+    def _session_aggregates(hydrated: List[Tuple[str, Dict[str, str]]]) -> Dict[str, List[Tuple[str, int]]]:
+        """Top-k topics, keywords and technical terms among the fetched messages' projected fields"""
+        field_names = {kind: field for field, kind in FREQUENCY_KINDS.items()}
+        aggregates = {}
+        for name, (kind, top_k) in FREQUENCY_TOP_K.items():
+            counts = Counter()
+            for _, msg_data in hydrated:
+                counts.update(json.loads(msg_data.get(field_names[kind]) or '[]'))
+            aggregates[name] = counts.most_common(top_k)
+        return aggregates
+
+    def _assemble_session_context(self, session_id: str, stats: Dict[str, str],
+                                  snapshot: ContextSnapshot) -> Dict[str, Any]:
+        context = self._assemble_context(snapshot)
+        context['session'] = self._session_summary(session_id, stats)
+        return context
+
+    def _search_result(self, msg_id: str, msg_data: Dict[str, str], bodies: Dict[str, str],
+                       score: Optional[float] = None, summaries_only: bool = False) -> Dict[str, Any]:
+        """A search hit; summaries_only hits (SUMMARY_RESULT_FIELDS) carry the summaries instead of the body"""
+        if summaries_only:
+            return {
+                'id': msg_id,
+                'role': msg_data['role'],
+                'summary_short': msg_data.get('summary_short', ''),
+                'summary_medium': msg_data.get('summary_medium', ''),
+                'key_points': json.loads(msg_data.get('key_points', '[]')),
+                'technical_terms': json.loads(msg_data.get('technical_terms', '[]')),
+                'timestamp': msg_data['timestamp'],
+                'topics': json.loads(msg_data.get('topics', '[]')),
+                'keywords': json.loads(msg_data.get('keywords', '[]')),
+                'score': score
+            }
+        result = {
+            'id': msg_id,
+            'role': msg_data['role'],
+            'content': self._message_content(msg_id, msg_data, bodies),  # Full content available
+            'summary_medium': msg_data.get('summary_medium', ''),
+            'key_points': json.loads(msg_data.get('key_points', '[]')),
+            'technical_terms': json.loads(msg_data.get('technical_terms', '[]')),
+            'timestamp': msg_data['timestamp'],
+            'compression_ratio': float(msg_data.get('compression_ratio', 1.0)),
+            'topics': json.loads(msg_data.get('topics', '[]')),
+            'keywords': json.loads(msg_data.get('keywords', '[]'))
+        }
+        if score is not None:
+            result['score'] = score
+        return result
+
+    @staticmethod
+    def _queue_message_read(pipe, msg_id: str, fields: Optional[Tuple[str, ...]] = None) -> None:
+        if fields:
+            pipe.hmget(f"message:{msg_id}", list(fields))
+        else:
+            pipe.hgetall(f"message:{msg_id}")
+
+    @staticmethod
+    def _unpack_message_reads(message_ids: List[str], replies: List[Any],
+                              fields: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, Dict[str, str]]]:
+        """(id, hash) pairs; a projected message that does not exist comes back as {}"""
+        if fields:
+            replies = [{field: value for field, value in zip(fields, reply) if value is not None}
+                       for reply in replies]
+        return list(zip(message_ids, replies))
+
+    @staticmethod
+    def _search_keys(query_terms: List[str], search_scope: str) -> List[str]:
+        """Index keys consulted for a search scope"""
+        keys = []
+        for term in query_terms:
+            term_lower = term.lower()
+            
+            if search_scope in ["all", "topics"]:
+                keys.append(f"topic:{term_lower}")
+                keys.append(f"keyword:{term_lower}")
+            
+            if search_scope in ["all", "technical"]:
+                keys.append(f"tech:{term_lower}")
+        return keys
+
+    @classmethod
+    def _search_plan(cls, query_terms: List[str], search_scope: str, query: Optional[str]) -> QueryPlan:
+        """Compile a boolean query (or the query_terms list, as any of the terms) for a tag scope
+
+        Each term matches the union of its tag postings in the scope; temporary keys are
+        search:scratch:{uuid}:{n}. Raises ValueError for a malformed query.
+        """
+        node = parse_query(query) if query else terms_query(query_terms)
+        return compile_query(node, lambda term: cls._search_keys([term], search_scope),
+                             f"search:scratch:{uuid4().hex}")
+
+    @staticmethod
+    def _queue_search_candidates(pipe, plan: QueryPlan, limit: int) -> None:
+        """Newest `limit` messages matching a compiled query (one MULTI; only the ids leave Redis)
+
+        The plan's commands run on temporary keys and keep the postings' timestamp scores,
+        so the result is read newest first directly (a single tag is one ZREVRANGE on its
+        posting). Replies: [one per plan step, matches, ids, deleted if any temporary key].
+        """
+        for command, destination, keys, options in plan.steps:
+            getattr(pipe, command)(destination, keys, **options)
+        pipe.zcard(plan.result_key)
+        pipe.zrevrange(plan.result_key, 0, limit - 1)
+        if plan.temporary_keys:
+            pipe.delete(*plan.temporary_keys)
+
+    @staticmethod
+    def _fulltext_search_args(query: List[str], limit: int,
+                              index: TextIndex = FULLTEXT_INDEX) -> Optional[Tuple[List[str], list]]:
+        """KEYS and ARGV for FULLTEXT_SEARCH_SCRIPT (None when the query has no index terms)"""
+        terms = query_terms(query)
+        if not terms:
+            return None
+        keys = [index.term_key(term) for term in terms] + [index.lengths_key, index.stats_key]
+        return keys, [limit, BM25_K1, BM25_B, BM25_MAX_DF, BM25_SCAN_LIMIT]
+
+    @staticmethod
+    def _unpack_fulltext_search(reply: List[Any]) -> Tuple[int, List[str], Dict[str, float]]:
+        """(matching messages, ids best first, BM25 score per id)"""
+        ranked = reply[1:]
+        scores = {ranked[i]: float(ranked[i + 1]) for i in range(0, len(ranked), 2)}
+        return int(reply[0]), list(scores), scores
+
+    @staticmethod
+    def _check_query_scope(search_scope: str, query: Optional[str]) -> None:
+        if query and (search_scope in RANKED_SEARCH_SCOPES or search_scope == VECTOR_SEARCH_SCOPE):
+            raise ValueError(f"Boolean queries apply to the tag scopes (all, topics, technical), not {search_scope}")
+
+    def _search_cache_key(self, terms: List[str], search_scope: str,
+                          query: Optional[str]) -> Tuple[Optional[str], List[str]]:
+        """(normalized cache key, index keys whose generations tag the entry); (None, []) when not cached
+
+        A tag-scope result depends only on the postings of its terms; a ranked result also on
+        the corpus statistics, so it is tagged with the whole index's generation.
+        """
+        if self.search_cache is None or not self.search_cache.enabled:
+            return None, []
+        if search_scope in RANKED_SEARCH_SCOPES:
+            tokens = sorted(query_terms(terms))
+            return f"{search_scope}:{' '.join(tokens)}", [RANKED_SEARCH_SCOPES[search_scope].stats_key]
+        node = parse_query(query) if query else terms_query(terms)
+        return f"{search_scope}:{canonical_query(node)}", self._query_posting_keys(node, search_scope)
+
+    @classmethod
+    def _query_posting_keys(cls, node: Any, search_scope: str) -> List[str]:
+        """Distinct tag postings a parsed tag-scope query reads"""
+        return list(dict.fromkeys(key for term in query_term_values(node)
+                                  for key in cls._search_keys([term], search_scope)))
+
+    @classmethod
+    def _capped_posting_keys(cls, terms: List[str], search_scope: str, query: Optional[str]) -> List[str]:
+        """Postings to check against TAG_POSTINGS_CAP (none when uncapped or for ranked / similar scopes)"""
+        if not TAG_POSTINGS_CAP or search_scope in RANKED_SEARCH_SCOPES or search_scope == VECTOR_SEARCH_SCOPE:
+            return []
+        return cls._query_posting_keys(parse_query(query) if query else terms_query(terms), search_scope)
+
+    @staticmethod
+    def _similar_query(text: str) -> Any:
+        """Query vector of a text, built like the stored message vectors"""
+        return term_vector(index_terms(text)[0])
+
+    @staticmethod
+    def _unpack_similar_hits(matches: int, hits: List[Tuple[str, float]]) -> Tuple[int, List[str], Dict[str, float]]:
+        return matches, [msg_id for msg_id, _ in hits], dict(hits)
+
+    def _similar_response(self, message_id: Optional[str], matches: int, results: List[Dict]) -> Dict[str, Any]:
+        return {
+            'source_message_id': message_id,
+            'matches': matches,
+            'results': results,
+            'index': self.vector_index.stats()
+        }
+
+    @staticmethod
+    def _chunk_starts(count: int, chunk_size: int) -> range:
+        """Chunk offsets; one empty chunk when count is 0 so a stream header is still produced"""
+        return range(0, max(count, 1), chunk_size)
+
+    @staticmethod
+    def _stream_stats(round_trips: int) -> Dict[str, int]:
+        return {'round_trips': round_trips, 'messages_hydrated': 0, 'bodies_fetched': 0, 'chunks': 0}
+
+    @staticmethod
+    def _count_stream_chunk(stats: Dict[str, int], hydrated: List[Tuple[str, Dict[str, str]]],
+                            body_targets: List[Tuple[str, Optional[str]]]) -> None:
+        stats['round_trips'] += 1 + (1 if body_targets else 0)
+        stats['messages_hydrated'] += len(hydrated)
+        stats['bodies_fetched'] += len(body_targets)
+        stats['chunks'] += 1
+
+    @staticmethod
+    def _context_stream_header(aggregates: Dict[str, List[Tuple[str, int]]], top_insights: List[Dict],
+                               total_saved: int, total_messages: int, detail_level: str) -> Dict[str, Any]:
+        """First stream event: everything in the context payload except the messages"""
+        return {
+            'type': 'context',
+            **aggregates,
+            'key_insights': top_insights,
+            'total_messages': total_messages,
+            'compression_stats': {
+                'total_bytes_saved': total_saved,
+                'detail_level_used': detail_level
+            },
+            'context_generated_at': datetime.datetime.now().isoformat()
+        }
+
+    def _context_stream_messages(self, positions: List[int], hydrated: List[Tuple[str, Dict[str, str]]],
+                                 bodies: Dict[str, str], detail_level: str) -> Iterator[Dict[str, Any]]:
+        for position, (msg_id, msg_data) in zip(positions, hydrated):
+            if msg_data:
+                yield {'type': 'message', 'position': position, 'id': msg_id,
+                       **self._context_message(position, msg_id, msg_data, bodies, detail_level)}
+
+    @staticmethod
+    def _insight_summary(insight_data: Dict[str, str]) -> Dict[str, Any]:
+        return {
+            'type': insight_data['insight_type'],
+            'content': insight_data['content'],
+            'summary': insight_data.get('summary', ''),
+            'business_area': insight_data['business_area'],
+            'relevance_score': float(insight_data['relevance_score']),
+            'impact_level': insight_data.get('impact_level', 'medium'),
+            'actionable_items': json.loads(insight_data.get('actionable_items', '[]')),
+            'source_messages': json.loads(insight_data.get('source_messages', '[]'))
+        }
+
+class ConversationRedisManager(_ConversationStoreBase):
+    """Enhanced Redis-based conversation management system with smart compression"""
+    
+    def __init__(self, host='localhost', port=6379, db=0, password=None, 
+                 use_ssl=False, decode_responses=True, context_cache=None, vector_index=None,
+                 search_cache=None):
+        """Initialize Redis connection with enhanced features
+
+        context_cache: optional context_cache.ContextCache for context/export results
+        vector_index: vector_index.VectorIndex serving the similar scope (exact search by default)
+        search_cache: optional search_cache.SearchCache for search candidates
+        """
+        try:
+            connection_kwargs = dict(
+                host=host, port=port, db=db, password=password, ssl=use_ssl,
+                socket_connect_timeout=10, socket_timeout=10,
+                retry_on_timeout=True, health_check_interval=30
+            )
+            self.redis_client = redis.Redis(decode_responses=decode_responses, **connection_kwargs)
+            # v3 bodies are raw compressed bytes and must never be decoded
+            self.binary_client = redis.Redis(decode_responses=False, **connection_kwargs)
+            self.redis_client.ping()
+            self.processor = SmartTextProcessor()
+            self.codecs = CodecRegistry.from_env()
+            self.context_cache = context_cache
+            self.vector_index = vector_index if vector_index is not None else VectorIndex()
+            self.search_cache = search_cache
+            self._save_script = self.redis_client.register_script(SAVE_MESSAGES_SCRIPT)
+            self._fulltext_script = self.redis_client.register_script(FULLTEXT_SEARCH_SCRIPT)
+            self.load_active_dictionary()
+            self.load_vocabulary()
+            logger.info("Enhanced Redis connection established successfully")
+        except redis.ConnectionError as e:
+            logger.error(f"Failed to connect to Redis: {e}")
+            raise
+    
+    def save_message(self, role: str, content: str, topics: List[str] = None, 
+                    keywords: List[str] = None, session_id: str = None,
+                    ingest_mode: str = "sync") -> str:
+        """
+        Enhanced save_message with intelligent compression and multi-layer summarization
+        【優先度1解決】: 詳細情報の完全保存により切り詰め問題を解決
+        【優先度2解決】: zlib圧縮によりストレージ効率化
+        ingest_mode="deferred" stores the raw message and leaves enrichment to the workers.
+        """
+        deferred = self._check_ingest_mode(ingest_mode)
+        message, timestamp_numeric = self._build_message(role, content, topics, keywords, session_id,
+                                                         deferred=deferred)
+        
+        # Store in Redis with multiple access patterns: one atomic EVALSHA
+        self._write_messages([(message, timestamp_numeric)])
+        
+        logger.info(f"Enhanced message {message.id} saved with {message.compression_ratio:.2f} compression ratio")
+        return message.id
+    
+    def save_messages(self, items: List[Dict[str, Any]], ingest_mode: str = "sync") -> List[Dict[str, Any]]:
+        """
+        Save a batch of messages atomically in a single round trip
+        items: dicts with role, content and optional topics, keywords, session_id, timestamp.
+        Items without a session_id join today's session.
+        """
+        deferred = self._check_ingest_mode(ingest_mode)
+        if not items:
+            return []
+        
+        entries = self._build_messages(items, deferred)
+        self._write_messages(entries)
+        
+        logger.info(f"Enhanced batch of {len(entries)} messages saved")
+        return [self._save_result(message) for message, _ in entries]
+    
+    def save_insight(self, insight_type: str, content: str, source_messages: List[str],
+                    relevance_score: float, business_area: str, summary: str = "",
+                    impact_level: str = "medium", actionable_items: List[str] = None) -> str:
+        """Enhanced save_insight with additional context"""
+        insight = self._build_insight(insight_type, content, source_messages, relevance_score,
+                                      business_area, summary, impact_level, actionable_items)
+        
+        pipe = self.redis_client.pipeline()
+        self._queue_insight_writes(pipe, insight)
+        pipe.execute()
+        
+        logger.info(f"Enhanced insight {insight.id} saved")
+        return insight.id
+    
+    def get_conversation_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                 token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Enhanced context retrieval with configurable detail levels
+        【優先度1解決】: content[:500]制限を完全廃止、適応的詳細レベル提供
+        【優先度3解決】: AI文脈理解の大幅改善
+        
+        detail_level options:
+        - "short": Use short summaries (for quick context)
+        - "medium": Use medium summaries (balanced)
+        - "full": Use full content (for detailed analysis)
+        - "adaptive": Mix based on message importance and recency
+        
+        token_budget replaces detail_level: each of the `limit` newest messages gets the
+        representation (full, medium, short or left out) that maximizes recency-weighted
+        information within the budget, using token estimates stored at write time.
+        
+        Served from the context cache while no write has happened since it was built.
+        """
+        detail_level = self._effective_detail_level(detail_level, token_budget)
+        return self._through_context_cache(
+            limit, detail_level, None,
+            lambda: self._assemble_context(self._fetch_context(limit, detail_level, token_budget)),
+            token_budget
+        )
+    
+    def _fetch_context(self, limit: int, detail_level: str, token_budget: Optional[int] = None) -> ContextSnapshot:
+        """Fetch stage: at most three round trips (four on the first read of a day)"""
+        # Round trip 1: timeline ids, top insight ids, counters and frequency top-k
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_index_reads(pipe, limit)
+        self._queue_frequency_reads(pipe)
+        results = pipe.execute()
+        recent_message_ids, insight_ids, total_saved, total_messages = results[:4]
+        aggregates, rebuild_trips = self._rolling_frequencies(results[4:])
+        
+        # Round trip 2: projected HMGETs for every message and insight
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, recent_message_ids, detail_level, insight_ids)
+        hydrated, top_insights = self._unpack_context_reads(recent_message_ids, field_lists, pipe.execute())
+        
+        sources, packing = self._pack_context(hydrated, token_budget) if token_budget is not None else (None, None)
+        
+        # Round trip 3 (only when some position renders a body)
+        targets = self._body_ids_to_fetch(hydrated, detail_level, sources=sources)
+        bodies = self._fetch_bodies(targets)
+        
+        retrieval_stats = self._retrieval_stats(hydrated, targets)
+        retrieval_stats['round_trips'] += rebuild_trips
+        return ContextSnapshot(detail_level, hydrated, bodies, top_insights, int(total_saved or 0),
+                               total_messages, aggregates, retrieval_stats, sources, packing)
+
+    def get_timeline_page(self, start: Optional[str] = None, end: Optional[str] = None,
+                          cursor: Optional[str] = None, limit: int = 100,
+                          fields: Optional[List[str]] = None, order: str = "asc",
+                          session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        One page of messages with timestamps in [start, end), for scans of any length
+        
+        start/end: ISO 8601 timestamps or epoch seconds (open-ended when omitted).
+        cursor: the previous page's next_cursor; it carries order, range and session, so
+        only limit and fields are taken from the call. fields projects the message hash
+        (TIMELINE_DEFAULT_FIELDS by default; "content" reads the body). session_id pages
+        through that session's timeline only. Keyset pagination: each page costs at most
+        three round trips and `limit` messages of memory wherever it is in the range.
+        Raises ValueError for bad bounds, cursors or fields.
+        """
+        order, start_score, end_score, after, session_id = self._timeline_request(start, end, cursor, order, session_id)
+        output_fields, hash_fields = self._timeline_fields(fields)
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_timeline_reads(pipe, order, start_score, end_score, after, limit, self._timeline_key(session_id))
+        entries, has_more, in_range = self._unpack_timeline_reads(order, after, limit, pipe.execute())
+        
+        message_ids = [msg_id for msg_id, _ in entries]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            pipe.hmget(f"message:{msg_id}", hash_fields)
+        hydrated = [(msg_id, self._projected(hash_fields, values))
+                    for msg_id, values in zip(message_ids, pipe.execute() if message_ids else [])]
+        
+        targets = self._body_ids_to_fetch(hydrated) if 'content' in output_fields else []
+        bodies = self._fetch_bodies(targets)
+        return self._timeline_page(order, start_score, end_score, entries, hydrated, output_fields, bodies,
+                                   has_more, in_range, self._retrieval_stats(hydrated, targets), session_id)
+    
+    def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Message count, content/stored size and first/last activity of a session (None if unknown)"""
+        stats = self.redis_client.hgetall(f"session:{session_id}:stats")
+        return self._session_summary(session_id, stats) if stats else None
+    
+    def list_sessions(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Sessions by last activity, newest first, with their counters (two round trips)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_session_list_reads(pipe, limit, offset)
+        session_ids, total_sessions = pipe.execute()
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(f"session:{session_id}:stats")
+        stats = pipe.execute() if session_ids else []
+        return self._session_list(session_ids, stats, total_sessions, limit, offset)
+    
+    def get_session_context(self, session_id: str, limit: int = 50, detail_level: str = "adaptive",
+                            token_budget: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        get_conversation_context scoped to one session (None if the session is unknown)
+        
+        The session's `limit` newest messages come from a single range read on
+        session:{id}:timeline; aggregates count those messages, insights are not included
+        and `session` carries the session's counters.
+        """
+        detail_level = self._effective_detail_level(detail_level, token_budget)
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_session_context_reads(pipe, session_id, limit)
+        message_ids, stats = pipe.execute()
+        if not stats:
+            return None
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, message_ids, detail_level, [])
+        hydrated, _ = self._unpack_context_reads(message_ids, field_lists, pipe.execute() if message_ids else [])
+        
+        sources, packing = self._pack_context(hydrated, token_budget) if token_budget is not None else (None, None)
+        targets = self._body_ids_to_fetch(hydrated, detail_level, sources=sources)
+        bodies = self._fetch_bodies(targets)
+        
+        snapshot = ContextSnapshot(detail_level, hydrated, bodies, [], 0, int(stats.get('messages', 0)),
+                                   self._session_aggregates(hydrated), self._retrieval_stats(hydrated, targets),
+                                   sources, packing)
+        return self._assemble_session_context(session_id, stats, snapshot)
+    
+    def stream_conversation_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                    chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Dict[str, Any]]:
+        """
+        get_conversation_context as a stream of events, hydrated chunk_size messages at a time
+        
+        Yields a 'context' header (aggregates, insights, totals), one 'message' event per
+        message newest first, then an 'end' event with retrieval stats. Memory stays
+        bounded by chunk_size whatever the limit; the context cache is not used.
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_index_reads(pipe, limit)
+        self._queue_frequency_reads(pipe)
+        results = pipe.execute()
+        message_ids, insight_ids, total_saved, total_messages = results[:4]
+        aggregates, rebuild_trips = self._rolling_frequencies(results[4:])
+        
+        stats = self._stream_stats(1 + rebuild_trips)
+        for start in self._chunk_starts(len(message_ids), chunk_size):
+            chunk_ids = message_ids[start:start + chunk_size]
+            positions = list(range(start, start + len(chunk_ids)))
+            pipe = self.redis_client.pipeline(transaction=False)
+            field_lists = self._queue_context_reads(pipe, chunk_ids, detail_level,
+                                                    insight_ids if start == 0 else [], positions)
+            hydrated, top_insights = self._unpack_context_reads(chunk_ids, field_lists, pipe.execute())
+            if start == 0:
+                yield self._context_stream_header(aggregates, top_insights, int(total_saved or 0),
+                                                  total_messages, detail_level)
+            
+            targets = self._body_ids_to_fetch(hydrated, detail_level, positions)
+            bodies = self._fetch_bodies(targets)
+            self._count_stream_chunk(stats, hydrated, targets)
+            yield from self._context_stream_messages(positions, hydrated, bodies, detail_level)
+        yield {'type': 'end', 'retrieval_stats': stats}
+    
+    def stream_export_for_ai_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                     chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[str]:
+        """Bullet-format export rendered line by line as stream_conversation_context hydrates"""
+        for event in self.stream_conversation_context(limit, detail_level, chunk_size):
+            text = bullet_event(event)
+            if text:
+                yield text
+
+    def get_context_delta(self, since: Optional[str] = None, limit: int = 50,
+                          detail_level: str = "adaptive") -> Dict[str, Any]:
+        """
+        Messages newer than a cursor, for clients that already hold the earlier context
+        
+        since: the `cursor` of the previous call (a message id) or a timeline score;
+        None returns the newest `limit` messages. Messages come oldest first, at most
+        `limit` of them (has_more tells the client to call again with the new cursor),
+        rendered with the detail level of their timeline position. Frequency aggregates
+        are the rolling-window ones /context returns.
+        Raises ValueError for a message id that is not on the timeline.
+        """
+        round_trips = 0
+        cursor_score, cursor_id = (None, None) if since is None else self._parse_context_cursor(since)
+        if cursor_id is not None:
+            cursor_score = self.redis_client.zscore("messages:timeline", cursor_id)
+            round_trips += 1
+            if cursor_score is None:
+                raise ValueError(f"Unknown cursor: {since}")
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_delta_index_reads(pipe, cursor_score, cursor_id, limit)
+        index_reads = len(pipe)
+        self._queue_frequency_reads(pipe)
+        results = pipe.execute()
+        new_entries, newer_count, total_messages = self._unpack_delta_index_reads(
+            cursor_score, cursor_id, limit, results[:index_reads])
+        aggregates, rebuild_trips = self._rolling_frequencies(results[index_reads:])
+        
+        new_ids = [msg_id for msg_id, _ in new_entries]
+        positions = [newer_count - 1 - i for i in range(len(new_ids))]
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, new_ids, detail_level, [], positions)
+        hydrated, _ = self._unpack_context_reads(new_ids, field_lists, pipe.execute())
+        
+        targets = self._body_ids_to_fetch(hydrated, detail_level, positions)
+        bodies = self._fetch_bodies(targets)
+        
+        retrieval_stats = self._retrieval_stats(hydrated, targets)
+        retrieval_stats['round_trips'] += round_trips + rebuild_trips
+        return self._assemble_delta(since, new_entries, hydrated, positions, bodies, detail_level, newer_count,
+                                    aggregates, total_messages, retrieval_stats)
+    
+    def _rolling_frequencies(self, results: List[Any]) -> Tuple[Dict[str, List[Tuple[str, int]]], int]:
+        """Aggregates from _queue_frequency_reads replies, rebuilding stale rolling sets first
+
+        Returns (aggregates, extra round trips): the first reader of a day pays one MULTI.
+        """
+        current, aggregates = self._unpack_frequency_reads(results)
+        if current:
+            return aggregates, 0
+        pipe = self.redis_client.pipeline()
+        self._queue_rolling_rebuild(pipe)
+        rebuild_commands = len(pipe)
+        self._queue_frequency_reads(pipe)
+        _, aggregates = self._unpack_frequency_reads(pipe.execute()[rebuild_commands:])
+        return aggregates, 1
+    
+    def search_conversations(self, query_terms: List[str], limit: int = 20,
+                           search_scope: str = "all", query: Optional[str] = None) -> List[Dict]:
+        """
+        Enhanced search with technical terms and full content access
+        【優先度1解決】: 検索結果で完全なコンテンツにアクセス可能
+
+        query: boolean query (AND / OR / NOT, parentheses, "quoted tags") used in place of
+        query_terms for the tag scopes; raises ValueError when it is malformed.
+        """
+        _, message_ids, scores = self._search_candidates(query_terms, search_scope, limit, query)
+        
+        # Retrieve and enhance results with full content access (candidates are in rank order);
+        # summary-scope hits read only the summary fields
+        summaries_only = search_scope == "summaries"
+        hydrated = self._hydrate_messages(message_ids, SUMMARY_RESULT_FIELDS if summaries_only else None)
+        bodies = self._fetch_bodies([] if summaries_only else self._body_ids_to_fetch(hydrated))
+        
+        return [self._search_result(msg_id, msg_data, bodies, scores.get(msg_id), summaries_only)
+                for msg_id, msg_data in hydrated if msg_data]
+    
+    def search_truncated(self, query_terms: List[str], search_scope: str = "all",
+                         query: Optional[str] = None) -> bool:
+        """Whether a posting the query reads is at TAG_POSTINGS_CAP, i.e. older matches may be missing"""
+        keys = self._capped_posting_keys(query_terms, search_scope, query)
+        if not keys:
+            return False
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zcard(key)
+        return any(count >= TAG_POSTINGS_CAP for count in pipe.execute())
+    
+    def _search_candidates(self, query_terms: List[str], search_scope: str, limit: int,
+                           query: Optional[str] = None) -> Tuple[int, List[str], Dict[str, float]]:
+        """(number of matching messages, top `limit` matching ids, score per id if ranked)
+
+        "fulltext" ranks message bodies and "summaries" their summaries and key points by
+        BM25, "similar" by cosine similarity; the tag scopes return the newest matches.
+        With a search cache, results are reused until a posting they were read from changes.
+        """
+        self._check_query_scope(search_scope, query)
+        if search_scope == VECTOR_SEARCH_SCOPE:
+            return self._similar_candidates(" ".join(query_terms), limit)
+        cache_key, generation_keys = self._search_cache_key(query_terms, search_scope, query)
+        if not generation_keys:
+            return self._search_index(query_terms, search_scope, limit, query)
+        # Generations read before the search: a write in between only makes the entry miss later
+        generations = self.redis_client.hmget(SEARCH_GENERATIONS_KEY, [SEARCH_EPOCH_FIELD, *generation_keys])
+        hits = self.search_cache.lookup(cache_key, generations, limit)
+        if hits is None:
+            hits = self._search_index(query_terms, search_scope, limit, query)
+            if generations[0] is None:
+                # No epoch yet (fresh or flushed Redis): start one, cache from the next search on
+                self.redis_client.hsetnx(SEARCH_GENERATIONS_KEY, SEARCH_EPOCH_FIELD, uuid4().hex)
+            else:
+                self.search_cache.store(cache_key, generations, limit, hits)
+        return hits
+    
+    def _search_index(self, query_terms: List[str], search_scope: str, limit: int,
+                      query: Optional[str] = None) -> SearchHits:
+        """_search_candidates without the cache"""
+        if search_scope in RANKED_SEARCH_SCOPES:
+            search_args = self._fulltext_search_args(query_terms, limit, RANKED_SEARCH_SCOPES[search_scope])
+            if search_args is None:
+                return 0, [], {}
+            keys, args = search_args
+            return self._unpack_fulltext_search(self._fulltext_script(keys=keys, args=args))
+        plan = self._search_plan(query_terms, search_scope, query)
+        if not plan.result_key:
+            return 0, [], {}
+        pipe = self.redis_client.pipeline()
+        self._queue_search_candidates(pipe, plan, limit)
+        matches, message_ids = (pipe.execute())[len(plan.steps):len(plan.steps) + 2]
+        return matches, message_ids, {}
+    
+    def _sync_vectors(self) -> None:
+        """Bring the local vector matrix up to date (one round trip, two when rows were added)"""
+        pipe = self.binary_client.pipeline(transaction=False)
+        self.vector_index.queue_sync_head(pipe)
+        tail = self.vector_index.tail_range(pipe.execute())
+        if tail:
+            pipe = self.binary_client.pipeline(transaction=False)
+            self.vector_index.queue_tail_reads(pipe, *tail)
+            self.vector_index.apply_tail(*tail, pipe.execute())
+    
+    def _similar_candidates(self, text: str, limit: int,
+                            exclude: Optional[str] = None) -> Tuple[int, List[str], Dict[str, float]]:
+        self._sync_vectors()
+        return self._unpack_similar_hits(*self.vector_index.search(self._similar_query(text), limit, exclude))
+    
+    def find_similar(self, text: Optional[str] = None, message_id: Optional[str] = None,
+                     limit: int = 10) -> Optional[Dict[str, Any]]:
+        """
+        Messages most similar to a text or to a stored message (cosine over hashed term vectors)
+        
+        Returns None when message_id does not exist; the message itself is not among the
+        results. Raises ValueError when neither text nor message_id is given.
+        """
+        if message_id:
+            source = self._hydrate_messages([message_id])
+            if not source[0][1]:
+                return None
+            text = self._message_content(message_id, source[0][1], self._fetch_bodies(self._body_ids_to_fetch(source)))
+        elif not text:
+            raise ValueError("Either text or message_id is required")
+        
+        matches, message_ids, scores = self._similar_candidates(text, limit, exclude=message_id)
+        hydrated = self._hydrate_messages(message_ids)
+        bodies = self._fetch_bodies(self._body_ids_to_fetch(hydrated))
+        return self._similar_response(message_id, matches, [
+            self._search_result(msg_id, msg_data, bodies, scores.get(msg_id)) for msg_id, msg_data in hydrated if msg_data
+        ])
+    
+    def stream_search(self, query_terms: List[str], limit: int = 20, search_scope: str = "all",
+                      chunk_size: int = STREAM_CHUNK_SIZE, query: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        search_conversations as a stream of events, hydrated chunk_size results at a time
+        
+        Yields a 'search' header (match count, and truncated: see search_truncated), one
+        'result' event per message in search_conversations order, then an 'end' event
+        with retrieval stats.
+        """
+        matches, message_ids, scores = self._search_candidates(query_terms, search_scope, limit, query)
+        yield {'type': 'search', 'matches': matches, 'returning': len(message_ids),
+               'truncated': self.search_truncated(query_terms, search_scope, query)}
+        
+        summaries_only = search_scope == "summaries"
+        stats = self._stream_stats(1)
+        for start in range(0, len(message_ids), chunk_size):
+            hydrated = self._hydrate_messages(message_ids[start:start + chunk_size],
+                                             SUMMARY_RESULT_FIELDS if summaries_only else None)
+            targets = [] if summaries_only else self._body_ids_to_fetch(hydrated)
+            bodies = self._fetch_bodies(targets)
+            self._count_stream_chunk(stats, hydrated, targets)
+            for msg_id, msg_data in hydrated:
+                if msg_data:
+                    yield {'type': 'result', **self._search_result(msg_id, msg_data, bodies, scores.get(msg_id),
+                                                                   summaries_only)}
+        yield {'type': 'end', 'retrieval_stats': stats}
+    
+    def _hydrate_messages(self, message_ids: List[str],
+                          fields: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, Dict[str, str]]]:
+        """(id, message hash) pairs read in one pipelined round trip; fields projects the hash"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            self._queue_message_read(pipe, msg_id, fields)
+        return self._unpack_message_reads(message_ids, pipe.execute(), fields) if message_ids else []
+    
+    def _fetch_bodies(self, targets: List[Tuple[str, Optional[str]]]) -> Dict[str, str]:
+        """Read and decompress bodies (plus any missing zstd dictionaries) in one round trip"""
+        if not targets:
+            return {}
+        pipe = self.binary_client.pipeline(transaction=False)
+        dictionaries_queued = self._queue_body_reads(pipe, targets)
+        return self._unpack_body_reads(targets, dictionaries_queued, pipe.execute())
+    
+    def load_active_dictionary(self) -> Optional[int]:
+        """Load the active zstd dictionary (if one was trained) into the codec registry"""
+        active_dict_id = self.binary_client.get(ACTIVE_DICTIONARY_KEY)
+        if active_dict_id:
+            self._register_dictionaries([self.binary_client.hget(DICTIONARY_HASH_KEY, active_dict_id)], active_dict_id)
+        return self.codecs.active_dict_id
+    
+    def load_vocabulary(self) -> Vocabulary:
+        """Install the vocabulary file merged with the Redis vocabulary sets"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_vocabulary_reads(pipe)
+        return self._install_vocabulary(pipe.execute())
+    
+    def train_compression_dictionary(self, sample_limit: int = 1000, dict_size: int = 112 * 1024) -> Dict[str, Any]:
+        """Train a zstd dictionary from the most recent message bodies and make it active"""
+        recent_ids = self.redis_client.zrevrange("messages:timeline", 0, sample_limit - 1)
+        entries = self._hydrate_messages(recent_ids)
+        bodies = self._fetch_bodies(self._body_ids_to_fetch(entries))
+        samples = [self._message_content(msg_id, msg_data, bodies).encode('utf-8') for msg_id, msg_data in entries if msg_data]
+        
+        dictionary = train_dictionary(samples, dict_size)
+        dict_id = self.codecs.add_dictionary(dictionary, activate=True)
+        pipe = self.redis_client.pipeline()
+        pipe.hset(DICTIONARY_HASH_KEY, str(dict_id), dictionary)
+        pipe.set(ACTIVE_DICTIONARY_KEY, str(dict_id))
+        pipe.execute()
+        
+        logger.info(f"Trained zstd dictionary {dict_id} from {len(samples)} messages")
+        return {'dict_id': dict_id, 'samples': len(samples), 'dict_size': len(dictionary)}
+    
+    def _write_messages(self, entries: List[Tuple[ConversationMessage, float]]) -> None:
+        """Run the save script: session, hashes, bodies, indexes and analytics in one EVALSHA"""
+        keys, args = self._message_save_args(entries)
+        self._apply_default_session(entries, self._save_script(keys=keys, args=args))
+    
+    def _get_top_insights(self, limit: int) -> List[Dict]:
+        """Get top insights by relevance score (ids, then one pipelined HMGET round trip)"""
+        top_insight_ids = self.redis_client.zrevrange("insights:by_relevance", 0, limit-1)
+        if not top_insight_ids:
+            return []
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_insight_reads(pipe, top_insight_ids)
+        return self._insight_summaries(pipe.execute())
+    
+    def export_for_ai_context(self, format_type: str = "narrative", detail_level: str = "adaptive",
+                              limit: int = 50, token_budget: Optional[int] = None) -> str:
+        """
+        Enhanced AI context export with improved formatting
+        【優先度3解決】: AI文脈理解の大幅改善
+        
+        Renders the (cached) get_conversation_context payload; format_type is one of
+        context_renderers.CONTEXT_RENDERERS (structured / narrative / bullet).
+        """
+        return self._through_context_cache(
+            limit, self._effective_detail_level(detail_level, token_budget), format_type,
+            lambda: render_context(self.get_conversation_context(limit, detail_level, token_budget), format_type),
+            token_budget
+        )
+    
+    def _through_context_cache(self, limit: int, detail_level: str, format_type: Optional[str], build,
+                               token_budget: Optional[int] = None):
+        """build() unless the cache holds a result for the current epoch, generation and day"""
+        if not self._context_cache_enabled():
+            return build()
+        
+        key = self.context_cache.key(limit, detail_level, format_type, token_budget)
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_cache_read(pipe, key)
+        tag, cached = self._lookup_cached_context(key, pipe.execute())
+        if cached is not None:
+            return cached
+        
+        result = self._mark_cache_miss(build())
+        pipe = self.redis_client.pipeline(transaction=False)
+        if self._queue_context_cache_store(pipe, key, tag, result):
+            pipe.execute()
+        return result
+
+class AsyncConversationRedisManager(_ConversationStoreBase):
+    """asyncio counterpart of ConversationRedisManager for the FastAPI routes
+
+    Uses redis.asyncio with one shared connection pool, so concurrent requests
+    never block the event loop on Redis round trips. Construct it with
+    ``await AsyncConversationRedisManager.create(...)`` and release it with
+    ``await manager.close()``.
+    
+    text_processing: optional service with ``async analyze(text)`` (see
+    processing_service.TextProcessingService) that takes summarization and
+    extraction off the event loop; without it they run inline.
+    
+    context_cache: optional context_cache.ContextCache; in redis mode all
+    workers sharing the Redis instance share its entries.
+    
+    search_cache: optional search_cache.SearchCache for search candidates.
+    """
+    
+    def __init__(self, host='localhost', port=6379, db=0, password=None,
+                 use_ssl=False, decode_responses=True, max_connections=50,
+                 text_processing=None, context_cache=None, vector_index=None, search_cache=None):
+        connection_kwargs = dict(
+            host=host, port=port, db=db, password=password, ssl=use_ssl,
+            socket_connect_timeout=10, socket_timeout=10,
+            retry_on_timeout=True, health_check_interval=30,
+            max_connections=max_connections
+        )
+        self.redis_client = redis.asyncio.Redis(decode_responses=decode_responses, **connection_kwargs)
+        # v3 bodies are raw compressed bytes and must never be decoded
+        self.binary_client = redis.asyncio.Redis(decode_responses=False, **connection_kwargs)
+        self.processor = SmartTextProcessor()
+        self.codecs = CodecRegistry.from_env()
+        self.text_processing = text_processing
+        self.context_cache = context_cache
+        self.vector_index = vector_index if vector_index is not None else VectorIndex()
+        self.search_cache = search_cache
+        self._save_script = self.redis_client.register_script(SAVE_MESSAGES_SCRIPT)
+        self._fulltext_script = self.redis_client.register_script(FULLTEXT_SEARCH_SCRIPT)
+        self._claim_script = self.redis_client.register_script(CLAIM_ENRICHMENT_SCRIPT)
+    
+    @classmethod
+    async def create(cls, **kwargs) -> "AsyncConversationRedisManager":
+        """Create a manager and verify the connection"""
+        manager = cls(**kwargs)
+        try:
+            await manager.redis_client.ping()
+            await manager.load_active_dictionary()
+            await manager.load_vocabulary()
+            logger.info("Enhanced async Redis connection established successfully")
+        except redis.ConnectionError as e:
+            logger.error(f"Failed to connect to Redis: {e}")
+            await manager.close()
+            raise
+        return manager
+    
+    async def close(self) -> None:
+        """Close the clients and disconnect their connection pools"""
+        await self.redis_client.aclose()
+        await self.binary_client.aclose()
+    
+    async def save_message(self, role: str, content: str, topics: List[str] = None,
+                           keywords: List[str] = None, session_id: str = None,
+                           ingest_mode: str = "sync") -> str:
+        """Async save_message; same storage layout as ConversationRedisManager.save_message"""
+        deferred = self._check_ingest_mode(ingest_mode)
+        derived = None if deferred else await self._derive_content_fields(content)
+        message, timestamp_numeric = self._build_message(role, content, topics, keywords, session_id,
+                                                         deferred=deferred, derived=derived)
+        
+        await self._write_messages([(message, timestamp_numeric)])
+        
+        logger.info(f"Enhanced message {message.id} saved with {message.compression_ratio:.2f} compression ratio")
+        return message.id
+    
+    async def save_messages(self, items: List[Dict[str, Any]], ingest_mode: str = "sync") -> List[Dict[str, Any]]:
+        """Async save_messages; summarization never runs on the event loop (see _derive_batch)"""
+        deferred = self._check_ingest_mode(ingest_mode)
+        if not items:
+            return []
+        
+        derived = None
+        if not deferred:
+            derived = await self._derive_batch([item['content'] for item in items])
+        entries = self._build_messages(items, deferred, derived)
+        await self._write_messages(entries)
+        
+        logger.info(f"Enhanced batch of {len(entries)} messages saved")
+        return [self._save_result(message) for message, _ in entries]
+    
+    async def compress(self, data: bytes, measure: bool = False) -> CompressionResult:
+        """Adaptive compression in a worker thread (measure: see CodecRegistry.compress)"""
+        return await asyncio.to_thread(self.codecs.compress, data, measure)
+    
+    async def measure(self, data: bytes) -> List[CodecMeasurement]:
+        """CodecRegistry.measure in a worker thread"""
+        return await asyncio.to_thread(self.codecs.measure, data)
+    
+    async def analyze_text(self, content: str) -> Dict[str, Any]:
+        """Summaries, key points and technical terms via the processing service, else in a worker thread"""
+        if self.text_processing is not None:
+            return await self.text_processing.analyze(content)
+        return await asyncio.to_thread(self.processor.analyze, content)
+    
+    async def _derive_content_fields(self, content: str) -> Dict[str, Any]:
+        """
+        Async _enrich_content; nothing CPU-bound runs on the event loop
+        Texts the processing service offloads are analyzed in its process pool and
+        compressed in a worker thread; all others are derived in one worker thread.
+        """
+        service = self.text_processing
+        if service is None or not service.offloads(content):
+            return await asyncio.to_thread(self._enrich_content, content)
+        analysis = await service.analyze(content)
+        compression = await self.compress(content.encode('utf-8'))
+        return self._enriched_fields(compression, analysis)
+    
+    async def _derive_batch(self, contents: List[str]) -> List[Dict[str, Any]]:
+        """
+        _derive_content_fields for a batch
+        Texts the processing service offloads fan out to its process pool; all the
+        others (below its inline threshold, or without a service) are derived
+        together in a single worker thread instead of one thread each.
+        """
+        service = self.text_processing
+        pooled = [i for i, content in enumerate(contents) if service is not None and service.offloads(content)]
+        pooled_set = set(pooled)
+        inline = [i for i in range(len(contents)) if i not in pooled_set]
+        
+        def derive_inline() -> List[Dict[str, Any]]:
+            return [self._enrich_content(contents[i]) for i in inline]
+        
+        results = await asyncio.gather(
+            asyncio.to_thread(derive_inline) if inline else asyncio.sleep(0, []),
+            *(self._derive_content_fields(contents[i]) for i in pooled)
+        )
+        derived: List[Optional[Dict[str, Any]]] = [None] * len(contents)
+        for i, row in zip(inline, results[0]):
+            derived[i] = row
+        for i, row in zip(pooled, results[1:]):
+            derived[i] = row
+        return derived
+    
+    async def enrich_message(self, msg_id: str, owner: str) -> Optional[str]:
+        """
+        Fill in compression, summaries, key points and tech indexes for a deferred message
+        owner (the worker pool id) claims the message before the CPU work; the claim
+        is taken over only from a pool whose heartbeat has expired, and the results
+        are written only while it still holds. Returns the resulting
+        enrichment_status (None if the message no longer exists).
+        """
+        key = f"message:{msg_id}"
+        msg_data = await self.redis_client.hgetall(key)
+        status = self._enrichment_status(msg_data)
+        if status != "pending":
+            return status
+        holder = msg_data.get('enrichment_claim', "")
+        if not await self._claim_script(keys=[key, ENRICHMENT_HEARTBEAT_KEY.format(holder or owner)],
+                                        args=[owner, holder]):
+            return "pending"  # a live pool is enriching it
+        
+        content = self._message_content(msg_id, msg_data, await self._fetch_bodies(self._body_ids_to_fetch([(msg_id, msg_data)])))
+        try:
+            derived = await self._derive_content_fields(content)
+        except Exception as e:
+            logger.error(f"Enrichment failed for message {msg_id}: {e}")
+            derived = None
+        
+        async with self.redis_client.pipeline() as pipe:
+            try:
+                await pipe.watch(key)
+                if await pipe.hget(key, 'enrichment_claim') != owner:
+                    return "pending"  # taken over while this pool looked dead
+                pipe.multi()
+                pipe.hdel(key, 'enrichment_claim')
+                if derived is None:
+                    pipe.hset(key, "enrichment_status", "failed")
+                    pipe.publish(ENRICHMENT_DONE_CHANNEL.format(msg_id), "failed")
+                else:
+                    self._queue_enrichment_writes(pipe, msg_id, content, derived, msg_data)
+                await pipe.execute()
+            except redis.WatchError:
+                return "pending"
+        return derived['enrichment_status'] if derived is not None else "failed"
+    
+    async def get_enrichment_status(self, message_ids: List[str]) -> Dict[str, Optional[str]]:
+        """enrichment_status per message id (None for unknown ids)"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            pipe.hmget(f"message:{msg_id}", ["id", "enrichment_status"])
+        rows = await pipe.execute()
+        return {
+            msg_id: (status or "done") if known else None
+            for msg_id, (known, status) in zip(message_ids, rows)
+        }
+    
+    async def wait_for_enrichment(self, message_ids: List[str], timeout: float = 10.0) -> Dict[str, Optional[str]]:
+        """
+        Block until every message has left the pending state or the timeout expires
+        Subscribes to the completion channels before checking status, so a
+        completion published in between is never missed.
+        """
+        pubsub = self.redis_client.pubsub()
+        try:
+            await pubsub.subscribe(*[ENRICHMENT_DONE_CHANNEL.format(msg_id) for msg_id in message_ids])
+            statuses = await self.get_enrichment_status(message_ids)
+            pending = {msg_id for msg_id, status in statuses.items() if status == "pending"}
+            
+            deadline = asyncio.get_running_loop().time() + timeout
+            while pending:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                event = await pubsub.get_message(ignore_subscribe_messages=True, timeout=min(remaining, 1.0))
+                if event:
+                    msg_id = event['channel'].split(':', 2)[2]
+                    statuses[msg_id] = event['data']
+                    pending.discard(msg_id)
+            return statuses
+        finally:
+            await pubsub.aclose()
+    
+    async def save_insight(self, insight_type: str, content: str, source_messages: List[str],
+                           relevance_score: float, business_area: str, summary: str = "",
+                           impact_level: str = "medium", actionable_items: List[str] = None) -> str:
+        """Async save_insight"""
+        insight = self._build_insight(insight_type, content, source_messages, relevance_score,
+                                      business_area, summary, impact_level, actionable_items)
+        
+        pipe = self.redis_client.pipeline()
+        self._queue_insight_writes(pipe, insight)
+        await pipe.execute()
+        
+        logger.info(f"Enhanced insight {insight.id} saved")
+        return insight.id
+    
+    async def get_conversation_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                       token_budget: Optional[int] = None) -> Dict[str, Any]:
+        """Async get_conversation_context; see ConversationRedisManager for detail levels and token_budget"""
+        detail_level = self._effective_detail_level(detail_level, token_budget)
+        return await self._through_context_cache(
+            limit, detail_level, None, lambda: self._read_conversation_context(limit, detail_level, token_budget),
+            token_budget
+        )
+    
+    async def _read_conversation_context(self, limit: int, detail_level: str,
+                                         token_budget: Optional[int] = None) -> Dict[str, Any]:
+        return self._assemble_context(await self._fetch_context(limit, detail_level, token_budget))
+    
+    async def _fetch_context(self, limit: int, detail_level: str, token_budget: Optional[int] = None) -> ContextSnapshot:
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_index_reads(pipe, limit)
+        self._queue_frequency_reads(pipe)
+        results = await pipe.execute()
+        recent_message_ids, insight_ids, total_saved, total_messages = results[:4]
+        aggregates, rebuild_trips = await self._rolling_frequencies(results[4:])
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, recent_message_ids, detail_level, insight_ids)
+        hydrated, top_insights = self._unpack_context_reads(recent_message_ids, field_lists, await pipe.execute())
+        
+        sources, packing = self._pack_context(hydrated, token_budget) if token_budget is not None else (None, None)
+        
+        targets = self._body_ids_to_fetch(hydrated, detail_level, sources=sources)
+        bodies = await self._fetch_bodies(targets)
+        
+        retrieval_stats = self._retrieval_stats(hydrated, targets)
+        retrieval_stats['round_trips'] += rebuild_trips
+        return ContextSnapshot(detail_level, hydrated, bodies, top_insights, int(total_saved or 0),
+                               total_messages, aggregates, retrieval_stats, sources, packing)
+
+    async def get_timeline_page(self, start: Optional[str] = None, end: Optional[str] = None,
+                                cursor: Optional[str] = None, limit: int = 100,
+                                fields: Optional[List[str]] = None, order: str = "asc",
+                                session_id: Optional[str] = None) -> Dict[str, Any]:
+        """Async get_timeline_page; see ConversationRedisManager"""
+        order, start_score, end_score, after, session_id = self._timeline_request(start, end, cursor, order, session_id)
+        output_fields, hash_fields = self._timeline_fields(fields)
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_timeline_reads(pipe, order, start_score, end_score, after, limit, self._timeline_key(session_id))
+        entries, has_more, in_range = self._unpack_timeline_reads(order, after, limit, await pipe.execute())
+        
+        message_ids = [msg_id for msg_id, _ in entries]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            pipe.hmget(f"message:{msg_id}", hash_fields)
+        hydrated = [(msg_id, self._projected(hash_fields, values))
+                    for msg_id, values in zip(message_ids, await pipe.execute() if message_ids else [])]
+        
+        targets = self._body_ids_to_fetch(hydrated) if 'content' in output_fields else []
+        bodies = await self._fetch_bodies(targets)
+        return self._timeline_page(order, start_score, end_score, entries, hydrated, output_fields, bodies,
+                                   has_more, in_range, self._retrieval_stats(hydrated, targets), session_id)
+    
+    async def get_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Async get_session; see ConversationRedisManager"""
+        stats = await self.redis_client.hgetall(f"session:{session_id}:stats")
+        return self._session_summary(session_id, stats) if stats else None
+    
+    async def list_sessions(self, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        """Async list_sessions; see ConversationRedisManager"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_session_list_reads(pipe, limit, offset)
+        session_ids, total_sessions = await pipe.execute()
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        for session_id in session_ids:
+            pipe.hgetall(f"session:{session_id}:stats")
+        stats = await pipe.execute() if session_ids else []
+        return self._session_list(session_ids, stats, total_sessions, limit, offset)
+    
+    async def get_session_context(self, session_id: str, limit: int = 50, detail_level: str = "adaptive",
+                                  token_budget: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Async get_session_context; see ConversationRedisManager"""
+        detail_level = self._effective_detail_level(detail_level, token_budget)
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_session_context_reads(pipe, session_id, limit)
+        message_ids, stats = await pipe.execute()
+        if not stats:
+            return None
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, message_ids, detail_level, [])
+        hydrated, _ = self._unpack_context_reads(message_ids, field_lists, await pipe.execute() if message_ids else [])
+        
+        sources, packing = self._pack_context(hydrated, token_budget) if token_budget is not None else (None, None)
+        targets = self._body_ids_to_fetch(hydrated, detail_level, sources=sources)
+        bodies = await self._fetch_bodies(targets)
+        
+        snapshot = ContextSnapshot(detail_level, hydrated, bodies, [], 0, int(stats.get('messages', 0)),
+                                   self._session_aggregates(hydrated), self._retrieval_stats(hydrated, targets),
+                                   sources, packing)
+        return self._assemble_session_context(session_id, stats, snapshot)
+    
+    async def stream_conversation_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                          chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """Async stream_conversation_context; see ConversationRedisManager for the events"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_index_reads(pipe, limit)
+        self._queue_frequency_reads(pipe)
+        results = await pipe.execute()
+        message_ids, insight_ids, total_saved, total_messages = results[:4]
+        aggregates, rebuild_trips = await self._rolling_frequencies(results[4:])
+        
+        stats = self._stream_stats(1 + rebuild_trips)
+        for start in self._chunk_starts(len(message_ids), chunk_size):
+            chunk_ids = message_ids[start:start + chunk_size]
+            positions = list(range(start, start + len(chunk_ids)))
+            pipe = self.redis_client.pipeline(transaction=False)
+            field_lists = self._queue_context_reads(pipe, chunk_ids, detail_level,
+                                                    insight_ids if start == 0 else [], positions)
+            hydrated, top_insights = self._unpack_context_reads(chunk_ids, field_lists, await pipe.execute())
+            if start == 0:
+                yield self._context_stream_header(aggregates, top_insights, int(total_saved or 0),
+                                                  total_messages, detail_level)
+            
+            targets = self._body_ids_to_fetch(hydrated, detail_level, positions)
+            bodies = await self._fetch_bodies(targets)
+            self._count_stream_chunk(stats, hydrated, targets)
+            for event in self._context_stream_messages(positions, hydrated, bodies, detail_level):
+                yield event
+        yield {'type': 'end', 'retrieval_stats': stats}
+    
+    async def stream_export_for_ai_context(self, limit: int = 50, detail_level: str = "adaptive",
+                                           chunk_size: int = STREAM_CHUNK_SIZE) -> AsyncIterator[str]:
+        """Async stream_export_for_ai_context"""
+        async for event in self.stream_conversation_context(limit, detail_level, chunk_size):
+            text = bullet_event(event)
+            if text:
+                yield text
+
+    async def get_context_delta(self, since: Optional[str] = None, limit: int = 50,
+                                detail_level: str = "adaptive") -> Dict[str, Any]:
+        """Async get_context_delta; see ConversationRedisManager for the cursor semantics"""
+        round_trips = 0
+        cursor_score, cursor_id = (None, None) if since is None else self._parse_context_cursor(since)
+        if cursor_id is not None:
+            cursor_score = await self.redis_client.zscore("messages:timeline", cursor_id)
+            round_trips += 1
+            if cursor_score is None:
+                raise ValueError(f"Unknown cursor: {since}")
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_delta_index_reads(pipe, cursor_score, cursor_id, limit)
+        index_reads = len(pipe)
+        self._queue_frequency_reads(pipe)
+        results = await pipe.execute()
+        new_entries, newer_count, total_messages = self._unpack_delta_index_reads(
+            cursor_score, cursor_id, limit, results[:index_reads])
+        aggregates, rebuild_trips = await self._rolling_frequencies(results[index_reads:])
+        
+        new_ids = [msg_id for msg_id, _ in new_entries]
+        positions = [newer_count - 1 - i for i in range(len(new_ids))]
+        pipe = self.redis_client.pipeline(transaction=False)
+        field_lists = self._queue_context_reads(pipe, new_ids, detail_level, [], positions)
+        hydrated, _ = self._unpack_context_reads(new_ids, field_lists, await pipe.execute())
+        
+        targets = self._body_ids_to_fetch(hydrated, detail_level, positions)
+        bodies = await self._fetch_bodies(targets)
+        
+        retrieval_stats = self._retrieval_stats(hydrated, targets)
+        retrieval_stats['round_trips'] += round_trips + rebuild_trips
+        return self._assemble_delta(since, new_entries, hydrated, positions, bodies, detail_level, newer_count,
+                                    aggregates, total_messages, retrieval_stats)
+    
+    async def _rolling_frequencies(self, results: List[Any]) -> Tuple[Dict[str, List[Tuple[str, int]]], int]:
+        """Async _rolling_frequencies"""
+        current, aggregates = self._unpack_frequency_reads(results)
+        if current:
+            return aggregates, 0
+        pipe = self.redis_client.pipeline()
+        self._queue_rolling_rebuild(pipe)
+        rebuild_commands = len(pipe)
+        self._queue_frequency_reads(pipe)
+        _, aggregates = self._unpack_frequency_reads((await pipe.execute())[rebuild_commands:])
+        return aggregates, 1
+    
+    async def search_conversations(self, query_terms: List[str], limit: int = 20,
+                                   search_scope: str = "all", query: Optional[str] = None) -> List[Dict]:
+        """Async search_conversations"""
+        _, message_ids, scores = await self._search_candidates(query_terms, search_scope, limit, query)
+        
+        summaries_only = search_scope == "summaries"
+        hydrated = await self._hydrate_messages(message_ids, SUMMARY_RESULT_FIELDS if summaries_only else None)
+        bodies = await self._fetch_bodies([] if summaries_only else self._body_ids_to_fetch(hydrated))
+        
+        return [self._search_result(msg_id, msg_data, bodies, scores.get(msg_id), summaries_only)
+                for msg_id, msg_data in hydrated if msg_data]
+    
+    async def search_truncated(self, query_terms: List[str], search_scope: str = "all",
+                               query: Optional[str] = None) -> bool:
+        """Async search_truncated"""
+        keys = self._capped_posting_keys(query_terms, search_scope, query)
+        if not keys:
+            return False
+        pipe = self.redis_client.pipeline(transaction=False)
+        for key in keys:
+            pipe.zcard(key)
+        return any(count >= TAG_POSTINGS_CAP for count in await pipe.execute())
+    
+    async def _search_candidates(self, query_terms: List[str], search_scope: str, limit: int,
+                                 query: Optional[str] = None) -> Tuple[int, List[str], Dict[str, float]]:
+        self._check_query_scope(search_scope, query)
+        if search_scope == VECTOR_SEARCH_SCOPE:
+            return await self._similar_candidates(" ".join(query_terms), limit)
+        cache_key, generation_keys = self._search_cache_key(query_terms, search_scope, query)
+        if not generation_keys:
+            return await self._search_index(query_terms, search_scope, limit, query)
+        generations = await self.redis_client.hmget(SEARCH_GENERATIONS_KEY, [SEARCH_EPOCH_FIELD, *generation_keys])
+        hits = self.search_cache.lookup(cache_key, generations, limit)
+        if hits is None:
+            hits = await self._search_index(query_terms, search_scope, limit, query)
+            if generations[0] is None:
+                await self.redis_client.hsetnx(SEARCH_GENERATIONS_KEY, SEARCH_EPOCH_FIELD, uuid4().hex)
+            else:
+                self.search_cache.store(cache_key, generations, limit, hits)
+        return hits
+    
+    async def _search_index(self, query_terms: List[str], search_scope: str, limit: int,
+                            query: Optional[str] = None) -> SearchHits:
+        if search_scope in RANKED_SEARCH_SCOPES:
+            search_args = self._fulltext_search_args(query_terms, limit, RANKED_SEARCH_SCOPES[search_scope])
+            if search_args is None:
+                return 0, [], {}
+            keys, args = search_args
+            return self._unpack_fulltext_search(await self._fulltext_script(keys=keys, args=args))
+        plan = self._search_plan(query_terms, search_scope, query)
+        if not plan.result_key:
+            return 0, [], {}
+        pipe = self.redis_client.pipeline()
+        self._queue_search_candidates(pipe, plan, limit)
+        matches, message_ids = (await pipe.execute())[len(plan.steps):len(plan.steps) + 2]
+        return matches, message_ids, {}
+    
+    async def _sync_vectors(self) -> None:
+        """Bring the local vector matrix up to date; copying the rows in runs in a worker thread"""
+        pipe = self.binary_client.pipeline(transaction=False)
+        self.vector_index.queue_sync_head(pipe)
+        tail = self.vector_index.tail_range(await pipe.execute())
+        if tail:
+            pipe = self.binary_client.pipeline(transaction=False)
+            self.vector_index.queue_tail_reads(pipe, *tail)
+            await asyncio.to_thread(self.vector_index.apply_tail, *tail, await pipe.execute())
+    
+    async def _similar_candidates(self, text: str, limit: int,
+                                  exclude: Optional[str] = None) -> Tuple[int, List[str], Dict[str, float]]:
+        """Scores the matrix in a worker thread (NumPy releases the GIL during the products)"""
+        await self._sync_vectors()
+        return self._unpack_similar_hits(
+            *await asyncio.to_thread(self.vector_index.search, self._similar_query(text), limit, exclude))
+    
+    async def find_similar(self, text: Optional[str] = None, message_id: Optional[str] = None,
+                           limit: int = 10) -> Optional[Dict[str, Any]]:
+        """Async find_similar"""
+        if message_id:
+            source = await self._hydrate_messages([message_id])
+            if not source[0][1]:
+                return None
+            text = self._message_content(message_id, source[0][1],
+                                         await self._fetch_bodies(self._body_ids_to_fetch(source)))
+        elif not text:
+            raise ValueError("Either text or message_id is required")
+        
+        matches, message_ids, scores = await self._similar_candidates(text, limit, exclude=message_id)
+        hydrated = await self._hydrate_messages(message_ids)
+        bodies = await self._fetch_bodies(self._body_ids_to_fetch(hydrated))
+        return self._similar_response(message_id, matches, [
+            self._search_result(msg_id, msg_data, bodies, scores.get(msg_id)) for msg_id, msg_data in hydrated if msg_data
+        ])
+    
+    async def vector_index_stale(self) -> bool:
+        """
+        Whether the vector matrix needs a rebuild: its row count drifted from the timeline by more
+        than VECTOR_STALE_RATIO (rows of removed or evicted messages, lost rows) or a chunk key is missing
+        """
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.llen(VECTOR_IDS_KEY)
+        pipe.zcard("messages:timeline")
+        rows, messages = await pipe.execute()
+        if abs(rows - messages) > VECTOR_STALE_RATIO * messages:
+            return True
+        pipe = self.redis_client.pipeline(transaction=False)
+        for chunk in range(chunk_count(rows)):
+            pipe.exists(matrix_chunk_key(chunk))
+        return rows > 0 and not all(await pipe.execute())
+    
+    async def stream_search(self, query_terms: List[str], limit: int = 20, search_scope: str = "all",
+                            chunk_size: int = STREAM_CHUNK_SIZE,
+                            query: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async stream_search; see ConversationRedisManager for the events"""
+        matches, message_ids, scores = await self._search_candidates(query_terms, search_scope, limit, query)
+        yield {'type': 'search', 'matches': matches, 'returning': len(message_ids),
+               'truncated': await self.search_truncated(query_terms, search_scope, query)}
+        
+        summaries_only = search_scope == "summaries"
+        stats = self._stream_stats(1)
+        for start in range(0, len(message_ids), chunk_size):
+            hydrated = await self._hydrate_messages(message_ids[start:start + chunk_size],
+                                             SUMMARY_RESULT_FIELDS if summaries_only else None)
+            targets = [] if summaries_only else self._body_ids_to_fetch(hydrated)
+            bodies = await self._fetch_bodies(targets)
+            self._count_stream_chunk(stats, hydrated, targets)
+            for msg_id, msg_data in hydrated:
+                if msg_data:
+                    yield {'type': 'result', **self._search_result(msg_id, msg_data, bodies, scores.get(msg_id),
+                                                                   summaries_only)}
+        yield {'type': 'end', 'retrieval_stats': stats}
+    
+    async def _hydrate_messages(self, message_ids: List[str],
+                                fields: Optional[Tuple[str, ...]] = None) -> List[Tuple[str, Dict[str, str]]]:
+        """(id, message hash) pairs read in one pipelined round trip; fields projects the hash"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            self._queue_message_read(pipe, msg_id, fields)
+        return self._unpack_message_reads(message_ids, await pipe.execute(), fields) if message_ids else []
+    
+    async def _fetch_bodies(self, targets: List[Tuple[str, Optional[str]]]) -> Dict[str, str]:
+        """Read and decompress bodies (plus any missing zstd dictionaries) in one round trip"""
+        if not targets:
+            return {}
+        pipe = self.binary_client.pipeline(transaction=False)
+        dictionaries_queued = self._queue_body_reads(pipe, targets)
+        return self._unpack_body_reads(targets, dictionaries_queued, await pipe.execute())
+    
+    async def load_active_dictionary(self) -> Optional[int]:
+        """Load the active zstd dictionary (if one was trained) into the codec registry"""
+        active_dict_id = await self.binary_client.get(ACTIVE_DICTIONARY_KEY)
+        if active_dict_id:
+            self._register_dictionaries([await self.binary_client.hget(DICTIONARY_HASH_KEY, active_dict_id)], active_dict_id)
+        return self.codecs.active_dict_id
+    
+    async def load_vocabulary(self) -> Vocabulary:
+        """Install the vocabulary file merged with the Redis vocabulary sets"""
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_vocabulary_reads(pipe)
+        return self._install_vocabulary(await pipe.execute())
+    
+    async def train_compression_dictionary(self, sample_limit: int = 1000, dict_size: int = 112 * 1024) -> Dict[str, Any]:
+        """Async train_compression_dictionary; training itself runs in a worker thread"""
+        recent_ids = await self.redis_client.zrevrange("messages:timeline", 0, sample_limit - 1)
+        entries = await self._hydrate_messages(recent_ids)
+        bodies = await self._fetch_bodies(self._body_ids_to_fetch(entries))
+        samples = [self._message_content(msg_id, msg_data, bodies).encode('utf-8') for msg_id, msg_data in entries if msg_data]
+        
+        dictionary = await asyncio.to_thread(train_dictionary, samples, dict_size)
+        dict_id = self.codecs.add_dictionary(dictionary, activate=True)
+        pipe = self.redis_client.pipeline()
+        pipe.hset(DICTIONARY_HASH_KEY, str(dict_id), dictionary)
+        pipe.set(ACTIVE_DICTIONARY_KEY, str(dict_id))
+        await pipe.execute()
+        
+        logger.info(f"Trained zstd dictionary {dict_id} from {len(samples)} messages")
+        return {'dict_id': dict_id, 'samples': len(samples), 'dict_size': len(dictionary)}
+    
+    async def _write_messages(self, entries: List[Tuple[ConversationMessage, float]]) -> None:
+        """Run the save script: session, hashes, bodies, indexes and analytics in one EVALSHA"""
+        keys, args = self._message_save_args(entries)
+        self._apply_default_session(entries, await self._save_script(keys=keys, args=args))
+    
+    async def _get_top_insights(self, limit: int) -> List[Dict]:
+        """Get top insights by relevance score (ids, then one pipelined HMGET round trip)"""
+        top_insight_ids = await self.redis_client.zrevrange("insights:by_relevance", 0, limit-1)
+        if not top_insight_ids:
+            return []
+        
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_insight_reads(pipe, top_insight_ids)
+        return self._insight_summaries(await pipe.execute())
+    
+    async def export_for_ai_context(self, format_type: str = "narrative", detail_level: str = "adaptive",
+                                    limit: int = 50, token_budget: Optional[int] = None) -> str:
+        """Async export_for_ai_context"""
+        return await self._through_context_cache(
+            limit, self._effective_detail_level(detail_level, token_budget), format_type,
+            lambda: self._export_uncached(format_type, detail_level, limit, token_budget), token_budget
+        )
+    
+    async def _export_uncached(self, format_type: str, detail_level: str, limit: int,
+                               token_budget: Optional[int] = None) -> str:
+        return render_context(await self.get_conversation_context(limit, detail_level, token_budget), format_type)
+    
+    async def _through_context_cache(self, limit: int, detail_level: str, format_type: Optional[str], build,
+                                     token_budget: Optional[int] = None):
+        """await build() unless the cache holds a result for the current epoch and generation"""
+        if not self._context_cache_enabled():
+            return await build()
+        
+        key = self.context_cache.key(limit, detail_level, format_type, token_budget)
+        pipe = self.redis_client.pipeline(transaction=False)
+        self._queue_context_cache_read(pipe, key)
+        tag, cached = self._lookup_cached_context(key, await pipe.execute())
+        if cached is not None:
+            return cached
+        
+        result = self._mark_cache_miss(await build())
+        pipe = self.redis_client.pipeline(transaction=False)
+        if self._queue_context_cache_store(pipe, key, tag, result):
+            await pipe.execute()
+        return result
+
+# Migration utilities for existing data
+def migrate_existing_messages(redis_client, processor=None, codecs=None):
+    """
+    Migrate existing messages in place to the current storage format (v3)
+    - v1 (plain content only): summaries, key points and tech indexes are generated
+    - v2 (content + base64 compressed_content): the body moves to message:{id}:body as raw
+      compressed bytes; content, compressed_content and message:{id}:summary are removed
+    - migrated bodies and summaries are added to the full-text and summary indexes; v3 messages
+      saved before the indexes existed are indexed by backfill_fulltext_index / backfill_summary_index
+    Messages already at v3 are skipped, so the migration can be re-run safely.
+    """
+    if processor is None:
+        processor = SmartTextProcessor()
+    if codecs is None:
+        codecs = CodecRegistry.from_env()
+        
+    logger.info(f"Starting migration of existing messages to storage format v{STORAGE_FORMAT_VERSION}...")
+    
+    # Get all existing message IDs
+    timeline = redis_client.zrange("messages:timeline", 0, -1, withscores=True)
+    migrated_count = 0
+    
+    for msg_id, score in timeline:
+        msg_data = redis_client.hgetall(f"message:{msg_id}")
+        
+        if not msg_data or int(msg_data.get('format_version', 0) or 0) >= STORAGE_FORMAT_VERSION:
+            continue
+        
+        content = msg_data.get('content', '')
+        if not content and msg_data.get('compressed_content'):
+            content = processor.decompress_text(msg_data['compressed_content'])
+        
+        compression = codecs.compress(content.encode('utf-8'))
+        compressed_content = compression.data
+        updates = {
+            'format_version': str(STORAGE_FORMAT_VERSION),
+            'content_length': str(len(content)),
+            'compression_ratio': str(compression.compression_ratio),
+            'compressed_length': str(compression.compressed_length),
+            'codec': compression.codec
+        }
+        
+        technical_terms = []
+        if 'summary_short' not in msg_data:  # v1: generate enhanced fields
+            derived = processor.analyze(content)
+            technical_terms = derived['technical_terms']
+            updates.update({
+                'summary_short': derived['summary_short'],
+                'summary_medium': derived['summary_medium'],
+                'key_points': json.dumps(derived['key_points']),
+                'technical_terms': json.dumps(technical_terms)
+            })
+        summaries = {**msg_data, **updates}
+        for field, tokens in token_estimates(content, summaries.get('summary_short', ''),
+                                             summaries.get('summary_medium', '')).items():
+            updates[field] = str(tokens)
+        
+        # One MULTI/EXEC per message so a reader never sees a hash without its body
+        pipe = redis_client.pipeline()
+        pipe.set(f"message:{msg_id}:body", compressed_content)
+        pipe.hset(f"message:{msg_id}", mapping=updates)
+        pipe.hdel(f"message:{msg_id}", 'content', 'compressed_content')
+        pipe.delete(f"message:{msg_id}:summary")
+        
+        # Add technical term indexes
+        _ConversationStoreBase._queue_tag_postings(
+            pipe, _ConversationStoreBase._tag_keys(technical_terms=technical_terms), msg_id, score)
+        if not redis_client.hexists(FULLTEXT_INDEX.lengths_key, msg_id):
+            _ConversationStoreBase._queue_fulltext_writes(pipe, msg_id, content)
+        if not redis_client.hexists(SUMMARY_INDEX.lengths_key, msg_id):
+            _ConversationStoreBase._queue_fulltext_writes(pipe, msg_id, summary_text(summaries), SUMMARY_INDEX)
+        
+        pipe.execute()
+        migrated_count += 1
+        
+        if migrated_count % 10 == 0:
+            logger.info(f"Migrated {migrated_count} messages...")
+    
+    if migrated_count:
+        redis_client.hincrby(CONTEXT_GENERATION_KEY, 'generation', 1)
+    logger.info(f"Migration completed successfully! Migrated {migrated_count} messages.")
+
+def backfill_frequency_aggregates(redis_client, chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Rebuild the freq:* aggregates from every message on the timeline
+    - all-time sets and the day buckets still inside the window are overwritten
+    - the rolling sets are dropped and rebuilt by the next context read
+    Run once when the aggregates are introduced (startup, after /migrate); safe to re-run.
+    """
+    logger.info("Backfilling topic/keyword/technical term frequency aggregates...")
+    today = datetime.date.today()
+    window_start = today - datetime.timedelta(days=FREQUENCY_WINDOW_DAYS - 1)
+    totals: Dict[str, Dict[str, int]] = {kind: {} for kind in FREQUENCY_KINDS.values()}
+    buckets: Dict[Tuple[str, datetime.date], Dict[str, int]] = {}
+    
+    message_count = redis_client.zcard("messages:timeline")
+    for start in range(0, message_count, chunk_size):
+        message_ids = redis_client.zrange("messages:timeline", start, start + chunk_size - 1)
+        pipe = redis_client.pipeline(transaction=False)
+        for msg_id in message_ids:
+            pipe.hmget(f"message:{msg_id}", ['timestamp'] + list(FREQUENCY_KINDS))
+        for timestamp, *lists in pipe.execute():
+            if timestamp is None:
+                continue
+            day = datetime.datetime.fromisoformat(timestamp).date()
+            for kind, raw in zip(FREQUENCY_KINDS.values(), lists):
+                for value in json.loads(raw or '[]'):
+                    totals[kind][value] = totals[kind].get(value, 0) + 1
+                    if day >= window_start:
+                        bucket = buckets.setdefault((kind, day), {})
+                        bucket[value] = bucket.get(value, 0) + 1
+    
+    pipe = redis_client.pipeline()
+    for kind, counts in totals.items():
+        pipe.delete(_ConversationStoreBase._frequency_key(kind, "all"),
+                    _ConversationStoreBase._frequency_key(kind, "rolling"),
+                    *(_ConversationStoreBase._frequency_key(kind, day) for day in _ConversationStoreBase._window_days()))
+        if counts:
+            pipe.zadd(_ConversationStoreBase._frequency_key(kind, "all"), counts)
+    for (kind, day), counts in buckets.items():
+        key = _ConversationStoreBase._frequency_key(kind, day.isoformat())
+        pipe.zadd(key, counts)
+        pipe.expireat(key, _ConversationStoreBase._bucket_expire_at(day))
+    pipe.delete(FREQUENCY_ROLLING_DAY_KEY)
+    pipe.set(FREQUENCY_BACKFILL_KEY, datetime.datetime.now().isoformat())
+    pipe.execute()
+    
+    logger.info(f"Frequency aggregates rebuilt from {message_count} messages")
+    return {'messages': message_count, **{kind: len(counts) for kind, counts in totals.items()}}
+
+def backfill_session_indexes(redis_client, chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Rebuild session:{id}:timeline, session:{id}:stats and sessions:by_activity from the timeline
+    - the unordered session:{id}:messages sets of earlier versions are removed
+    - counters are overwritten, so the backfill is safe to re-run (startup, after /migrate)
+    """
+    logger.info("Backfilling per-session timelines and counters...")
+    sessions: Dict[str, Dict[str, float]] = {}
+    
+    message_count = redis_client.zcard("messages:timeline")
+    for start in range(0, message_count, chunk_size):
+        entries = redis_client.zrange("messages:timeline", start, start + chunk_size - 1, withscores=True)
+        pipe = redis_client.pipeline(transaction=False)
+        for msg_id, _ in entries:
+            pipe.hmget(f"message:{msg_id}", ['session_id', 'content_length', 'compressed_length'])
+        timelines: Dict[str, Dict[str, float]] = {}
+        for (msg_id, score), (session_id, content_length, compressed_length) in zip(entries, pipe.execute()):
+            if not session_id:
+                continue
+            timelines.setdefault(session_id, {})[msg_id] = score
+            stats = sessions.setdefault(session_id, {'messages': 0, 'content_chars': 0, 'stored_bytes': 0,
+                                                     'first_activity': score, 'last_activity': score})
+            stats['messages'] += 1
+            stats['content_chars'] += int(content_length or 0)
+            # pre-v3 messages without a compressed body are stored as their content
+            stats['stored_bytes'] += int(compressed_length or content_length or 0)
+            stats['first_activity'] = min(stats['first_activity'], score)
+            stats['last_activity'] = max(stats['last_activity'], score)
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for session_id, members in timelines.items():
+            pipe.zadd(_ConversationStoreBase._timeline_key(session_id), members)
+        pipe.execute()
+    
+    pipe = redis_client.pipeline()
+    pipe.delete(SESSION_ACTIVITY_KEY)
+    for session_id, stats in sessions.items():
+        pipe.hset(f"session:{session_id}:stats", mapping={
+            **{field: stats[field] for field in SESSION_COUNTER_FIELDS},
+            'first_activity': repr(stats['first_activity']),
+            'last_activity': repr(stats['last_activity'])
+        })
+        pipe.delete(f"session:{session_id}:messages")
+    if sessions:
+        pipe.zadd(SESSION_ACTIVITY_KEY, {session_id: stats['last_activity'] for session_id, stats in sessions.items()})
+    pipe.set(SESSION_BACKFILL_KEY, datetime.datetime.now().isoformat())
+    pipe.execute()
+    
+    logger.info(f"Session indexes rebuilt for {len(sessions)} sessions from {message_count} messages")
+    return {'messages': message_count, 'sessions': len(sessions)}
+
+def backfill_tag_postings(redis_client, chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Convert the topic/keyword/tech/role sets of earlier versions to timestamp-scored postings
+    - members are scored by their messages:timeline score; ids no longer on the timeline are dropped
+    - each posting is built under a temporary key and renamed over the set in one MULTI, with
+      TAG_POSTINGS_CAP applied
+    - keys that are already sorted sets are skipped, so the backfill is safe to re-run (startup,
+      before /migrate); saves fail on a key that is still a set, so it runs before serving
+    """
+    logger.info("Converting tag indexes to timestamp-scored postings...")
+    converted = 0
+    postings = 0
+    
+    for prefix in TAG_POSTING_PREFIXES:
+        for key in redis_client.scan_iter(match=f"{prefix}*", count=1000, _type="set"):
+            temporary = f"tags:backfill:{uuid4().hex}"
+            scored_members = 0
+            members = redis_client.sscan_iter(key, count=chunk_size)
+            while True:
+                message_ids = list(islice(members, chunk_size))
+                if not message_ids:
+                    break
+                scores = redis_client.zmscore("messages:timeline", message_ids)
+                scored = {msg_id: score for msg_id, score in zip(message_ids, scores) if score is not None}
+                if scored:
+                    redis_client.zadd(temporary, scored)
+                    scored_members += len(scored)
+            
+            pipe = redis_client.pipeline()
+            if scored_members:
+                if TAG_POSTINGS_CAP:
+                    pipe.zremrangebyrank(temporary, 0, -TAG_POSTINGS_CAP - 1)
+                pipe.rename(temporary, key)
+            else:
+                pipe.delete(key)
+            pipe.hincrby(SEARCH_GENERATIONS_KEY, key, 1)
+            pipe.execute()
+            converted += 1
+            postings += scored_members
+    
+    redis_client.set(TAG_BACKFILL_KEY, datetime.datetime.now().isoformat())
+    logger.info(f"Tag postings: {converted} sets converted ({postings} message ids scored)")
+    return {'keys': converted, 'postings': postings}
+
+def _reset_stale_text_index(redis_client, index: TextIndex) -> None:
+    """Drop a text index built by another tokenizer version and stamp the current one (fts:stats / sum:stats)"""
+    if redis_client.hget(index.stats_key, 'tokenizer') == str(FULLTEXT_TOKENIZER_VERSION):
+        return
+    dropped = 0
+    batch = []
+    for key in redis_client.scan_iter(match=f"{index.term_prefix}*", count=1000):
+        batch.append(key)
+        if len(batch) == 500:
+            dropped += redis_client.delete(*batch)
+            batch = []
+    if batch:
+        dropped += redis_client.delete(*batch)
+    pipe = redis_client.pipeline()
+    pipe.delete(index.lengths_key, index.stats_key)
+    pipe.hset(index.stats_key, 'tokenizer', FULLTEXT_TOKENIZER_VERSION)
+    pipe.hincrby(SEARCH_GENERATIONS_KEY, index.stats_key, 1)
+    pipe.execute()
+    logger.info(f"Text index {index.term_prefix}* reset for tokenizer v{FULLTEXT_TOKENIZER_VERSION} ({dropped} term postings dropped)")
+
+def backfill_fulltext_index(manager: "ConversationRedisManager", chunk_size: int = 200) -> Dict[str, int]:
+    """
+    Add every timeline message missing from the full-text index (fts:doclen)
+    - bodies are read and decompressed through the manager, chunk_size messages at a time
+    - indexed messages are skipped, so the backfill is safe to re-run (startup, after /migrate)
+    - an index built by another tokenizer version is dropped and rebuilt
+    """
+    logger.info("Backfilling the full-text index...")
+    redis_client = manager.redis_client
+    indexed = 0
+    _reset_stale_text_index(redis_client, FULLTEXT_INDEX)
+    
+    message_count = redis_client.zcard("messages:timeline")
+    for start in range(0, message_count, chunk_size):
+        message_ids = redis_client.zrange("messages:timeline", start, start + chunk_size - 1)
+        lengths = redis_client.hmget(FULLTEXT_INDEX.lengths_key, message_ids) if message_ids else []
+        hydrated = manager._hydrate_messages([msg_id for msg_id, length in zip(message_ids, lengths) if length is None])
+        bodies = manager._fetch_bodies(manager._body_ids_to_fetch(hydrated))
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for msg_id, msg_data in hydrated:
+            if msg_data:
+                manager._queue_fulltext_writes(pipe, msg_id, manager._message_content(msg_id, msg_data, bodies))
+                indexed += 1
+        pipe.execute()
+    
+    redis_client.set(FULLTEXT_BACKFILL_KEY, datetime.datetime.now().isoformat())
+    logger.info(f"Full-text index: {indexed} of {message_count} messages added")
+    return {'messages': message_count, 'indexed': indexed}
+
+def backfill_summary_index(redis_client, chunk_size: int = 1000) -> Dict[str, int]:
+    """
+    Add every enriched timeline message missing from the summary index (sum:doclen)
+    - only the summary fields are read (HMGET), never the bodies
+    - pending messages are left to enrichment, which indexes their summaries
+    - indexed messages are skipped, so the backfill is safe to re-run (startup, after /migrate)
+    """
+    logger.info("Backfilling the summary index...")
+    indexed = 0
+    _reset_stale_text_index(redis_client, SUMMARY_INDEX)
+    
+    message_count = redis_client.zcard("messages:timeline")
+    for start in range(0, message_count, chunk_size):
+        message_ids = redis_client.zrange("messages:timeline", start, start + chunk_size - 1)
+        lengths = redis_client.hmget(SUMMARY_INDEX.lengths_key, message_ids) if message_ids else []
+        missing = [msg_id for msg_id, length in zip(message_ids, lengths) if length is None]
+        pipe = redis_client.pipeline(transaction=False)
+        for msg_id in missing:
+            pipe.hmget(f"message:{msg_id}", ['enrichment_status', *SUMMARY_FIELDS])
+        rows = pipe.execute() if missing else []
+        
+        pipe = redis_client.pipeline(transaction=False)
+        for msg_id, (status, *values) in zip(missing, rows):
+            if status == "pending" or all(value is None for value in values):
+                continue
+            _ConversationStoreBase._queue_fulltext_writes(
+                pipe, msg_id, summary_text(dict(zip(SUMMARY_FIELDS, values))), SUMMARY_INDEX)
+            indexed += 1
+        pipe.execute()
+    
+    redis_client.set(SUMMARY_BACKFILL_KEY, datetime.datetime.now().isoformat())
+    logger.info(f"Summary index: {indexed} of {message_count} messages added")
+    return {'messages': message_count, 'indexed': indexed}
+
+def _vector_rows(manager: "ConversationRedisManager", message_ids: List[str]) -> Tuple[List[str], List[bytes]]:
+    """(ids, quantized rows) of the messages among message_ids that still exist"""
+    hydrated = manager._hydrate_messages(message_ids)
+    bodies = manager._fetch_bodies(manager._body_ids_to_fetch(hydrated))
+    ids, rows = [], []
+    for msg_id, msg_data in hydrated:
+        if msg_data:
+            terms, _ = index_terms(manager._message_content(msg_id, msg_data, bodies))
+            rows.append(quantize(term_vector(terms)))
+            ids.append(msg_id)
+    return ids, rows
+
+def backfill_vector_index(manager: "ConversationRedisManager", chunk_size: int = 200) -> Dict[str, int]:
+    """
+    Rebuild the vector matrix (vectors:matrix:{n} / vectors:ids) from every message on the timeline
+    - bodies are read and decompressed through the manager, chunk_size messages at a time
+    - rows are written to temporary keys and swapped in with the epoch bump in one MULTI,
+      so searches never see a partial matrix and every process reloads its copy
+    - rows saved to the live matrix while the rebuild ran are carried over in the same MULTI
+    - rows of messages no longer on the timeline are dropped, as are chunk keys past the new end
+      and the single-string matrix of earlier versions
+    - only one process rebuilds at a time (VECTOR_REBUILD_LOCK_KEY); the others skip
+    - a full rebuild: run once per VECTOR_VERSION (startup marker), when vector_index_stale
+      finds drift at startup, and after /migrate
+    """
+    redis_client = manager.redis_client
+    lock = uuid4().hex
+    if not redis_client.set(VECTOR_REBUILD_LOCK_KEY, lock, nx=True, ex=VECTOR_REBUILD_LOCK_TTL):
+        logger.info("Vector index rebuild already running in another process; skipped")
+        return {'messages': 0, 'indexed': 0, 'skipped': 1}
+    try:
+        return _rebuild_vector_index(manager, chunk_size)
+    finally:
+        if redis_client.get(VECTOR_REBUILD_LOCK_KEY) == lock:
+            redis_client.delete(VECTOR_REBUILD_LOCK_KEY)
+
+def _rebuild_vector_index(manager: "ConversationRedisManager", chunk_size: int) -> Dict[str, int]:
+    logger.info("Rebuilding the vector index...")
+    redis_client = manager.redis_client
+    prefix, ids_key = f"{VECTOR_MATRIX_KEY}:rebuild", f"{VECTOR_IDS_KEY}:rebuild"
+    # Leftovers of an interrupted rebuild
+    redis_client.delete(ids_key, *[matrix_chunk_key(chunk, prefix)
+                                   for chunk in range(chunk_count(redis_client.llen(ids_key)) + 1)])
+    indexed = 0
+    rebuilt = set()
+    # Rows from here on in the live list are saves made during the rebuild
+    live_start = redis_client.llen(VECTOR_IDS_KEY)
+    
+    message_count = redis_client.zcard("messages:timeline")
+    for start in range(0, message_count, chunk_size):
+        message_ids, rows = _vector_rows(manager, redis_client.zrange("messages:timeline", start, start + chunk_size - 1))
+        if message_ids:
+            pipe = redis_client.pipeline()
+            queue_row_appends(pipe, indexed, rows, prefix)
+            pipe.rpush(ids_key, *message_ids)
+            pipe.expire(VECTOR_REBUILD_LOCK_KEY, VECTOR_REBUILD_LOCK_TTL)
+            pipe.execute()
+            indexed += len(message_ids)
+            rebuilt.update(message_ids)
+    
+    # WATCH: a save appending to the live matrix after its new rows are read would be lost by the swap
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(VECTOR_IDS_KEY)
+                live_count = pipe.llen(VECTOR_IDS_KEY)
+                appended = [msg_id for msg_id in pipe.lrange(VECTOR_IDS_KEY, live_start, -1)
+                            if msg_id not in rebuilt] if live_count > live_start else []
+                appended, rows = _vector_rows(manager, appended) if appended else ([], [])
+                total = indexed + len(appended)
+                pipe.multi()
+                if appended:
+                    queue_row_appends(pipe, indexed, rows, prefix)
+                    pipe.rpush(ids_key, *appended)
+                for chunk in range(chunk_count(total)):
+                    pipe.rename(matrix_chunk_key(chunk, prefix), matrix_chunk_key(chunk))
+                if total:
+                    pipe.rename(ids_key, VECTOR_IDS_KEY)
+                else:
+                    pipe.delete(VECTOR_IDS_KEY)
+                pipe.delete(VECTOR_MATRIX_KEY, *[matrix_chunk_key(chunk)
+                                                 for chunk in range(chunk_count(total), chunk_count(live_count))])
+                pipe.hincrby(VECTOR_META_KEY, 'epoch', 1)
+                pipe.hset(VECTOR_META_KEY, mapping={'version': VECTOR_VERSION, 'dimensions': VECTOR_DIM})
+                pipe.set(VECTOR_BACKFILL_KEY, datetime.datetime.now().isoformat())
+                pipe.execute()
+                break
+            except redis.WatchError:
+                continue
+    logger.info(f"Vector index: {total} rows ({indexed} of {message_count} timeline messages, "
+                f"{len(appended)} saved during the rebuild)")
+    return {'messages': message_count, 'indexed': total}
 
 # Usage example and CLI interface
 def main():
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Write-behindエンリッチメント・ワーカープール
+- ingest_mode="deferred" で保存されたメッセージを Redis キュー（enrichment:queue）から取得
+- 圧縮・要約・キーポイント・技術用語インデックスを非同期に補完
+- BLMOVE でプールごとの enrichment:processing:{プール ID} に移してから処理するため、ワーカー停止時も取りこぼさない
+- 各プールはハートビートキー（TTL 付き）を更新し続け、ハートビートが切れたプールの処理中リストだけをキューに戻す
+  （稼働中の別プロセスが処理しているジョブは戻さない）
+- メッセージは処理前に CAS で確保し、確保が続いている場合だけ結果を書き込む（同じメッセージの二重エンリッチを防ぐ）
+"""
+
+import asyncio
+import logging
+from typing import List, Optional
+from uuid import uuid4
+
+from conversation_redis_manager import (ENRICHMENT_HEARTBEAT_KEY,
+                                        ENRICHMENT_PROCESSING_KEY,
+                                        ENRICHMENT_QUEUE_KEY,
+                                        ENRICHMENT_WORKERS_KEY,
+                                        AsyncConversationRedisManager)
+
+logger = logging.getLogger(__name__)
+
+class EnrichmentWorkerPool:
+    """asyncio workers consuming the enrichment queue of an AsyncConversationRedisManager"""
+
+    def __init__(self, manager: AsyncConversationRedisManager, workers: int = 2,
+                 poll_timeout: float = 5.0, heartbeat_ttl: int = 30):
+        self.manager = manager
+        self.workers = workers
+        self.poll_timeout = poll_timeout
+        self.heartbeat_ttl = heartbeat_ttl
+        self.pool_id = uuid4().hex
+        self.processing_key = f"{ENRICHMENT_PROCESSING_KEY}:{self.pool_id}"
+        self.processed = 0
+        self.failed = 0
+        self.recovered = 0
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+    async def start(self) -> None:
+        """Register this pool, requeue jobs left in flight by dead pools, then start consuming"""
+        await self._beat()
+        recovered = await self.recover()
+        if recovered:
+            logger.info(f"Requeued {recovered} in-flight enrichment jobs")
+        self._stopping.clear()
+        self._tasks = [
+            asyncio.create_task(self._run(worker_id), name=f"enrichment-worker-{worker_id}")
+            for worker_id in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._heartbeat(), name="enrichment-heartbeat"))
+        logger.info(f"Enrichment worker pool {self.pool_id} started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # Hand interrupted jobs back at once instead of waiting for the heartbeat to expire
+        requeued = await self._requeue(self.processing_key)
+        pipe = self.manager.redis_client.pipeline()
+        pipe.delete(ENRICHMENT_HEARTBEAT_KEY.format(self.pool_id))
+        pipe.srem(ENRICHMENT_WORKERS_KEY, self.pool_id)
+        await pipe.execute()
+        logger.info(f"Enrichment worker pool stopped ({requeued} jobs requeued)")
+
+    async def recover(self) -> int:
+        """Move the in-flight jobs of pools whose heartbeat has expired back onto the queue"""
+        client = self.manager.redis_client
+        recovered = await self._requeue(ENRICHMENT_PROCESSING_KEY)
+        for pool_id in await client.smembers(ENRICHMENT_WORKERS_KEY):
+            if pool_id == self.pool_id or await client.exists(ENRICHMENT_HEARTBEAT_KEY.format(pool_id)):
+                continue
+            recovered += await self._requeue(f"{ENRICHMENT_PROCESSING_KEY}:{pool_id}")
+            await client.srem(ENRICHMENT_WORKERS_KEY, pool_id)
+        self.recovered += recovered
+        return recovered
+
+    async def _requeue(self, processing_key: str) -> int:
+        requeued = 0
+        while await self.manager.redis_client.lmove(processing_key, ENRICHMENT_QUEUE_KEY, "RIGHT", "RIGHT"):
+            requeued += 1
+        return requeued
+
+    async def _beat(self) -> None:
+        pipe = self.manager.redis_client.pipeline()
+        pipe.set(ENRICHMENT_HEARTBEAT_KEY.format(self.pool_id), 1, ex=self.heartbeat_ttl)
+        pipe.sadd(ENRICHMENT_WORKERS_KEY, self.pool_id)
+        await pipe.execute()
+
+    async def _heartbeat(self) -> None:
+        """Refresh the heartbeat well within its TTL and pick up the jobs of pools that died meanwhile"""
+        while not self._stopping.is_set():
+            await asyncio.sleep(self.heartbeat_ttl / 3)
+            try:
+                await self._beat()
+                recovered = await self.recover()
+                if recovered:
+                    logger.info(f"Requeued {recovered} enrichment jobs of expired worker pools")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Enrichment heartbeat error: {e}")
+
+    async def queue_depth(self) -> int:
+        return await self.manager.redis_client.llen(ENRICHMENT_QUEUE_KEY)
+
+    async def _next_job(self) -> Optional[str]:
+        # Oldest first: producers LPUSH, workers take from the right
+        return await self.manager.redis_client.blmove(
+            ENRICHMENT_QUEUE_KEY, self.processing_key, self.poll_timeout, "RIGHT", "LEFT"
+        )
+
+    async def _run(self, worker_id: int) -> None:
+        client = self.manager.redis_client
+        while not self._stopping.is_set():
+            try:
+                msg_id = await self._next_job()
+                if msg_id is None:
+                    continue
+
+                status = await self.manager.enrich_message(msg_id, self.pool_id)
+                await client.lrem(self.processing_key, 1, msg_id)
+                if status == "failed":
+                    self.failed += 1
+                else:
+                    self.processed += 1
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Redis hiccup: the job stays in the processing list and is recovered once this pool stops
+                logger.error(f"Enrichment worker {worker_id} error: {e}")
+                await asyncio.sleep(1)
+
+    def stats(self) -> dict:
+        return {
+            "pool_id": self.pool_id,
+            "workers": self.workers,
+            "processed": self.processed,
+            "failed": self.failed,
+            "recovered": self.recovered
+        }
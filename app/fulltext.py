@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+本文の全文検索インデックス（BM25）
+- トークン化: NFKC 正規化（全角/半角の統一）と大文字小文字の統一のあと、英数字の連続は1語、
+  日本語・中国語・韓国語（CJK）の連続は文字バイグラム（1文字だけの連続はその1文字）
+- 索引と検索語に同じトークン化を使うため、分かち書きのない日本語の部分文字列も索引で検索できる
+- ほぼすべての文書に現れる CJK の機能語バイグラム（して / ます / 我们 など、STOP_BIGRAMS）は索引にも検索語にも使わない
+  （ポスティングが文書数まで膨らむ割に IDF がほぼ 0）。文書長には数える
+- 1文書で索引する語は出現回数の多い順に FULLTEXT_MAX_TERMS 種類まで（長文でも保存スクリプトの引数が膨らまない）
+- 保存時に本文をトークン化し、語ごとのポスティング（fts:term:{term}、スコア = 語の出現回数）を保存スクリプト内で更新
+- 文書長は fts:doclen（ハッシュ）、文書数と総文書長は fts:stats に保持（平均文書長は読み出し時に算出）
+- 文書頻度はポスティングの要素数（ZCARD）そのもので、別の表を持たないためずれない
+- 検索は Lua スクリプト（FULLTEXT_SEARCH_SCRIPT）が Redis 内でスコアを計算し、上位 k 件の ID とスコアだけを返す（本文は走査しない）
+- 1語あたりの走査は語の出現回数の多い順に BM25_SCAN_LIMIT 件まで。文書の過半（BM25_MAX_DF）かつ上限を超える
+  ありふれた語は、より珍しい語がクエリにあれば読まない（IDF がほぼ 0 でコストだけが大きい）。文書長は HMGET でまとめて読む
+- 要約インデックス（sum:*）: summary_short / summary_medium / key_points だけを同じ形式で索引した小さな BM25 インデックス
+  （search_scope="summaries"）。キー構成は TextIndex で共通化
+"""
+
+import json
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Tuple
+
+FULLTEXT_TERM_PREFIX = "fts:term:"
+FULLTEXT_LENGTHS_KEY = "fts:doclen"
+FULLTEXT_STATS_KEY = "fts:stats"
+# Bumped whenever tokenize() or the indexed terms change: the backfill then rebuilds the index (stamped in fts:stats)
+FULLTEXT_TOKENIZER_VERSION = 3
+FULLTEXT_BACKFILL_KEY = f"fts:backfilled:v{FULLTEXT_TOKENIZER_VERSION}"
+SUMMARY_BACKFILL_KEY = f"sum:backfilled:v{FULLTEXT_TOKENIZER_VERSION}"
+# Message hash fields indexed by the summary index (and returned by summary-scope searches)
+SUMMARY_FIELDS = ('summary_short', 'summary_medium', 'key_points')
+
+# BM25 parameters (term frequency saturation, length normalization)
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Search cost bounds (FULLTEXT_SEARCH_SCRIPT): a term in more than max(BM25_MAX_DF * docs,
+# BM25_SCAN_LIMIT) documents is skipped when the query has a rarer term, and at most
+# BM25_SCAN_LIMIT postings per term (highest term frequency first) are scored
+BM25_MAX_DF = 0.5
+BM25_SCAN_LIMIT = 10000
+# Longer runs (hashes, base64, minified code) are not indexed
+MAX_TOKEN_LENGTH = 64
+# Distinct terms indexed per document, most frequent first (bounds postings writes and the save plan)
+FULLTEXT_MAX_TERMS = 2000
+
+# CJK bigrams found in nearly every document (particles, auxiliaries, pronouns, conjunctions):
+# their postings would grow with the corpus while contributing almost no IDF
+STOP_BIGRAMS = frozenset("""
+して ます です した てい いる する こと ない ある れる られ から まで ので など よう ため もの
+その この それ これ では には とは ませ せん でし まし った って され なる あり おり でき いた
+れた ての との のは のが のを のに ださ くだ さい
+我们 你们 他们 一个 这个 那个 什么 没有 可以 因为 所以 但是 如果 就是 还是 已经 不是 这是
+的是 也是 还有 这样 那么 一些 然后 而且 或者 以及
+""".split())
+
+# Scripts written without spaces between words: kana (incl. ー, not the ・ separator), 々,
+# CJK ideographs, Hangul
+_CJK_CHARS = "\u3005\u3041-\u30fa\u30fc-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af"
+# CJK runs, or runs of other letters and digits ("_" separates tokens so snake_case parts are searchable)
+_TOKEN_RE = re.compile(rf"(?P<cjk>[{_CJK_CHARS}]+)|[^\W_{_CJK_CHARS}]+")
+
+def normalize(text: str) -> str:
+    """NFKC (full-width Latin and digits to ASCII, half-width kana to full-width) and case folding"""
+    return unicodedata.normalize('NFKC', text).casefold()
+
+def tokenize(text: str) -> List[str]:
+    """Tokens of a text in text order: Latin words and CJK character bigrams (stop bigrams included)"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(normalize(text)):
+        run = match.group()
+        if match.lastgroup == 'cjk':
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        elif len(run) <= MAX_TOKEN_LENGTH:
+            tokens.append(run)
+    return tokens
+
+def index_terms(text: str) -> Tuple[List, int]:
+    """([term, frequency, term, frequency, ...], document length) for the save plan"""
+    tokens = tokenize(text)
+    counts = Counter(token for token in tokens if token not in STOP_BIGRAMS)
+    # most_common keeps first-occurrence order among equal counts
+    terms = counts.most_common(FULLTEXT_MAX_TERMS) if len(counts) > FULLTEXT_MAX_TERMS else counts.items()
+    return [item for pair in terms for item in pair], len(tokens)
+
+def query_terms(terms: List[str]) -> List[str]:
+    """Distinct index terms of the query terms, tokenized like the documents"""
+    return list(dict.fromkeys(
+        token for term in terms for token in tokenize(term) if token not in STOP_BIGRAMS
+    ))
+
+@dataclass(frozen=True)
+class TextIndex:
+    """Keys of a BM25 index: postings {term_prefix}{term}, document lengths hash, corpus stats hash"""
+    term_prefix: str
+    lengths_key: str
+    stats_key: str
+
+    def term_key(self, term: str) -> str:
+        return self.term_prefix + term
+
+    def plan(self) -> Dict[str, str]:
+        """The key layout as passed to the save script"""
+        return asdict(self)
+
+FULLTEXT_INDEX = TextIndex(FULLTEXT_TERM_PREFIX, FULLTEXT_LENGTHS_KEY, FULLTEXT_STATS_KEY)
+SUMMARY_INDEX = TextIndex("sum:term:", "sum:doclen", "sum:stats")
+
+def summary_text(fields: Dict[str, Any]) -> str:
+    """Text indexed for a message by the summary index; fields as stored (key_points JSON) or as lists"""
+    key_points = fields.get('key_points') or []
+    if isinstance(key_points, str):
+        key_points = json.loads(key_points)
+    return "\n".join([fields.get('summary_short') or '', fields.get('summary_medium') or '', *key_points])
@@ -7,19 +7,41 @@ import json
 import logging
 import os
 from contextlib import asynccontextmanager
+from dataclasses import asdict
 from datetime import datetime
 # load .env with explicit path
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from conversation_redis_manager import (ConversationRedisManager,
-                                        SmartTextProcessor,
+from conversation_redis_manager import (ENRICHMENT_QUEUE_KEY,
+                                        FREQUENCY_BACKFILL_KEY, INGEST_MODES,
+                                        RANKED_SEARCH_SCOPES, SESSION_BACKFILL_KEY,
+                                        TAG_BACKFILL_KEY, VECTOR_SEARCH_SCOPE,
+                                        AsyncConversationRedisManager,
+                                        ConversationRedisManager,
+                                        backfill_frequency_aggregates,
+                                        backfill_fulltext_index,
+                                        backfill_session_indexes,
+                                        backfill_summary_index,
+                                        backfill_tag_postings,
+                                        backfill_vector_index,
                                         migrate_existing_messages)
+from context_cache import ContextCache
+from context_renderers import check_format_type, render_context
 from dotenv import load_dotenv
-from fastapi import BackgroundTasks, FastAPI, HTTPException, Query
+from enrichment import EnrichmentWorkerPool
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
+from fulltext import FULLTEXT_BACKFILL_KEY, SUMMARY_BACKFILL_KEY
+from processing_service import (ProcessingQueueFull, ProcessingTimeout,
+                                TextProcessingService)
 from pydantic import BaseModel, Field
+from search_cache import SearchCache
+from search_query import QuerySyntaxError, parse_query
+from vector_index import VECTOR_BACKFILL_KEY, VectorIndex
+from vocabulary import get_vocabulary
 
 env_path = Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -43,6 +65,16 @@ class MessageRequest(BaseModel):
     keywords: Optional[List[str]] = Field(default=[], description="Message keywords")
     session_id: Optional[str] = Field(default=None, description="Session ID")
 
+class MessageBatchItem(MessageRequest):
+    timestamp: Optional[datetime] = Field(default=None, description="Original message time (for imports); defaults to now")
+
+# Upper bound per /messages/batch request; larger imports send several batches
+MAX_BATCH_SIZE = 1000
+
+class MessageBatchRequest(BaseModel):
+    messages: List[MessageBatchItem] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE,
+                                             description="Messages to save in one pipeline")
+
 class EnhancedInsightRequest(BaseModel):
     insight_type: str = Field(..., description="Type of insight")
     content: str = Field(..., description="Insight content")
@@ -54,51 +86,186 @@ class EnhancedInsightRequest(BaseModel):
     actionable_items: List[str] = Field(default=[], description="Actionable items")
 
 class EnhancedSearchRequest(BaseModel):
-    query_terms: List[str] = Field(..., description="Search terms")
-    search_scope: str = Field(default="all", description="Search scope: all/summaries/technical/topics")
+    query_terms: List[str] = Field(default=[], description="Search terms (matches any of them)")
+    query: Optional[str] = Field(default=None, description='Boolean query in place of query_terms for the tag scopes, e.g. redis AND (docker OR kubernetes) NOT legacy; quote tags with spaces ("machine learning")')
+    search_scope: str = Field(default="all", description="Search scope: all/technical/topics (newest first), fulltext (BM25 over message bodies), summaries (BM25 over summaries and key points; hits carry summaries instead of the body) or similar (cosine similarity to the query_terms joined as one text)")
     limit: int = Field(default=20, ge=1, le=100, description="Result limit")
 
+class SimilarSearchRequest(BaseModel):
+    text: Optional[str] = Field(default=None, description="Find messages similar to this text")
+    message_id: Optional[str] = Field(default=None, description="Find messages similar to this stored message (used instead of text)")
+    limit: int = Field(default=10, ge=1, le=100, description="Result limit")
+
 class EnhancedContextRequest(BaseModel):
     limit: int = Field(default=50, ge=1, le=200, description="Message limit")
     detail_level: str = Field(default="adaptive", description="Detail level: short/medium/full/adaptive")
-    format_type: str = Field(default="structured", description="Context format")
+    format_type: str = Field(default="structured", description="Context format: structured/narrative/bullet")
+    token_budget: Optional[int] = Field(default=None, ge=1, description="Token budget for the messages; picks full/medium/short per message instead of detail_level")
+
+class ContextDeltaRequest(BaseModel):
+    since: Optional[str] = Field(default=None, description="Cursor from the previous call (message id) or a timeline score; omit for the newest messages")
+    limit: int = Field(default=50, ge=1, le=200, description="Maximum new messages to return")
+    detail_level: str = Field(default="adaptive", description="Detail level: short/medium/full/adaptive")
+
+class ContextStreamRequest(BaseModel):
+    limit: int = Field(default=50, ge=1, le=1000, description="Message limit")
+    detail_level: str = Field(default="adaptive", description="Detail level: short/medium/full/adaptive")
+    stream_format: str = Field(default="ndjson", description="Stream format: ndjson/sse")
+
+class SearchStreamRequest(EnhancedSearchRequest):
+    limit: int = Field(default=20, ge=1, le=1000, description="Result limit")
+    stream_format: str = Field(default="ndjson", description="Stream format: ndjson/sse")
+
+class ExportStreamRequest(BaseModel):
+    limit: int = Field(default=50, ge=1, le=1000, description="Message limit")
+    detail_level: str = Field(default="adaptive", description="Detail level: short/medium/full/adaptive")
 
 class CompressionAnalysisRequest(BaseModel):
     text: str = Field(..., description="Text to analyze for compression potential")
 
-# Global enhanced Redis manager
-redis_manager = None
+# Global enhanced Redis manager (async, shared connection pool)
+redis_manager: Optional[AsyncConversationRedisManager] = None
+# Connection settings, kept for the sync manager used by migrations
+redis_settings: Dict[str, Any] = {}
+# Write-behind enrichment workers for ingest_mode="deferred"
+enrichment_pool: Optional[EnrichmentWorkerPool] = None
+# Process pool for summarization/extraction of large texts
+text_processing: Optional[TextProcessingService] = None
+# Versioned cache of /context results (CONTEXT_CACHE_MODE=memory/redis/off)
+context_cache: Optional[ContextCache] = None
+# Generation-tagged LRU of /search candidates (SEARCH_CACHE_MODE=memory/off)
+search_cache: Optional[SearchCache] = None
+DEFAULT_INGEST_MODE = os.getenv('INGEST_MODE', 'sync')
+
+def resolve_ingest_mode(ingest_mode: Optional[str]) -> str:
+    ingest_mode = ingest_mode or DEFAULT_INGEST_MODE
+    if ingest_mode not in INGEST_MODES:
+        raise HTTPException(status_code=400, detail=f"ingest_mode must be one of {list(INGEST_MODES)}")
+    return ingest_mode
+
+def processing_error(e: Exception) -> HTTPException:
+    """Map text processing overload to 503 and task timeouts to 504"""
+    if isinstance(e, ProcessingQueueFull):
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    return HTTPException(status_code=504, detail=str(e))
+
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def encode_stream_event(event: Dict[str, Any], stream_format: str) -> str:
+    data = json.dumps(event, ensure_ascii=False)
+    if stream_format == "sse":
+        return f"event: {event['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+def stream_events(events, stream_format: str) -> StreamingResponse:
+    """Stream manager events as NDJSON lines or SSE; a failure mid-stream becomes an 'error' event"""
+    if stream_format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"stream_format must be one of {list(STREAM_MEDIA_TYPES)}")
+    
+    async def encoded():
+        try:
+            async for event in events:
+                yield encode_stream_event(event, stream_format)
+        except Exception as e:
+            # The status line is already sent; report in-band
+            logger.error(f"Error while streaming: {e}")
+            yield encode_stream_event({"type": "error", "detail": str(e)}, stream_format)
+    
+    return StreamingResponse(encoded(), media_type=STREAM_MEDIA_TYPES[stream_format],
+                             headers={"Cache-Control": "no-cache"})
+
+def run_migration():
+    """Run migrate_existing_messages on a dedicated sync connection"""
+    sync_manager = ConversationRedisManager(**redis_settings)
+    try:
+        # migrated messages are added to the tag postings, which must no longer be sets
+        backfill_tag_postings(sync_manager.redis_client)
+        migrate_existing_messages(sync_manager.redis_client, sync_manager.processor, sync_manager.codecs)
+        # migrated v1 messages gain technical terms, migrated bodies change size
+        backfill_frequency_aggregates(sync_manager.redis_client)
+        backfill_session_indexes(sync_manager.redis_client)
+        backfill_fulltext_index(sync_manager)
+        backfill_summary_index(sync_manager.redis_client)
+        backfill_vector_index(sync_manager)
+    finally:
+        sync_manager.redis_client.close()
+
+# Indexes maintained at write time: (marker key set once built, backfill taking a sync manager)
+BACKFILLS = (
+    (TAG_BACKFILL_KEY, lambda manager: backfill_tag_postings(manager.redis_client)),
+    (FREQUENCY_BACKFILL_KEY, lambda manager: backfill_frequency_aggregates(manager.redis_client)),
+    (SESSION_BACKFILL_KEY, lambda manager: backfill_session_indexes(manager.redis_client)),
+    (FULLTEXT_BACKFILL_KEY, backfill_fulltext_index),
+    (SUMMARY_BACKFILL_KEY, lambda manager: backfill_summary_index(manager.redis_client)),
+    (VECTOR_BACKFILL_KEY, backfill_vector_index),
+)
+
+def run_backfill(backfill):
+    """Run one of BACKFILLS on a dedicated sync connection"""
+    sync_manager = ConversationRedisManager(**redis_settings)
+    try:
+        backfill(sync_manager)
+    finally:
+        sync_manager.redis_client.close()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan with enhanced features"""
-    global redis_manager
+    global redis_manager, enrichment_pool, text_processing, context_cache, search_cache
     # Startup
     try:
         logger.info(f"Environment variables loaded from: {env_path}")
         
-        redis_host = os.getenv('REDIS_HOST', 'localhost')
-        redis_port = int(os.getenv('REDIS_PORT', 6379))
-        redis_db = int(os.getenv('REDIS_DB', 0))
-        redis_password = os.getenv('REDIS_PASSWORD')
-        redis_ssl = os.getenv('REDIS_SSL', 'false').lower() == 'true'
-        
-        logger.info(f"Connecting to Enhanced Redis at {redis_host}:{redis_port} (SSL: {redis_ssl})")
-        
-        redis_manager = ConversationRedisManager(
-            host=redis_host,
-            port=redis_port,
-            db=redis_db,
-            password=redis_password,
-            use_ssl=redis_ssl
+        redis_settings.update(
+            host=os.getenv('REDIS_HOST', 'localhost'),
+            port=int(os.getenv('REDIS_PORT', 6379)),
+            db=int(os.getenv('REDIS_DB', 0)),
+            password=os.getenv('REDIS_PASSWORD'),
+            use_ssl=os.getenv('REDIS_SSL', 'false').lower() == 'true'
         )
+        max_connections = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+        
+        logger.info(f"Connecting to Enhanced Redis at {redis_settings['host']}:{redis_settings['port']} "
+                    f"(SSL: {redis_settings['use_ssl']}, pool size: {max_connections})")
+        
+        text_processing = TextProcessingService.from_env()
+        context_cache = ContextCache.from_env()
+        search_cache = SearchCache.from_env()
+        
+        redis_manager = await AsyncConversationRedisManager.create(
+            max_connections=max_connections,
+            text_processing=text_processing,
+            context_cache=context_cache,
+            vector_index=VectorIndex.from_env(),
+            search_cache=search_cache,
+            **redis_settings
+        )
+        # After create(): pool workers inherit the vocabulary it loaded
+        text_processing.start()
         
         # Check if migration is needed
         migration_needed = os.getenv('ENABLE_MIGRATION', 'false').lower() == 'true'
         if migration_needed:
             logger.info("Starting data migration to enhanced format...")
-            migrate_existing_messages(redis_manager.redis_client, redis_manager.processor)
+            await run_in_threadpool(run_migration)
             logger.info("Migration completed successfully")
+        else:
+            # Seed each write-time index once from existing data; a drifted vector matrix
+            # (removed or evicted messages, a missing chunk) is rebuilt as if never seeded;
+            # the vector rebuild holds vectors:rebuild:lock, so only one worker runs it
+            if await redis_manager.vector_index_stale():
+                await redis_manager.redis_client.delete(VECTOR_BACKFILL_KEY)
+            for marker_key, backfill in BACKFILLS:
+                if not await redis_manager.redis_client.exists(marker_key):
+                    await run_in_threadpool(run_backfill, backfill)
+        
+        enrichment_workers = int(os.getenv('ENRICHMENT_WORKERS', 2))
+        if enrichment_workers > 0:
+            enrichment_pool = EnrichmentWorkerPool(
+                redis_manager, workers=enrichment_workers,
+                heartbeat_ttl=int(os.getenv('ENRICHMENT_HEARTBEAT_TTL', 30))
+            )
+            await enrichment_pool.start()
         
         logger.info("Enhanced Redis connection established successfully")
         
@@ -109,8 +276,13 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
+    if enrichment_pool:
+        await enrichment_pool.stop()
     if redis_manager:
         logger.info("Shutting down Enhanced Redis connection")
+        await redis_manager.close()
+    if text_processing:
+        text_processing.stop()
 
 # Enhanced FastAPI app
 app = FastAPI(
@@ -135,9 +307,10 @@ async def health_check():
     """Enhanced health check with compression stats"""
     try:
         if redis_manager:
-            redis_manager.redis_client.ping()
-            total_messages = redis_manager.redis_client.zcard("messages:timeline")
-            total_saved = int(redis_manager.redis_client.get("analytics:compression_total_saved") or 0)
+            await redis_manager.redis_client.ping()
+            total_messages = await redis_manager.redis_client.zcard("messages:timeline")
+            total_saved = int(await redis_manager.redis_client.get("analytics:compression_total_saved") or 0)
+            enrichment_backlog = await redis_manager.redis_client.llen(ENRICHMENT_QUEUE_KEY)
             
             return {
                 "status": "healthy",
@@ -146,7 +319,13 @@ async def health_check():
                 "features": ["smart_compression", "multi_layer_summary", "adaptive_context"],
                 "stats": {
                     "total_messages": total_messages,
-                    "compression_bytes_saved": total_saved
+                    "compression_bytes_saved": total_saved,
+                    "enrichment_queue_depth": enrichment_backlog,
+                    "enrichment_workers": enrichment_pool.stats() if enrichment_pool else None,
+                    "text_processing": text_processing.stats() if text_processing else None,
+                    "context_cache": context_cache.stats() if context_cache else None,
+                    "search_cache": search_cache.stats() if search_cache else None,
+                    "vocabulary": get_vocabulary().stats()
                 }
             }
     except Exception as e:
@@ -155,46 +334,90 @@ async def health_check():
 @app.post("/messages", response_model=Dict[str, Any])
 async def save_message_enhanced(
     message: MessageRequest,
-    background_tasks: BackgroundTasks
+    ingest_mode: Optional[str] = Query(default=None, description="sync/deferred (default: INGEST_MODE)")
 ):
     """Save a conversation message with enhanced compression and summarization"""
+    ingest_mode = resolve_ingest_mode(ingest_mode)
     try:
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
         
-        message_id = redis_manager.save_message(
-            role=message.role,
-            content=message.content,
-            topics=message.topics,
-            keywords=message.keywords,
-            session_id=message.session_id
-        )
-        
-        # Background task for analytics
-        background_tasks.add_task(update_analytics_enhanced, message_id, message.content)
-        
-        # Get message details for response
-        msg_data = redis_manager.redis_client.hgetall(f"message:{message_id}")
+        # One atomic round trip: session, message, indexes and analytics (save script)
+        result = (await redis_manager.save_messages([message.model_dump()], ingest_mode=ingest_mode))[0]
         
         # Calculate bytes saved from compression ratio and content length
-        compression_ratio = float(msg_data.get('compression_ratio', 1.0))
-        content_length = int(msg_data.get('content_length', 0))
+        compression_ratio = result['compression_ratio']
+        content_length = result['content_length']
         bytes_saved = int((1 - compression_ratio) * content_length) if compression_ratio < 1.0 else 0
         
         return {
-            "message_id": message_id,
+            "message_id": result['message_id'],
             "status": "saved",
             "compression_ratio": compression_ratio,
             "content_length": content_length,
             "bytes_saved": bytes_saved,
-            "summary_generated": bool(msg_data.get('summary_short')),
-            "technical_terms_extracted": len(json.loads(msg_data.get('technical_terms', '[]')))
+            "codec": result['codec'],
+            "compressed_length": result['compressed_length'],
+            "summary_generated": result['summary_generated'],
+            "technical_terms_extracted": result['technical_terms_extracted'],
+            "enrichment_status": result['enrichment_status']
         }
         
+    except (ProcessingQueueFull, ProcessingTimeout) as e:
+        logger.warning(f"Text processing unavailable for message: {e}")
+        raise processing_error(e)
     except Exception as e:
         logger.error(f"Error saving enhanced message: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/messages/batch", response_model=Dict[str, Any])
+async def save_messages_batch(
+    batch: MessageBatchRequest,
+    ingest_mode: Optional[str] = Query(default=None, description="sync/deferred (default: INGEST_MODE)")
+):
+    """Save up to MAX_BATCH_SIZE messages atomically in a single Redis round trip"""
+    ingest_mode = resolve_ingest_mode(ingest_mode)
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        items = await redis_manager.save_messages(
+            [message.model_dump() for message in batch.messages],
+            ingest_mode=ingest_mode
+        )
+        
+        return {
+            "status": "saved",
+            "count": len(items),
+            "items": items,
+            "bytes_saved": sum(item["bytes_saved"] for item in items)
+        }
+        
+    except (ProcessingQueueFull, ProcessingTimeout) as e:
+        logger.warning(f"Text processing unavailable for message batch: {e}")
+        raise processing_error(e)
+    except Exception as e:
+        logger.error(f"Error saving message batch: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/messages/{message_id}/enrichment")
+async def get_enrichment_status(
+    message_id: str,
+    wait: float = Query(default=0, ge=0, le=30, description="Seconds to wait for a pending enrichment")
+):
+    """Enrichment status of a message, optionally waiting for a deferred enrichment to finish"""
+    if not redis_manager:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    if wait > 0:
+        statuses = await redis_manager.wait_for_enrichment([message_id], timeout=wait)
+    else:
+        statuses = await redis_manager.get_enrichment_status([message_id])
+    
+    if statuses[message_id] is None:
+        raise HTTPException(status_code=404, detail=f"Message {message_id} not found")
+    return {"message_id": message_id, "enrichment_status": statuses[message_id]}
+
 @app.post("/insights", response_model=Dict[str, str])
 async def save_insight_enhanced(insight: EnhancedInsightRequest):
     """Save an enhanced insight with additional context"""
@@ -202,7 +425,7 @@ async def save_insight_enhanced(insight: EnhancedInsightRequest):
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
         
-        insight_id = redis_manager.save_insight(
+        insight_id = await redis_manager.save_insight(
             insight_type=insight.insight_type,
             content=insight.content,
             summary=insight.summary,
@@ -219,50 +442,251 @@ async def save_insight_enhanced(insight: EnhancedInsightRequest):
         logger.error(f"Error saving enhanced insight: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def check_search_request(search: EnhancedSearchRequest) -> None:
+    """400 unless the request has query_terms or a well-formed query"""
+    if search.query:
+        if search.search_scope in RANKED_SEARCH_SCOPES or search.search_scope == VECTOR_SEARCH_SCOPE:
+            raise HTTPException(status_code=400, detail=f"query applies to the tag scopes (all, topics, technical); use query_terms for {search.search_scope}")
+        try:
+            parse_query(search.query)
+        except QuerySyntaxError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    elif not search.query_terms:
+        raise HTTPException(status_code=400, detail="Either query_terms or query is required")
+
 @app.post("/search", response_model=List[Dict])
-async def search_conversations_enhanced(search: EnhancedSearchRequest):
-    """Enhanced search with technical terms and full content access"""
+async def search_conversations_enhanced(search: EnhancedSearchRequest, response: Response):
+    """Enhanced search with technical terms and full content access
+
+    X-Search-Truncated: true when a tag posting the query reads is at TAG_POSTINGS_CAP,
+    so older matches may be missing from tag-scope and boolean results.
+    """
     try:
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
+        check_search_request(search)
         
-        results = redis_manager.search_conversations(
+        results = await redis_manager.search_conversations(
             query_terms=search.query_terms,
             limit=search.limit,
-            search_scope=search.search_scope
+            search_scope=search.search_scope,
+            query=search.query
         )
+        truncated = await redis_manager.search_truncated(search.query_terms, search.search_scope, search.query)
+        response.headers["X-Search-Truncated"] = "true" if truncated else "false"
         
         return results
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error searching enhanced conversations: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/search/stream")
+async def stream_search(search: SearchStreamRequest):
+    """/search streamed newest first: a 'search' header, one 'result' per message, then 'end'"""
+    if not redis_manager:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    check_search_request(search)
+    
+    return stream_events(
+        redis_manager.stream_search(search.query_terms, limit=search.limit, search_scope=search.search_scope,
+                                    query=search.query),
+        search.stream_format
+    )
+
+@app.post("/search/similar", response_model=Dict[str, Any])
+async def search_similar(search: SimilarSearchRequest):
+    """Messages most similar to a text or a stored message, by cosine similarity of their term vectors"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        similar = await redis_manager.find_similar(text=search.text, message_id=search.message_id,
+                                                   limit=search.limit)
+        if similar is None:
+            raise HTTPException(status_code=404, detail=f"Message {search.message_id} not found")
+        return similar
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding similar messages: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/timeline", response_model=Dict[str, Any])
+async def get_timeline(
+    start: Optional[str] = Query(default=None, description="Inclusive lower bound: ISO 8601 timestamp or epoch seconds"),
+    end: Optional[str] = Query(default=None, description="Exclusive upper bound: ISO 8601 timestamp or epoch seconds"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor of the previous page (carries start/end/order)"),
+    limit: int = Query(default=100, ge=1, le=1000, description="Page size"),
+    fields: Optional[str] = Query(default=None, description="Comma-separated message fields; 'content' returns the full body"),
+    order: str = Query(default="asc", description="asc (oldest first) / desc"),
+    session_id: Optional[str] = Query(default=None, description="Only this session's messages (session:{id}:timeline)")
+):
+    """Page through messages:timeline by time range with opaque continuation cursors"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        return await redis_manager.get_timeline_page(
+            start=start, end=end, cursor=cursor, limit=limit,
+            fields=[field.strip() for field in fields.split(",") if field.strip()] if fields else None,
+            order=order, session_id=session_id
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error reading timeline: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/context", response_model=Dict[str, Any])
 async def get_context_enhanced(context_req: EnhancedContextRequest):
     """Get enhanced conversation context with adaptive detail levels"""
     try:
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
+        check_format_type(context_req.format_type)
         
-        context = redis_manager.get_conversation_context(
+        # One fetch feeds the renderer and raw_data
+        context = await redis_manager.get_conversation_context(
             limit=context_req.limit,
-            detail_level=context_req.detail_level
+            detail_level=context_req.detail_level,
+            token_budget=context_req.token_budget
         )
         
-        if context_req.format_type == "narrative":
-            formatted_context = redis_manager.export_for_ai_context(
-                "narrative", 
-                context_req.detail_level
-            )
-            return {"context": formatted_context, "raw_data": context}
+        if context_req.format_type == "structured":
+            return context
         
-        return context
+        return {"context": render_context(context, context_req.format_type), "raw_data": context}
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting enhanced context: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/sessions", response_model=Dict[str, Any])
+async def list_sessions(
+    limit: int = Query(default=50, ge=1, le=1000, description="Sessions per page"),
+    offset: int = Query(default=0, ge=0, description="Sessions to skip (newest activity first)")
+):
+    """Sessions by last activity with message count, first/last activity and byte totals"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        return await redis_manager.list_sessions(limit=limit, offset=offset)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing sessions: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/sessions/{session_id}", response_model=Dict[str, Any])
+async def get_session(session_id: str):
+    """Counters of one session"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        session = await redis_manager.get_session(session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        return session
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting session {session_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/sessions/{session_id}/context", response_model=Dict[str, Any])
+async def get_session_context(session_id: str, context_req: EnhancedContextRequest):
+    """/context for a single session, read with one range query on its timeline"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        check_format_type(context_req.format_type)
+        
+        context = await redis_manager.get_session_context(
+            session_id,
+            limit=context_req.limit,
+            detail_level=context_req.detail_level,
+            token_budget=context_req.token_budget
+        )
+        if context is None:
+            raise HTTPException(status_code=404, detail=f"Session {session_id} not found")
+        
+        if context_req.format_type == "structured":
+            return context
+        
+        return {"context": render_context(context, context_req.format_type), "raw_data": context}
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting session context: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/context/stream")
+async def stream_context(context_req: ContextStreamRequest):
+    """/context streamed as messages are hydrated: a 'context' header, one 'message' per message, then 'end'"""
+    if not redis_manager:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    return stream_events(
+        redis_manager.stream_conversation_context(limit=context_req.limit, detail_level=context_req.detail_level),
+        context_req.stream_format
+    )
+
+@app.post("/export/stream")
+async def stream_export(export_req: ExportStreamRequest):
+    """Bullet-format AI context export as plain text, one line per message as it is hydrated"""
+    if not redis_manager:
+        raise HTTPException(status_code=503, detail="Redis not available")
+    
+    return StreamingResponse(
+        redis_manager.stream_export_for_ai_context(limit=export_req.limit, detail_level=export_req.detail_level),
+        media_type="text/plain; charset=utf-8"
+    )
+
+@app.post("/context/delta", response_model=Dict[str, Any])
+async def get_context_delta(delta_req: ContextDeltaRequest):
+    """Only the messages newer than the client's cursor, plus current aggregates and the next cursor"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        return await redis_manager.get_context_delta(
+            since=delta_req.since,
+            limit=delta_req.limit,
+            detail_level=delta_req.detail_level
+        )
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting context delta: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/analytics")
 async def get_analytics_enhanced():
     """Get enhanced conversation analytics with compression stats"""
@@ -270,38 +694,32 @@ async def get_analytics_enhanced():
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
             
-        total_messages = redis_manager.redis_client.zcard("messages:timeline")
-        total_insights = redis_manager.redis_client.zcard("insights:by_relevance")
-        total_saved = int(redis_manager.redis_client.get("analytics:compression_total_saved") or 0)
-        
-        # Get top topics
-        topic_keys = redis_manager.redis_client.keys("topic:*")
-        topics = []
-        for key in topic_keys[:15]:
-            count = redis_manager.redis_client.scard(key)
-            topic = key.replace("topic:", "")
-            topics.append({"topic": topic, "count": count})
-        
-        topics.sort(key=lambda x: x["count"], reverse=True)
-        
-        # Get technical terms
-        tech_keys = redis_manager.redis_client.keys("tech:*")
-        tech_terms = []
-        for key in tech_keys[:10]:
-            count = redis_manager.redis_client.scard(key)
-            term = key.replace("tech:", "")
-            tech_terms.append({"term": term, "count": count})
-        
-        tech_terms.sort(key=lambda x: x["count"], reverse=True)
+        pipe = redis_manager.redis_client.pipeline(transaction=False)
+        pipe.zcard("messages:timeline")
+        pipe.zcard("insights:by_relevance")
+        pipe.get("analytics:compression_total_saved")
+        pipe.mget("analytics:compression_original_bytes", "analytics:compression_stored_bytes")
+        pipe.hgetall("analytics:compression_codecs")
+        # All-time top-k, maintained at write time
+        pipe.zrevrange("freq:topics:all", 0, 4, withscores=True)
+        pipe.zrevrange("freq:tech:all", 0, 4, withscores=True)
+        (total_messages, total_insights, total_saved, (original_bytes, stored_bytes),
+         codec_counts, top_topics, top_terms) = await pipe.execute()
+        total_saved = int(total_saved or 0)
+        original_bytes, stored_bytes = int(original_bytes or 0), int(stored_bytes or 0)
         
         return {
             "total_messages": total_messages,
             "total_insights": total_insights,
-            "top_topics": topics[:5],
-            "technical_terms": tech_terms[:5],
+            "top_topics": [{"topic": topic, "count": int(count)} for topic, count in top_topics],
+            "technical_terms": [{"term": term, "count": int(count)} for term, count in top_terms],
             "compression_stats": {
                 "total_bytes_saved": total_saved,
-                "average_compression_ratio": 0.7  # Could calculate from actual data
+                "average_compression_ratio": stored_bytes / original_bytes if original_bytes else 1.0,
+                "original_bytes": original_bytes,
+                "stored_bytes": stored_bytes,
+                "messages_by_codec": {codec: int(count) for codec, count in codec_counts.items()},
+                "active_dictionary": redis_manager.codecs.active_dict_id
             },
             "last_updated": datetime.now().isoformat()
         }
@@ -314,33 +732,60 @@ async def get_analytics_enhanced():
 async def analyze_compression_potential(analysis: CompressionAnalysisRequest):
     """Analyze text compression potential"""
     try:
-        processor = SmartTextProcessor()
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
         
-        # Analyze compression
-        compressed, ratio = processor.compress_text(analysis.text)
+        # Analyze compression with the same adaptive policy save_message uses
+        encoded = analysis.text.encode('utf-8')
+        compression = await redis_manager.compress(encoded, measure=True)
+        candidates = compression.candidates or await redis_manager.measure(encoded)
         
-        # Generate summaries
-        short_summary = processor.generate_summary_short(analysis.text)
-        medium_summary = processor.generate_summary_medium(analysis.text)
-        key_points = processor.extract_key_points(analysis.text)
-        technical_terms = processor.extract_technical_terms(analysis.text)
+        # Generate summaries (process pool for large texts)
+        derived = await redis_manager.analyze_text(analysis.text)
         
         return {
             "original_length": len(analysis.text),
-            "compressed_length": len(compressed),
-            "compression_ratio": ratio,
-            "bytes_saved": len(analysis.text) - len(compressed),
-            "short_summary": short_summary,
-            "medium_summary": medium_summary,
-            "key_points": key_points,
-            "technical_terms": technical_terms,
+            "original_bytes": compression.original_length,
+            "compressed_length": compression.compressed_length,
+            "compression_ratio": compression.compression_ratio,
+            "bytes_saved": compression.original_length - compression.compressed_length,
+            "codec": compression.codec,
+            "codec_candidates": [asdict(candidate) for candidate in candidates],
+            "short_summary": derived['summary_short'],
+            "medium_summary": derived['summary_medium'],
+            "key_points": derived['key_points'],
+            "technical_terms": derived['technical_terms'],
             "analysis_timestamp": datetime.now().isoformat()
         }
         
+    except (ProcessingQueueFull, ProcessingTimeout) as e:
+        logger.warning(f"Text processing unavailable for compression analysis: {e}")
+        raise processing_error(e)
     except Exception as e:
         logger.error(f"Error analyzing compression: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/compression/dictionary/train")
+async def train_compression_dictionary(
+    sample_limit: int = Query(default=1000, ge=10, le=100000, description="Recent messages to sample"),
+    dict_size: int = Query(default=112 * 1024, ge=1024, le=1024 * 1024, description="Dictionary size in bytes")
+):
+    """Train a zstd dictionary from stored messages and use it for new writes"""
+    try:
+        if not redis_manager:
+            raise HTTPException(status_code=503, detail="Redis not available")
+        
+        result = await redis_manager.train_compression_dictionary(sample_limit=sample_limit, dict_size=dict_size)
+        return {"status": "trained", **result, "timestamp": datetime.now().isoformat()}
+        
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error training compression dictionary: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/migrate")
 async def trigger_migration(
     confirm: str = Query(..., description="Must be 'CONFIRM_MIGRATION'"),
@@ -357,12 +802,8 @@ async def trigger_migration(
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
         
-        # Run migration in background
-        background_tasks.add_task(
-            migrate_existing_messages, 
-            redis_manager.redis_client, 
-            redis_manager.processor
-        )
+        # Run migration in background (sync client, executed in the threadpool)
+        background_tasks.add_task(run_migration)
         
         return {
             "status": "migration_started",
@@ -387,7 +828,7 @@ async def clear_data(confirm: str):
         if not redis_manager:
             raise HTTPException(status_code=503, detail="Redis not available")
             
-        redis_manager.redis_client.flushdb()
+        await redis_manager.redis_client.flushdb()
         logger.warning("All conversation data cleared")
         return {"status": "cleared", "timestamp": datetime.now().isoformat()}
         
@@ -395,32 +836,6 @@ async def clear_data(confirm: str):
         logger.error(f"Error clearing data: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-# Enhanced background tasks
-def update_analytics_enhanced(message_id: str, content: str):
-    """Enhanced analytics update in background"""
-    try:
-        if not redis_manager:
-            return
-            
-        # Enhanced analytics update
-        redis_manager.redis_client.incr("analytics:total_messages")
-        redis_manager.redis_client.incr(f"analytics:daily:{datetime.now().date()}")
-        
-        # Word count analytics
-        word_count = len(content.split())
-        redis_manager.redis_client.lpush("analytics:word_counts", word_count)
-        redis_manager.redis_client.ltrim("analytics:word_counts", 0, 999)
-        
-        # Content length analytics
-        content_length = len(content)
-        redis_manager.redis_client.lpush("analytics:content_lengths", content_length)
-        redis_manager.redis_client.ltrim("analytics:content_lengths", 0, 999)
-        
-        logger.info(f"Enhanced analytics updated for message {message_id}")
-        
-    except Exception as e:
-        logger.error(f"Error updating enhanced analytics: {e}")
-
 # Exception handlers
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+CPUバウンドなテキスト処理のプロセスプール・オフロード
+- 要約・キーポイント・技術用語抽出（SmartTextProcessor.analyze）をイベントループ外で実行
+- しきい値未満の小さいテキストはプールに送らずワーカースレッドで実行（プロセス間転送の方が高コストなため。イベントループでは実行しない）
+- 同時投入数の上限・キュー待ちタイムアウト・タスクごとのタイムアウトで過負荷を抑制
+  （タイムアウトしてもワーカープロセスがタスクを終えるまで枠は解放しない）
+- ワーカープロセスが落ちた場合はプールを作り直し、呼び出し側には例外を返す（同じプールの失敗で作り直すのは1回だけ）
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from conversation_redis_manager import SmartTextProcessor
+from vocabulary import get_vocabulary, install_vocabulary
+
+logger = logging.getLogger(__name__)
+
+class ProcessingQueueFull(Exception):
+    """No pool slot became free within queue_timeout"""
+
+class ProcessingTimeout(Exception):
+    """A pooled task did not finish within task_timeout"""
+
+class TextProcessingService:
+    """
+    Runs SmartTextProcessor.analyze on a ProcessPoolExecutor
+
+    workers=0 disables the pool and everything runs inline (useful for tests and tiny
+    deployments); inline work runs in a worker thread, never on the event loop. max_pending bounds the tasks queued or running in the pool; callers
+    wait up to queue_timeout for a slot and then get ProcessingQueueFull.
+    """
+
+    def __init__(self, workers: Optional[int] = None, inline_threshold: int = 16 * 1024,
+                 max_pending: Optional[int] = None, task_timeout: float = 30.0,
+                 queue_timeout: float = 5.0, start_method: str = "spawn"):
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self.inline_threshold = inline_threshold
+        self.max_pending = max_pending or max(self.workers * 4, 1)
+        self.task_timeout = task_timeout
+        self.queue_timeout = queue_timeout
+        self.start_method = start_method
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = asyncio.Semaphore(self.max_pending)
+        self._pending = 0
+        self.counters = {"inline": 0, "pooled": 0, "timeouts": 0, "rejected": 0, "pool_restarts": 0}
+
+    @classmethod
+    def from_env(cls) -> "TextProcessingService":
+        """Build from PROCESSING_WORKERS / PROCESSING_INLINE_THRESHOLD / PROCESSING_MAX_PENDING /
+        PROCESSING_TASK_TIMEOUT / PROCESSING_QUEUE_TIMEOUT / PROCESSING_START_METHOD"""
+        workers = os.getenv('PROCESSING_WORKERS')
+        max_pending = os.getenv('PROCESSING_MAX_PENDING')
+        return cls(
+            workers=int(workers) if workers is not None else None,
+            inline_threshold=int(os.getenv('PROCESSING_INLINE_THRESHOLD', 16 * 1024)),
+            max_pending=int(max_pending) if max_pending else None,
+            task_timeout=float(os.getenv('PROCESSING_TASK_TIMEOUT', 30.0)),
+            queue_timeout=float(os.getenv('PROCESSING_QUEUE_TIMEOUT', 5.0)),
+            start_method=os.getenv('PROCESSING_START_METHOD', 'spawn')
+        )
+
+    def start(self) -> None:
+        """Start the pool; workers get the vocabulary installed in this process"""
+        if self.workers > 0 and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context(self.start_method),
+                initializer=install_vocabulary,
+                initargs=(get_vocabulary().spec(),)
+            )
+            logger.info(f"Text processing pool started with {self.workers} workers")
+
+    def stop(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            logger.info("Text processing pool stopped")
+
+    def _restart_pool(self, broken: ProcessPoolExecutor) -> None:
+        """Replace the pool that broke; a no-op if another task already replaced it"""
+        if self._executor is not broken:
+            return
+        self.counters["pool_restarts"] += 1
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+        self.start()
+
+    def _release_slot(self, _future: Optional[asyncio.Future] = None) -> None:
+        self._pending -= 1
+        self._slots.release()
+
+    def offloads(self, text: str) -> bool:
+        """Whether analyze(text) runs in the pool rather than inline"""
+        return self._executor is not None and len(text) >= self.inline_threshold
+
+    async def _analyze_inline(self, text: str) -> Dict[str, Any]:
+        self.counters["inline"] += 1
+        return await asyncio.to_thread(SmartTextProcessor.analyze, text)
+
+    async def analyze(self, text: str) -> Dict[str, Any]:
+        """Summaries, key points and technical terms for text"""
+        if not self.offloads(text):
+            return await self._analyze_inline(text)
+
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.counters["rejected"] += 1
+            raise ProcessingQueueFull(f"Text processing queue is full ({self.max_pending} pending)")
+
+        executor = self._executor
+        self._pending += 1
+        if executor is None:  # stopped while waiting for the slot
+            self._release_slot()
+            return await self._analyze_inline(text)
+        try:
+            future = asyncio.get_running_loop().run_in_executor(executor, SmartTextProcessor.analyze, text)
+        except BrokenProcessPool:
+            self._release_slot()
+            logger.error("Text processing pool broke; restarting it")
+            self._restart_pool(executor)
+            raise
+        except BaseException:
+            self._release_slot()
+            raise
+        # The slot is held until the worker process is done with the task, even after a timeout
+        future.add_done_callback(self._release_slot)
+        self.counters["pooled"] += 1
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.task_timeout)
+        except asyncio.TimeoutError:
+            self.counters["timeouts"] += 1
+            raise ProcessingTimeout(f"Text processing exceeded {self.task_timeout}s ({len(text)} chars)")
+        except BrokenProcessPool:
+            logger.error("Text processing pool broke; restarting it")
+            self._restart_pool(executor)
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers if self._executor is not None else 0,
+            "inline_threshold": self.inline_threshold,
+            "max_pending": self.max_pending,
+            "pending": self._pending,
+            **self.counters
+        }
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Redis サーバーサイド Lua スクリプト
+- メッセージ保存（セッション解決・ハッシュ/本文・全インデックス・セッション別インデックス・分析カウンタ・頻度集計・エンリッチメントキュー）を
+  1回の EVALSHA で原子的に実行
+- 保存時にメッセージのベクトル行を vectors:matrix:{チャンク} に追記（類似検索、vector_index.py）
+- エンリッチメントの取得（pending のメッセージを1つのワーカープールが CAS で確保）
+- 全文検索・要約検索の BM25 スコア計算（ポスティングを Redis 外へ転送せず、上位 k 件だけ返す）
+- redis-py の register_script 経由で呼び出し（EVALSHA、未登録時のみ SCRIPT LOAD して再実行）
+- 制約: 単一ノード（またはレプリカ構成）の Redis 専用。保存スクリプトは KEYS[1] 以外に、プランに含まれるキーと
+  スクリプト内で組み立てるキー（既定セッションの session:{id}:* など）にも書き込むため、Redis Cluster では
+  CROSSSLOT となり動かない。Cluster 対応には全キーを KEYS で渡し、ハッシュタグで同じスロットに揃える必要がある
+"""
+
+# Frequency aggregates plan (built by _ConversationStoreBase._frequency_plan):
+#   marker_key, today   the rolling sets are only incremented while marker_key == today;
+#                       otherwise the next reader rebuilds them from the day buckets
+#   buckets  [{all, key ("" = outside the bucket range), rolling ("" = not in today's window),
+#              expire_at, members = [member, increment, ...]}]
+_FREQUENCY_FUNCTIONS = """
+local function apply_frequencies(freq)
+    local rolling_current = redis.call('GET', freq.marker_key) == freq.today
+    for _, bucket in ipairs(freq.buckets) do
+        for j = 1, #bucket.members, 2 do
+            local member, increment = bucket.members[j], bucket.members[j + 1]
+            redis.call('ZINCRBY', bucket.all, increment, member)
+            if bucket.key ~= '' then
+                redis.call('ZINCRBY', bucket.key, increment, member)
+            end
+            if bucket.rolling ~= '' and rolling_current then
+                redis.call('ZINCRBY', bucket.rolling, increment, member)
+            end
+        end
+        if bucket.key ~= '' then
+            redis.call('EXPIREAT', bucket.key, bucket.expire_at)
+        end
+    end
+end
+"""
+
+# KEYS[1]  session:{date} key holding today's default session id
+#          Only this key is declared: every other key written comes from the plan below or, for the
+#          default session's indexes, is derived inside the script from the session id it resolves.
+#          Fine on a single node; not Cluster-safe (see the module docstring).
+# ARGV[1]  JSON plan built by _ConversationStoreBase._message_save_plan:
+#   new_session_id, session_ttl      used only if KEYS[1] does not exist yet
+#   messages     [{id, fields = [field, value, ...], session_id ("" = default session), score, content_chars,
+#                  terms = [term, frequency, ...], length (full-text index, see fulltext.py),
+#                  summary_terms, summary_length (summary index; absent while enrichment is pending)}]
+#   postings     {tag key: [score, message id, ...]} topic/keyword/tech/role postings (sorted sets
+#                scored like messages:timeline; session indexes are added here per message)
+#   postings_cap keep only the newest N members of each posting (0 = unbounded)
+#   session_activity_key  sessions sorted set scored by last activity
+#   fulltext, summaries  {term_prefix, lengths_key, stats_key} (fulltext.TextIndex)
+#   vectors      {matrix_key, ids_key, chunk_rows} each message's id is RPUSHed onto ids_key and its
+#                vector row APPENDed to the chunk {matrix_key}:{row // chunk_rows}, row being its list
+#                position (see vector_index.py)
+#   counters     [[key, increment], ...]
+#   hash_counters [[key, field, increment], ...]
+#   lists        [[key, [values], max_length], ...]   LPUSH then LTRIM
+#   queue        [message ids] to LPUSH onto the enrichment queue
+#   queue_key
+#   generation_key  hash whose generation field is bumped once per call (invalidates cached context)
+#   search_generations_key  hash of per-index-key generations (search_cache.py): each posting key
+#                and the fulltext/summaries stats keys of the indexes written are bumped once per call
+#   frequency    topic/keyword/technical term increments (see above)
+# ARGV[2..]  message bodies (raw compressed bytes), in message order, then their vector rows
+#            (VECTOR_DIM int8 bytes each) in the same order
+#
+# Returns the default session id used (or "" if every message had its own).
+SAVE_MESSAGES_SCRIPT = _FREQUENCY_FUNCTIONS + """
+local plan = cjson.decode(ARGV[1])
+
+local default_session = ''
+local function resolve_default_session()
+    if default_session == '' then
+        -- SET NX makes concurrent first writers of the day agree on one session
+        if redis.call('SET', KEYS[1], plan.new_session_id, 'NX', 'EX', plan.session_ttl) then
+            default_session = plan.new_session_id
+        else
+            default_session = redis.call('GET', KEYS[1])
+        end
+    end
+    return default_session
+end
+
+-- session:{id}:timeline, the session's counters and its place in the activity index
+local function record_in_session(session_id, message, stored_bytes)
+    local session_key = 'session:' .. session_id
+    redis.call('ZADD', session_key .. ':timeline', message.score, message.id)
+    local stats_key = session_key .. ':stats'
+    redis.call('HINCRBY', stats_key, 'messages', 1)
+    redis.call('HINCRBY', stats_key, 'content_chars', message.content_chars)
+    redis.call('HINCRBY', stats_key, 'stored_bytes', stored_bytes)
+    local score = tonumber(message.score)
+    local first = redis.call('HGET', stats_key, 'first_activity')
+    if not first or score < tonumber(first) then
+        redis.call('HSET', stats_key, 'first_activity', message.score)
+    end
+    local last = redis.call('HGET', stats_key, 'last_activity')
+    if not last or score > tonumber(last) then
+        redis.call('HSET', stats_key, 'last_activity', message.score)
+        redis.call('ZADD', plan.session_activity_key, message.score, session_id)
+    end
+end
+
+-- postings scored by term frequency, the document length and the corpus totals
+local function index_text(index, message_id, terms, length)
+    for j = 1, #terms, 2 do
+        redis.call('ZADD', index.term_prefix .. terms[j], terms[j + 1], message_id)
+    end
+    redis.call('HSET', index.lengths_key, message_id, length)
+    redis.call('HINCRBY', index.stats_key, 'docs', 1)
+    redis.call('HINCRBY', index.stats_key, 'total_length', length)
+end
+
+local summaries_indexed = false
+for i, message in ipairs(plan.messages) do
+    local session_id = message.session_id
+    if session_id == '' then
+        session_id = resolve_default_session()
+    end
+    local key = 'message:' .. message.id
+    redis.call('HSET', key, 'session_id', session_id, unpack(message.fields))
+    redis.call('SET', key .. ':body', ARGV[i + 1])
+    redis.call('ZADD', 'messages:timeline', message.score, message.id)
+    record_in_session(session_id, message, #ARGV[i + 1])
+    index_text(plan.fulltext, message.id, message.terms, message.length)
+    if message.summary_terms then
+        index_text(plan.summaries, message.id, message.summary_terms, message.summary_length)
+        summaries_indexed = true
+    end
+    local row = redis.call('RPUSH', plan.vectors.ids_key, message.id) - 1
+    redis.call('APPEND', plan.vectors.matrix_key .. ':' .. math.floor(row / plan.vectors.chunk_rows),
+               ARGV[1 + #plan.messages + i])
+end
+
+for key, members in pairs(plan.postings) do
+    redis.call('ZADD', key, unpack(members))
+    if plan.postings_cap > 0 then
+        redis.call('ZREMRANGEBYRANK', key, 0, -plan.postings_cap - 1)
+    end
+    redis.call('HINCRBY', plan.search_generations_key, key, 1)
+end
+redis.call('HINCRBY', plan.search_generations_key, plan.fulltext.stats_key, 1)
+if summaries_indexed then
+    redis.call('HINCRBY', plan.search_generations_key, plan.summaries.stats_key, 1)
+end
+for _, counter in ipairs(plan.counters) do
+    redis.call('INCRBY', counter[1], counter[2])
+end
+for _, counter in ipairs(plan.hash_counters) do
+    redis.call('HINCRBY', counter[1], counter[2], counter[3])
+end
+for _, list in ipairs(plan.lists) do
+    if #list[2] > 0 then
+        redis.call('LPUSH', list[1], unpack(list[2]))
+        redis.call('LTRIM', list[1], 0, list[3] - 1)
+    end
+end
+if #plan.queue > 0 then
+    redis.call('LPUSH', plan.queue_key, unpack(plan.queue))
+end
+apply_frequencies(plan.frequency)
+redis.call('HINCRBY', plan.generation_key, 'generation', 1)
+
+return default_session
+"""
+
+# ARGV[1]  JSON frequency plan; used by enrichment (technical terms known only after it)
+INCREMENT_FREQUENCIES_SCRIPT = _FREQUENCY_FUNCTIONS + """
+apply_frequencies(cjson.decode(ARGV[1]))
+return 1
+"""
+
+# KEYS[1]  message:{id}, KEYS[2] heartbeat key of the claim holder read by the caller
+# ARGV[1]  claiming pool id, ARGV[2] claim holder read by the caller ("" = unclaimed)
+#
+# Compare-and-set of the message's enrichment_claim: succeeds (1) only if the message is
+# still pending, the holder is unchanged and is either absent, the caller or a pool whose
+# heartbeat has expired; otherwise 0.
+CLAIM_ENRICHMENT_SCRIPT = """
+if redis.call('HGET', KEYS[1], 'enrichment_status') ~= 'pending' then
+    return 0
+end
+local holder = redis.call('HGET', KEYS[1], 'enrichment_claim') or ''
+if holder ~= ARGV[2] then
+    return 0
+end
+if holder ~= '' and holder ~= ARGV[1] and redis.call('EXISTS', KEYS[2]) == 1 then
+    return 0
+end
+redis.call('HSET', KEYS[1], 'enrichment_claim', ARGV[1])
+return 1
+"""
+
+# KEYS[1..n]  postings ({term_prefix}{term}) of the distinct query terms, in one TextIndex
+# KEYS[n+1]   document lengths hash, KEYS[n+2] corpus stats hash (docs, total_length)
+# ARGV[1]     limit, ARGV[2] k1, ARGV[3] b
+# ARGV[4]     max_df: fraction of the documents above which a term counts as common
+# ARGV[5]     scan_limit: postings read per term, highest term frequency first (0 = all)
+#
+# A term in more than max(max_df * docs, scan_limit) documents is skipped when the query has
+# a less common term (its IDF is near zero and scanning it dominates the cost); otherwise
+# only its scan_limit highest-frequency postings are scored. Document lengths are read with
+# one HMGET per LENGTH_BATCH new ids.
+#
+# Returns {matching documents among the postings scanned, id, score, id, score, ...}, best
+# first (ties by id); scores are strings since Lua numbers would be truncated to integers.
+FULLTEXT_SEARCH_SCRIPT = """
+local term_count = #KEYS - 2
+local lengths_key, stats_key = KEYS[term_count + 1], KEYS[term_count + 2]
+local limit, k1, b = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local docs = tonumber(redis.call('HGET', stats_key, 'docs') or '0')
+if docs == 0 then
+    return {0}
+end
+local average_length = tonumber(redis.call('HGET', stats_key, 'total_length') or '0') / docs
+if average_length == 0 then
+    average_length = 1
+end
+
+local max_df, scan_limit = tonumber(ARGV[4]), tonumber(ARGV[5])
+local common = math.max(max_df * docs, scan_limit)
+local dfs, selective = {}, false
+for i = 1, term_count do
+    dfs[i] = redis.call('ZCARD', KEYS[i])
+    if dfs[i] > 0 and dfs[i] <= common then
+        selective = true
+    end
+end
+
+local LENGTH_BATCH = 1000
+local scores, found, lengths = {}, {}, {}
+for i = 1, term_count do
+    local df = dfs[i]
+    if df > 0 and (df <= common or not selective) then
+        local idf = math.log(1 + (docs - df + 0.5) / (df + 0.5))
+        local postings = redis.call('ZREVRANGE', KEYS[i], 0, scan_limit - 1, 'WITHSCORES')
+        local new = {}
+        for j = 1, #postings, 2 do
+            local id = postings[j]
+            if scores[id] == nil then
+                scores[id] = 0
+                found[#found + 1] = id
+                new[#new + 1] = id
+            end
+        end
+        for start = 1, #new, LENGTH_BATCH do
+            local batch = {unpack(new, start, math.min(start + LENGTH_BATCH - 1, #new))}
+            local values = redis.call('HMGET', lengths_key, unpack(batch))
+            for j, id in ipairs(batch) do
+                lengths[id] = tonumber(values[j] or average_length)
+            end
+        end
+        for j = 1, #postings, 2 do
+            local id, tf = postings[j], tonumber(postings[j + 1])
+            local norm = k1 * (1 - b + b * lengths[id] / average_length)
+            scores[id] = scores[id] + idf * tf * (k1 + 1) / (tf + norm)
+        end
+    end
+end
+
+table.sort(found, function(x, y)
+    if scores[x] ~= scores[y] then
+        return scores[x] > scores[y]
+    end
+    return x < y
+end)
+local reply = {#found}
+for i = 1, math.min(limit, #found) do
+    reply[#reply + 1] = found[i]
+    reply[#reply + 1] = tostring(scores[found[i]])
+end
+return reply
+"""
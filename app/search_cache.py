@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+検索結果（上位 ID リスト）のキャッシュ
+- キーは正規化したクエリ（スコープ + 語の小文字化・重複除去・並べ替え、ブール式は AND / OR の被演算子を整列）
+- 各エントリは参照したインデックスキーの世代（search:generations ハッシュ、フィールド = ポスティングキー）を記録し、
+  参照時に HMGET 1回で現在の世代と比べる。タグのポスティングが変わったエントリだけが無効になる
+- 全文検索・要約検索は文書数と平均文書長にも依存するため、インデックス全体の世代（fts:stats / sum:stats）を使う
+- 同じハッシュの epoch フィールド（最初の読み出し側が HSETNX で置くランダム値）も世代の先頭に含める。FLUSHDB・再起動・
+  追い出しでハッシュが消えると epoch が変わるため、世代が 0 から数え直して同じ値に戻っても古いエントリとは一致しない（ABA 防止）
+- 保存できるのは ID リスト・一致件数・スコアのみ（本文やメッセージのハッシュは毎回読む）
+- より大きい limit で保存した結果は小さい limit の検索にも使う（並び順が決定的なので先頭 k 件が同じ）
+- memory: プロセス内 LRU（エントリ数と保持する ID の総数で上限） / off: 無効
+"""
+
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+SEARCH_CACHE_MODES = ("memory", "off")
+# Hash: posting key (topic:/keyword:/tech:/role:) or text index stats key -> generation,
+# plus SEARCH_EPOCH_FIELD: a random nonce that is reset with the hash
+SEARCH_GENERATIONS_KEY = "search:generations"
+SEARCH_EPOCH_FIELD = "epoch"
+
+SearchHits = Tuple[int, List[str], Dict[str, float]]
+
+class SearchCache:
+    """
+    Search candidates (matches, ids, scores) keyed by normalized query and tagged with index generations
+
+    Every write to a posting increments its generation in Redis, in the save
+    script as well as in enrichment, migration and backfills, so an entry is
+    reused only while none of the keys it was computed from have changed.
+    The generations passed in start with the hash's epoch, and the manager
+    stores nothing until an epoch exists.
+    """
+
+    def __init__(self, mode: str = "memory", max_entries: int = 256, max_ids: int = 50000):
+        if mode not in SEARCH_CACHE_MODES:
+            raise ValueError(f"Unknown search cache mode: {mode} (expected one of {SEARCH_CACHE_MODES})")
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_ids = max_ids
+        # key -> (generations, limit, matches, ids, scores)
+        self._entries: "OrderedDict[str, Tuple[Tuple[Any, ...], int, int, List[str], Dict[str, float]]]" = OrderedDict()
+        self._cached_ids = 0
+        self.counters = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "SearchCache":
+        """Build from SEARCH_CACHE_MODE / SEARCH_CACHE_MAX_ENTRIES / SEARCH_CACHE_MAX_IDS"""
+        return cls(
+            mode=os.getenv('SEARCH_CACHE_MODE', 'memory'),
+            max_entries=int(os.getenv('SEARCH_CACHE_MAX_ENTRIES', 256)),
+            max_ids=int(os.getenv('SEARCH_CACHE_MAX_IDS', 50000))
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def lookup(self, key: str, generations: Sequence[Any], limit: int) -> Optional[SearchHits]:
+        """Cached candidates for key if its index generations are unchanged and it covers limit"""
+        entry = self._entries.get(key)
+        result = None
+        if entry is not None:
+            cached_generations, cached_limit, matches, ids, scores = entry
+            if cached_generations != tuple(generations):
+                self._discard(key)
+                self.counters["stale"] += 1
+            elif limit <= cached_limit or len(ids) < cached_limit:
+                self._entries.move_to_end(key)
+                ids = ids[:limit]
+                result = (matches, ids, {msg_id: scores[msg_id] for msg_id in ids if msg_id in scores})
+
+        self.counters["hits" if result is not None else "misses"] += 1
+        return result
+
+    def store(self, key: str, generations: Sequence[Any], limit: int, hits: SearchHits) -> None:
+        """Remember the candidates computed at these generations, evicting least recently used entries"""
+        matches, ids, scores = hits
+        if len(ids) > self.max_ids:
+            return
+        self.counters["stores"] += 1
+        self._discard(key)
+        self._entries[key] = (tuple(generations), limit, matches, list(ids), dict(scores))
+        self._cached_ids += len(ids)
+        while len(self._entries) > self.max_entries or self._cached_ids > self.max_ids:
+            self._discard(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    def _discard(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._cached_ids -= len(entry[3])
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            "mode": self.mode,
+            "entries": len(self._entries),
+            "cached_ids": self._cached_ids,
+            "hit_rate": round(self.counters["hits"] / lookups, 3) if lookups else None,
+            **self.counters
+        }
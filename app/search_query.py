@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+検索クエリ言語（AND / OR / NOT）と Redis 集合演算へのコンパイル
+- 構文: `redis AND (docker OR kubernetes) NOT legacy`、演算子は大文字のみ、括弧でグループ化、
+  空白を含むタグは "machine learning" のように引用符で囲む。演算子なしで並べた語は AND
+- NOT は AND の中で正の項から差し引く（ZDIFFSTORE）。全体の否定や OR 内の NOT は不可
+- 各語はスコープのタグポスティング（topic:/keyword:/tech:、スコア = メッセージの時刻）の和集合。
+  コンパイル結果は一時キー上の ZUNIONSTORE / ZINTERSTORE（AGGREGATE MAX で時刻スコアを保つ）/
+  ZDIFFSTORE の列で、呼び出し側が同じ MULTI 内で ZREVRANGE して新しい順の上位 k 件だけを取り出す
+  （ポスティングの中身は Python に転送しない）
+"""
+
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple, Union
+
+OPERATORS = ("AND", "OR", "NOT")
+
+class QuerySyntaxError(ValueError):
+    """Malformed query string (surfaces as HTTP 400)"""
+
+@dataclass
+class Term:
+    value: str
+
+@dataclass
+class Not:
+    child: "Node"
+
+@dataclass
+class And:
+    children: List["Node"]
+
+@dataclass
+class Or:
+    children: List["Node"]
+
+Node = Union[Term, Not, And, Or]
+
+# Parentheses, "quoted phrases" or bare words
+_TOKEN_RE = re.compile(r'\s*(?:(\()|(\))|"([^"]*)"|([^\s()"]+))')
+
+def _lex(text: str) -> List[Tuple[str, str]]:
+    """(kind, value) tokens: kind is '(', ')', 'op' or 'term'"""
+    tokens = []
+    position = 0
+    text = text.strip()
+    while position < len(text):
+        match = _TOKEN_RE.match(text, position)
+        if not match or match.end() == position:
+            raise QuerySyntaxError(f"Unterminated quote at position {position}: {text}")
+        opening, closing, quoted, word = match.groups()
+        if opening:
+            tokens.append(('(', opening))
+        elif closing:
+            tokens.append((')', closing))
+        elif quoted is not None:
+            if quoted.strip():
+                tokens.append(('term', quoted.strip()))
+        elif word in OPERATORS:
+            tokens.append(('op', word))
+        else:
+            tokens.append(('term', word))
+        position = match.end()
+    return tokens
+
+class _Parser:
+    """
+    Recursive descent over the grammar
+
+        or   := and ("OR" and)*
+        and  := not (["AND"] not)*
+        not  := "NOT" not | atom
+        atom := "(" or ")" | term
+    """
+
+    def __init__(self, tokens: List[Tuple[str, str]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ('end', '')
+
+    def _next(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def parse(self) -> Node:
+        node = self._or()
+        if self._peek()[0] != 'end':
+            raise QuerySyntaxError(f"Unexpected {self._peek()[1]!r}")
+        return node
+
+    def _or(self) -> Node:
+        children = [self._and()]
+        while self._peek() == ('op', 'OR'):
+            self._next()
+            children.append(self._and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _and(self) -> Node:
+        children = [self._not()]
+        while True:
+            kind, value = self._peek()
+            if (kind, value) == ('op', 'AND'):
+                self._next()
+            elif not (kind in ('term', '(') or (kind, value) == ('op', 'NOT')):
+                break
+            children.append(self._not())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _not(self) -> Node:
+        if self._peek() == ('op', 'NOT'):
+            self._next()
+            return Not(self._not())
+        return self._atom()
+
+    def _atom(self) -> Node:
+        kind, value = self._next()
+        if kind == '(':
+            node = self._or()
+            if self._next()[0] != ')':
+                raise QuerySyntaxError("Missing closing parenthesis")
+            return node
+        if kind == 'term':
+            return Term(value)
+        raise QuerySyntaxError(f"Expected a term, got {value or 'end of query'!r}")
+
+def _check_negations(node: Node, narrowing: bool = False) -> None:
+    """NOT only narrows an AND that also has a positive operand"""
+    if isinstance(node, Not):
+        if not narrowing:
+            raise QuerySyntaxError("NOT can only narrow an AND (e.g. 'redis NOT legacy')")
+        _check_negations(node.child)
+    elif isinstance(node, And):
+        if all(isinstance(child, Not) for child in node.children):
+            raise QuerySyntaxError("NOT needs a term to subtract from (e.g. 'redis NOT legacy')")
+        for child in node.children:
+            _check_negations(child, narrowing=True)
+    elif isinstance(node, Or):
+        for child in node.children:
+            _check_negations(child)
+
+def parse_query(text: str) -> Node:
+    """Parse and check a query string; raises QuerySyntaxError"""
+    tokens = _lex(text)
+    if not tokens:
+        raise QuerySyntaxError("Empty query")
+    node = _Parser(tokens).parse()
+    _check_negations(node)
+    return node
+
+def canonical_query(node: Node) -> str:
+    """Normalized query text (cache key): terms lowercased and quoted, AND / OR operands deduplicated and sorted"""
+    if isinstance(node, Term):
+        return json.dumps(node.value.lower(), ensure_ascii=False)
+    if isinstance(node, Not):
+        return f"NOT {canonical_query(node.child)}"
+    operator = " AND " if isinstance(node, And) else " OR "
+    operands = sorted(set(canonical_query(child) for child in node.children))
+    return operands[0] if len(operands) == 1 else f"({operator.join(operands)})"
+
+def terms_query(terms: List[str]) -> Node:
+    """The query_terms list form: any of the terms"""
+    return Or([Term(term) for term in terms])
+
+# Scores are message timestamps: MAX keeps them through unions and intersections
+_KEEP_SCORE = {'aggregate': 'MAX'}
+
+@dataclass
+class QueryPlan:
+    """Sorted-set commands (redis-py method, destination, source keys, options) leaving the matches in result_key"""
+    steps: List[Tuple[str, str, List[str], Dict[str, str]]] = field(default_factory=list)
+    result_key: str = ""
+    temporary_keys: List[str] = field(default_factory=list)
+
+def compile_query(node: Node, leaf_keys: Callable[[str], List[str]], scratch_prefix: str) -> QueryPlan:
+    """
+    Compile a parsed query into set algebra on temporary keys named scratch_prefix:{n}
+
+    leaf_keys maps a term to the postings it matches in the search scope. Unions
+    are flattened so a term or an OR of terms costs at most one ZUNIONSTORE, and
+    NOT operands are passed to ZDIFFSTORE without materializing them first.
+    Returns a plan with an empty result_key when nothing can match.
+    """
+    plan = QueryPlan()
+
+    def temporary() -> str:
+        key = f"{scratch_prefix}:{len(plan.temporary_keys)}"
+        plan.temporary_keys.append(key)
+        return key
+
+    def union_sources(node: Node) -> List[str]:
+        """Keys whose union is node (an OR flattens into its children's keys)"""
+        if isinstance(node, Term):
+            return leaf_keys(node.value)
+        if isinstance(node, Or):
+            return [key for child in node.children for key in union_sources(child)]
+        return [materialize(node)]
+
+    def materialize(node: Node) -> str:
+        if isinstance(node, Not):
+            raise QuerySyntaxError("NOT can only narrow an AND (e.g. 'redis NOT legacy')")
+        if isinstance(node, And):
+            positives = [child for child in node.children if not isinstance(child, Not)]
+            negatives = [key for child in node.children if isinstance(child, Not)
+                         for key in union_sources(child.child)]
+            sources = [materialize(child) for child in positives]
+            destination = temporary()
+            if len(sources) == 1:
+                base = sources[0]
+            else:
+                plan.steps.append(('zinterstore', destination, sources, _KEEP_SCORE))
+                base = destination
+            if negatives:
+                plan.steps.append(('zdiffstore', destination, [base] + negatives, {}))
+                base = destination
+            return base
+        keys = list(dict.fromkeys(union_sources(node)))
+        if not keys:
+            return temporary()  # never written: an empty set
+        if len(keys) == 1:
+            return keys[0]
+        destination = temporary()
+        plan.steps.append(('zunionstore', destination, keys, _KEEP_SCORE))
+        return destination
+
+    if not any(leaf_keys(term) for term in query_term_values(node)):
+        return plan
+    plan.result_key = materialize(node)
+    return plan
+
+def query_term_values(node: Node) -> List[str]:
+    """Every term in a query, in order"""
+    if isinstance(node, Term):
+        return [node.value]
+    if isinstance(node, Not):
+        return query_term_values(node.child)
+    return [value for child in node.children for value in query_term_values(child)]
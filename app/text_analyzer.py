@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+単一パスのテキスト解析器（SmartTextProcessor の共通基盤）
+- 事前コンパイルした1本の構造用正規表現で本文を1回だけ走査
+- 文の区切り位置・箇条書き/番号付き項目・ファイル名・CamelCase/略語を同時に収集
+- 技術用語・重要キーワードは語彙辞書の Aho-Corasick オートマトン（vocabulary.py）で照合
+- 要約・キーポイント・技術用語抽出の各メソッドはこの結果を共有（再走査・再コンパイルなし）
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from vocabulary import Vocabulary, get_vocabulary
+
+# Sentence delimiters used by the individual extractors
+SHORT_SUMMARY_DELIMITERS = ".。!！?？\n"
+MEDIUM_SUMMARY_DELIMITERS = ".。!！?？"
+KEY_POINT_DELIMITERS = ".。!！"
+# A list item runs until the first of these
+ITEM_DELIMITERS = ".。\n"
+
+FILE_EXTENSIONS = ("js", "py", "java", "go", "rs", "cpp", "hpp", "ts", "jsx", "tsx")
+
+
+def _alternation(words: Iterable[str]) -> str:
+    # Longest first so that e.g. "jsx" wins over "js"
+    return "|".join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+
+
+# Structural scan: list markers, delimiters, file names and words with two or more capitals
+# (CamelCase, ACRONYMS). Named technologies and Japanese terms come from the vocabulary
+# automaton instead, so growing the vocabulary never grows this pattern. Word boundaries
+# are ASCII-only: \b would treat adjacent kana as word characters ("はFastAPIを").
+_SCAN_RE = re.compile(
+    rf"""
+    (?P<item>^[ \t]*(?:(?P<number>[0-9]+)\.|[•\-\*])[ \t]*)             # list marker at line start
+  | (?<![A-Za-z0-9_])(?:
+        (?P<file>[A-Za-z0-9_\-]+\.(?:{_alternation(FILE_EXTENSIONS)}))    # main.py
+      | (?P<word>[A-Z][a-z0-9]*[A-Z][A-Za-z0-9_]*)                        # FastAPI, HTTP, MAX_SIZE
+    )(?![A-Za-z0-9_])
+  | (?P<delim>[.。!！?？\n])
+    """,
+    re.MULTILINE | re.VERBOSE
+)
+
+
+@lru_cache(maxsize=8)
+def _delimiter_re(delimiters: str) -> "re.Pattern":
+    return re.compile(f"[{re.escape(delimiters)}]")
+
+
+def split_sentences(text: str, delimiters: str) -> List[str]:
+    """Stripped sentences without a full analysis (for callers needing a single extractor)"""
+    return [sentence.strip() for sentence in _delimiter_re(delimiters).split(text)]
+
+
+def _has_word(item: str) -> bool:
+    # Skips horizontal rules ("---") and emphasis-only lines ("***")
+    return any(char.isalnum() for char in item)
+
+
+@dataclass
+class TextAnalysis:
+    """Everything the extractors need from one scan of a text"""
+    text: str
+    delimiters: List[Tuple[int, str]] = field(default_factory=list)   # (position, delimiter)
+    numbered_items: List[str] = field(default_factory=list)
+    bullet_items: List[str] = field(default_factory=list)
+    term_hits: List[Tuple[int, str]] = field(default_factory=list)    # (position, canonical term)
+    keyword_hits: List[Tuple[int, str]] = field(default_factory=list) # (position, keyword)
+
+    def sentences(self, delimiters: str) -> List[Tuple[int, str]]:
+        """(start, stripped sentence) split at the given delimiter characters"""
+        spans = []
+        start = 0
+        for position, delimiter in self.delimiters:
+            if delimiter in delimiters:
+                spans.append((start, self.text[start:position].strip()))
+                start = position + 1
+        spans.append((start, self.text[start:].strip()))
+        return spans
+
+    def keyword_sentences(self, delimiters: str = KEY_POINT_DELIMITERS) -> List[str]:
+        """Sentences containing at least one important keyword, in text order"""
+        hits = iter(position for position, _ in self.keyword_hits)
+        next_hit = next(hits, None)
+        found = []
+        start = 0
+        ends = [position for position, delimiter in self.delimiters if delimiter in delimiters]
+        for end in ends + [len(self.text)]:
+            if next_hit is not None and next_hit < end:
+                found.append(self.text[start:end].strip())
+                while next_hit is not None and next_hit < end:
+                    next_hit = next(hits, None)
+            start = end + 1
+        return found
+
+    def technical_terms(self, limit: int = 12, offset: int = 0) -> List[str]:
+        """Distinct terms at or after offset, most frequent first (ties keep text order)"""
+        counts = Counter(term for position, term in self.term_hits if position >= offset)
+        return [term for term, _ in counts.most_common(limit)]
+
+    def keyword_counts(self) -> Dict[str, int]:
+        return dict(Counter(keyword for _, keyword in self.keyword_hits))
+
+
+def analyze_text(text: str, vocabulary: Optional[Vocabulary] = None) -> TextAnalysis:
+    """Scan text once and collect delimiters, list items, technical terms and keyword hits
+
+    vocabulary defaults to the installed one (see vocabulary.install_vocabulary).
+    """
+    analysis = TextAnalysis(text)
+    delimiters = analysis.delimiters
+    term_hits, analysis.keyword_hits = (vocabulary or get_vocabulary()).find(text)
+    known_positions = {position for position, _ in term_hits}
+    structural_terms = []
+    open_item = None       # (start, is_numbered) of the list item being read
+
+    for match in _SCAN_RE.finditer(text):
+        kind = match.lastgroup
+        position = match.start()
+
+        if kind == "delim":
+            delimiter = match.group()
+            delimiters.append((position, delimiter))
+            if open_item and delimiter in ITEM_DELIMITERS:
+                item_start, numbered = open_item
+                item = text[item_start:position].strip()
+                if _has_word(item):
+                    # Numbered items keep their closing full stop, as the old regex did
+                    if numbered and delimiter != "\n":
+                        item += delimiter
+                    (analysis.numbered_items if numbered else analysis.bullet_items).append(item)
+                open_item = None
+        elif kind == "item":
+            open_item = (match.end(), match.group("number") is not None)
+        elif position not in known_positions:  # file, word not already a vocabulary term
+            structural_terms.append((position, match.group()))
+
+    if open_item:
+        item_start, numbered = open_item
+        item = text[item_start:].strip()
+        if _has_word(item):
+            (analysis.numbered_items if numbered else analysis.bullet_items).append(item)
+
+    analysis.term_hits = sorted(term_hits + structural_terms) if structural_terms else term_hits
+    return analysis
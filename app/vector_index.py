@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+メッセージのローカルベクトル類似検索（外部の埋め込みサービス不要）
+- ベクトル: 全文検索と同じトークン（英数字の語・CJK バイグラム）と、4文字以上の語の文字3-gramを
+  符号付き特徴ハッシュで VECTOR_DIM 次元に射影し、サブリニア TF（1 + log tf）で重み付け・L2 正規化して int8 に量子化
+- 保存: 保存スクリプトが vectors:ids（List）に RPUSH し、その位置（行番号）の属するチャンク vectors:matrix:{行番号 // VECTOR_CHUNK_ROWS}
+  （String、1件 VECTOR_DIM バイト）に APPEND（同じスクリプト内なので並行保存でもずれない）。1キーは最大 16 MiB
+- メモリ: Redis 側は1件あたり VECTOR_DIM バイト + vectors:ids の要素、各プロセスも同じ行列を保持（100万件で約 256 MB）
+- 削除・追い出しされたメッセージの行は検索結果の読み出しで除かれ、行数と件数のずれ（VECTOR_STALE_RATIO 超）や
+  欠けたチャンクがあれば起動時に再構築する
+- 検索: 各プロセスが行列を NumPy 配列として保持し、末尾の増分だけを GETRANGE / LRANGE で同期。
+  VECTOR_BLOCK_ROWS 行ずつ float32 に展開して行列積（ブロック化）し、argpartition で上位 k 件を選ぶ
+- IVF（VECTOR_IVF_LISTS > 0）: 球面 k-means のセントロイドで行を分割し、問い合わせに近い nprobe 個のリストだけを走査する近似検索。
+  学習はプロセスごとに初回検索時（と行数が倍になった時）に、その時点の行のスナップショットでロックの外で行い、
+  終わったらロック内でセントロイドを差し替える（学習中も同期・検索は止まらない）
+- vectors:meta の epoch は再構築（backfill_vector_index）ごとに進み、各プロセスは epoch の変化で手元の行列を捨てて読み直す
+"""
+
+import math
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+VECTOR_DIM = 256
+# Bumped whenever the vectorizer changes: the backfill then rebuilds the matrix
+VECTOR_VERSION = 2
+# Prefix of the chunk keys {VECTOR_MATRIX_KEY}:{n}; the bare key held the whole matrix up to version 1
+VECTOR_MATRIX_KEY = "vectors:matrix"
+VECTOR_IDS_KEY = "vectors:ids"
+VECTOR_META_KEY = "vectors:meta"
+VECTOR_BACKFILL_KEY = f"vectors:backfilled:v{VECTOR_VERSION}"
+# Held (SET NX EX) by the one process rebuilding the matrix; refreshed after every chunk
+VECTOR_REBUILD_LOCK_KEY = "vectors:rebuild:lock"
+VECTOR_REBUILD_LOCK_TTL = 300
+
+# Weight of each character trigram relative to its word
+NGRAM_WEIGHT = 0.5
+# Rows expanded to float32 per matrix product (bounds the temporary memory to BLOCK_ROWS * DIM * 4 bytes)
+VECTOR_BLOCK_ROWS = 65536
+# Rows per matrix chunk key vectors:matrix:{n} (16 MiB strings, well below the 512 MB string limit);
+# also the rows per GETRANGE when a process catches up with the matrix
+VECTOR_CHUNK_ROWS = 65536
+# Row count drift from the timeline (rows of removed messages, lost rows) that triggers a rebuild
+VECTOR_STALE_RATIO = 0.1
+# k-means: sampled rows per list, iterations
+IVF_SAMPLE_PER_LIST = 32
+IVF_ITERATIONS = 8
+
+def _features(terms: Sequence) -> Tuple[np.ndarray, np.ndarray]:
+    """(hashed dimension, signed weight) per feature of index_terms() output [term, tf, ...]"""
+    dimensions = []
+    weights = []
+
+    def add(feature: str, weight: float) -> None:
+        h = zlib.crc32(feature.encode('utf-8'))
+        dimensions.append(h % VECTOR_DIM)
+        weights.append(weight if h & 0x80000000 else -weight)
+
+    for j in range(0, len(terms), 2):
+        term, weight = terms[j], 1.0 + math.log(terms[j + 1])
+        add(term, weight)
+        if len(term) >= 4:
+            padded = f"<{term}>"
+            for i in range(len(padded) - 2):
+                add("#" + padded[i:i + 3], weight * NGRAM_WEIGHT)
+    return np.array(dimensions, dtype=np.intp), np.array(weights, dtype=np.float32)
+
+def term_vector(terms: Sequence) -> np.ndarray:
+    """L2-normalized float32 vector of index_terms() output (all zeros for a text without terms)"""
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    dimensions, weights = _features(terms)
+    np.add.at(vector, dimensions, weights)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def quantize(vector: np.ndarray) -> bytes:
+    """A normalized vector as VECTOR_DIM int8 bytes (the stored row format)"""
+    return np.round(vector * 127).astype(np.int8).tobytes()
+
+def matrix_chunk_key(chunk: int, prefix: str = VECTOR_MATRIX_KEY) -> str:
+    return f"{prefix}:{chunk}"
+
+def chunk_count(rows: int) -> int:
+    """Matrix chunk keys holding rows rows"""
+    return -(-rows // VECTOR_CHUNK_ROWS)
+
+def queue_row_appends(pipe, first_row: int, rows: List[bytes], prefix: str = VECTOR_MATRIX_KEY) -> None:
+    """APPEND rows numbered from first_row to their chunk keys (one APPEND per chunk touched)"""
+    start = 0
+    while start < len(rows):
+        chunk, offset = divmod(first_row + start, VECTOR_CHUNK_ROWS)
+        end = min(len(rows), start + VECTOR_CHUNK_ROWS - offset)
+        pipe.append(matrix_chunk_key(chunk, prefix), b"".join(rows[start:end]))
+        start = end
+
+class VectorIndex:
+    """
+    In-process copy of the Redis vector matrix answering top-k cosine queries
+
+    Redis holds the rows (vectors:matrix:{n} chunks) and their message ids (vectors:ids);
+    this object mirrors them in a growing int8 array and only ever reads the
+    rows appended since the last sync. Scores are cosine similarities of the
+    quantized rows against the float query vector.
+    """
+
+    def __init__(self, ivf_lists: int = 0, nprobe: int = 8):
+        self.ivf_lists = ivf_lists
+        self.nprobe = nprobe
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    @classmethod
+    def from_env(cls) -> "VectorIndex":
+        """Build from VECTOR_IVF_LISTS (0 = exact search) / VECTOR_IVF_NPROBE"""
+        return cls(
+            ivf_lists=int(os.getenv('VECTOR_IVF_LISTS', 0)),
+            nprobe=int(os.getenv('VECTOR_IVF_NPROBE', 8))
+        )
+
+    def _reset(self, epoch: Optional[bytes]) -> None:
+        self.epoch = epoch
+        self.count = 0
+        self._matrix = np.zeros((0, VECTOR_DIM), dtype=np.int8)
+        self._ids: List[str] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._trained_rows = 0
+        self._training = False
+
+    # --- synchronization (queue on a binary pipeline, then apply the replies) ---
+
+    @staticmethod
+    def queue_sync_head(pipe) -> None:
+        """Replies: [epoch, row count]"""
+        pipe.hget(VECTOR_META_KEY, 'epoch')
+        pipe.llen(VECTOR_IDS_KEY)
+
+    def tail_range(self, replies: List) -> Optional[Tuple[int, int]]:
+        """Rows [start, end) to read, or None when up to date; a new epoch discards the local rows"""
+        epoch, length = replies
+        if epoch != self.epoch or length < self.count:
+            with self._lock:
+                self._reset(epoch)
+        return (self.count, length) if length > self.count else None
+
+    @staticmethod
+    def queue_tail_reads(pipe, start: int, end: int) -> None:
+        """Replies: [row bytes per chunk key..., ids]"""
+        row = start
+        while row < end:
+            chunk, offset = divmod(row, VECTOR_CHUNK_ROWS)
+            chunk_end = min(end, (chunk + 1) * VECTOR_CHUNK_ROWS)
+            pipe.getrange(matrix_chunk_key(chunk), offset * VECTOR_DIM, (offset + chunk_end - row) * VECTOR_DIM - 1)
+            row = chunk_end
+        pipe.lrange(VECTOR_IDS_KEY, start, end - 1)
+
+    def apply_tail(self, start: int, end: int, replies: List) -> None:
+        """Append the rows read by queue_tail_reads (ignored if another sync got there first)"""
+        data = b"".join(replies[:-1])
+        ids = [msg_id.decode() if isinstance(msg_id, bytes) else msg_id for msg_id in replies[-1]]
+        if len(data) != (end - start) * VECTOR_DIM or len(ids) != end - start:
+            return  # rebuilt between the two reads (the next sync starts over) or a chunk was evicted
+        rows = np.frombuffer(data, dtype=np.int8).reshape(-1, VECTOR_DIM)
+        with self._lock:
+            if start != self.count:
+                return
+            if end > len(self._matrix):
+                grown = np.zeros((max(end, 2 * len(self._matrix)), VECTOR_DIM), dtype=np.int8)
+                grown[:self.count] = self._matrix[:self.count]
+                self._matrix = grown
+            self._matrix[start:end] = rows
+            self._ids.extend(ids)
+            if self._centroids is not None:
+                self._assignments = np.concatenate([self._assignments, self._assign(rows)])
+            self.count = end
+
+    # --- search ---
+
+    def search(self, query: np.ndarray, limit: int,
+               exclude: Optional[str] = None) -> Tuple[int, List[Tuple[str, float]]]:
+        """(rows with a positive similarity among those scanned, [(message id, cosine)] best first)"""
+        with self._lock:
+            train = bool(self.ivf_lists) and not self._training \
+                and self.count >= self.ivf_lists * IVF_SAMPLE_PER_LIST and self.count >= 2 * self._trained_rows
+            if train:
+                self._training = True
+            snapshot = (self.epoch, self._matrix, self.count)
+        if train:
+            self._train_ivf(*snapshot)
+        with self._lock:
+            matrix, ids, count = self._matrix, self._ids, self.count
+            rows = self._probe_rows(query) if self._centroids is not None else None
+        if not count or not np.any(query):
+            return 0, []
+
+        if rows is None:
+            scores = np.empty(count, dtype=np.float32)
+            for start in range(0, count, VECTOR_BLOCK_ROWS):
+                end = min(count, start + VECTOR_BLOCK_ROWS)
+                scores[start:end] = matrix[start:end].astype(np.float32) @ query
+        else:
+            scores = np.empty(len(rows), dtype=np.float32)
+            for start in range(0, len(rows), VECTOR_BLOCK_ROWS):
+                block = rows[start:start + VECTOR_BLOCK_ROWS]
+                scores[start:start + len(block)] = matrix[block].astype(np.float32) @ query
+        scores /= 127
+        matches = int(np.count_nonzero(scores > 0))
+
+        k = min(limit + (1 if exclude else 0), len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind='stable')]
+        hits = []
+        for position in top:
+            row = int(position if rows is None else rows[position])
+            if scores[position] <= 0:
+                continue
+            if ids[row] == exclude:
+                matches -= 1
+                continue
+            hits.append((ids[row], float(scores[position])))
+        return matches, hits[:limit]
+
+    def _probe_rows(self, query: np.ndarray) -> np.ndarray:
+        """Rows in the nprobe lists whose centroids are closest to the query"""
+        nprobe = min(self.nprobe, len(self._centroids))
+        closest = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        return np.flatnonzero(np.isin(self._assignments, closest))
+
+    def _train_ivf(self, epoch: Optional[bytes], matrix: np.ndarray, count: int) -> None:
+        """
+        Spherical k-means on a sample of the first count rows, then assign every row to its closest centroid
+        Runs on a snapshot without the lock (rows below count never change, apply_tail only appends),
+        then swaps the lists in under it, assigning the rows appended meanwhile.
+        """
+        try:
+            rng = np.random.default_rng(0)
+            sample_size = min(count, self.ivf_lists * IVF_SAMPLE_PER_LIST)
+            sample = matrix[rng.choice(count, sample_size, replace=False)].astype(np.float32)
+            centroids = sample[rng.choice(sample_size, self.ivf_lists, replace=False)]
+            for _ in range(IVF_ITERATIONS):
+                labels = np.argmax(sample @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, labels, sample)
+                norms = np.linalg.norm(sums, axis=1, keepdims=True)
+                centroids = np.where(norms > 0, sums / np.maximum(norms, 1e-12), centroids)
+            assignments = np.concatenate([
+                self._assign(matrix[start:min(count, start + VECTOR_BLOCK_ROWS)], centroids)
+                for start in range(0, count, VECTOR_BLOCK_ROWS)
+            ])
+            with self._lock:
+                if self.epoch != epoch or self.count < count:
+                    return  # reset while training; the next search trains again
+                self._centroids = centroids
+                self._assignments = np.concatenate([assignments, self._assign(self._matrix[count:self.count])])
+                self._trained_rows = count
+        finally:
+            with self._lock:
+                self._training = False
+
+    def _assign(self, rows: np.ndarray, centroids: Optional[np.ndarray] = None) -> np.ndarray:
+        centroids = self._centroids if centroids is None else centroids
+        return np.argmax(rows.astype(np.float32) @ centroids.T, axis=1).astype(np.int32)
+
+    def stats(self) -> Dict[str, Any]:
+        """Local rows and the search mode (exact, or IVF lists / probes once trained)"""
+        trained = self._centroids is not None
+        return {
+            'rows': self.count,
+            'dimensions': VECTOR_DIM,
+            'mode': 'ivf' if trained else 'exact',
+            'ivf_lists': len(self._centroids) if trained else 0,
+            'nprobe': min(self.nprobe, len(self._centroids)) if trained else 0
+        }
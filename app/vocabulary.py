@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+技術用語辞書と Aho-Corasick マルチパターン照合
+- 語彙はバージョン付きファイル（tech_vocabulary.json）と Redis セット（vocabulary:terms / vocabulary:keywords）から起動時に読み込み
+- 照合コストは本文長に比例し、登録語数に依存しない（数千語規模まで拡張可能）
+- pyahocorasick があれば C 実装、なければ純 Python のオートマトンで同じ結果を返す
+"""
+
+import json
+import logging
+import os
+import string
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # optional dependency: falls back to the pure Python automaton
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOCABULARY_FILE = Path(__file__).with_name("tech_vocabulary.json")
+
+# Redis keys for vocabulary added at runtime (merged with the file at startup)
+VOCABULARY_TERMS_KEY = "vocabulary:terms"
+VOCABULARY_KEYWORDS_KEY = "vocabulary:keywords"
+VOCABULARY_VERSION_KEY = "vocabulary:version"
+
+# Length-preserving lowercase: only ASCII letters fold, so match offsets map back to the text
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_WORD_CHARS = frozenset(string.ascii_letters + string.digits + "_")
+
+# (canonical, is_keyword, case_sensitive, check_start, check_end)
+Entry = Tuple[str, bool, bool, bool, bool]
+
+
+class _PythonAutomaton:
+    """Aho-Corasick automaton with the subset of the pyahocorasick API used here"""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._outputs: List[List[Tuple[int, Any]]] = [[]]   # (key length, value)
+
+    def add_word(self, key: str, value: Any) -> None:
+        state = 0
+        for char in key:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append([])
+            state = next_state
+        self._outputs[state].append((len(key), value))
+
+    def make_automaton(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                self._outputs[next_state] = self._outputs[next_state] + self._outputs[self._fail[next_state]]
+
+    def iter(self, haystack: str) -> Iterator[Tuple[int, Any]]:
+        """(end index, value) for every occurrence of every key"""
+        goto, fail, outputs = self._goto, self._fail, self._outputs
+        state = 0
+        for index, char in enumerate(haystack):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for _, value in outputs[state]:
+                yield index, value
+
+
+def _is_ascii_word_char(char: str) -> bool:
+    return char in _WORD_CHARS
+
+
+class Vocabulary:
+    """
+    Dictionary of technical terms and key point keywords compiled into one automaton
+
+    terms match case-insensitively (ASCII) and only on ASCII word boundaries, so "API"
+    does not match inside "RAPID"; case_sensitive_terms must appear exactly as written;
+    keywords are case-sensitive substrings, as key point detection always used them.
+    """
+
+    def __init__(self, terms: Iterable[str] = (), case_sensitive_terms: Iterable[str] = (),
+                 keywords: Iterable[str] = (), version: str = "0"):
+        self.terms = sorted(set(terms))
+        self.case_sensitive_terms = sorted(set(case_sensitive_terms))
+        self.keywords = sorted(set(keywords))
+        self.version = str(version)
+        self.backend = "pyahocorasick" if ahocorasick is not None else "python"
+        self._automaton = self._build()
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None) -> "Vocabulary":
+        """Load VOCABULARY_FILE (default: tech_vocabulary.json next to this module)"""
+        path = Path(path or os.getenv('VOCABULARY_FILE') or DEFAULT_VOCABULARY_FILE)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(
+            terms=data.get("terms", []),
+            case_sensitive_terms=data.get("case_sensitive_terms", []),
+            keywords=data.get("keywords", []),
+            version=str(data.get("version", 0))
+        )
+
+    def extended(self, terms: Iterable[str] = (), keywords: Iterable[str] = (),
+                 revision: Optional[int] = None) -> "Vocabulary":
+        """A copy with extra terms/keywords (e.g. from Redis); revision is appended to the version"""
+        terms, keywords = list(terms), list(keywords)
+        if not terms and not keywords:
+            return self
+        return Vocabulary(
+            terms=self.terms + terms,
+            case_sensitive_terms=self.case_sensitive_terms,
+            keywords=self.keywords + keywords,
+            version=f"{self.version}+r{revision or 0}"
+        )
+
+    def spec(self) -> Dict[str, Any]:
+        """Plain (picklable) form, used to install the vocabulary in worker processes"""
+        return {
+            "terms": self.terms,
+            "case_sensitive_terms": self.case_sensitive_terms,
+            "keywords": self.keywords,
+            "version": self.version
+        }
+
+    def _build(self):
+        entries: Dict[str, List[Entry]] = {}
+
+        def add(word: str, is_keyword: bool, case_sensitive: bool) -> None:
+            if not word:
+                return
+            # Boundaries only matter where the word itself starts/ends with an ASCII word char
+            check_start = not is_keyword and _is_ascii_word_char(word[0])
+            check_end = not is_keyword and _is_ascii_word_char(word[-1])
+            entries.setdefault(word.translate(_ASCII_LOWER), []).append(
+                (word, is_keyword, case_sensitive, check_start, check_end)
+            )
+
+        for term in self.terms:
+            add(term, False, False)
+        for term in self.case_sensitive_terms:
+            add(term, False, True)
+        for keyword in self.keywords:
+            add(keyword, True, True)
+
+        automaton = ahocorasick.Automaton() if ahocorasick is not None else _PythonAutomaton()
+        for key, key_entries in entries.items():
+            automaton.add_word(key, tuple(key_entries))
+        if entries:
+            automaton.make_automaton()
+        return automaton if entries else None
+
+    def find(self, text: str) -> Tuple[List[Tuple[int, str]], List[Tuple[int, str]]]:
+        """(term hits, keyword hits) as (start position, canonical spelling), in text order"""
+        term_hits: List[Tuple[int, str]] = []
+        keyword_hits: List[Tuple[int, str]] = []
+        if self._automaton is None or not text:
+            return term_hits, keyword_hits
+
+        text_length = len(text)
+        for end, key_entries in self._automaton.iter(text.translate(_ASCII_LOWER)):
+            for canonical, is_keyword, case_sensitive, check_start, check_end in key_entries:
+                start = end - len(canonical) + 1
+                if case_sensitive and text[start:end + 1] != canonical:
+                    continue
+                if check_start and start > 0 and text[start - 1] in _WORD_CHARS:
+                    continue
+                if check_end and end + 1 < text_length and text[end + 1] in _WORD_CHARS:
+                    continue
+                (keyword_hits if is_keyword else term_hits).append((start, canonical))
+
+        # The automaton reports by end position; overlapping words can reorder starts
+        term_hits.sort()
+        keyword_hits.sort()
+        return term_hits, keyword_hits
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "terms": len(self.terms) + len(self.case_sensitive_terms),
+            "keywords": len(self.keywords),
+            "backend": self.backend
+        }
+
+
+_active_vocabulary: Optional[Vocabulary] = None
+
+
+def get_vocabulary() -> Vocabulary:
+    """The installed vocabulary, loading the vocabulary file on first use"""
+    global _active_vocabulary
+    if _active_vocabulary is None:
+        _active_vocabulary = Vocabulary.from_file()
+    return _active_vocabulary
+
+
+def install_vocabulary(vocabulary) -> Vocabulary:
+    """Make vocabulary (a Vocabulary or its spec()) the one used by text analysis"""
+    global _active_vocabulary
+    if isinstance(vocabulary, dict):
+        vocabulary = Vocabulary(**vocabulary)
+    _active_vocabulary = vocabulary
+    return vocabulary
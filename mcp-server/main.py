@@ -56,29 +56,22 @@ class EnhancedConversationAPI:
                                 topics: List[str] = None, keywords: List[str] = None) -> Dict[str, Any]:
         """记录增强对话"""
         try:
+            # Save both sides of the exchange in one batch request
             payload = {
-                "role": "user",
-                "content": user_msg,
-            "topics": topics or [],
-            "keywords": keywords or []
-        }
-        
-            # Save user message
-            user_response = await self.client.post(f"{self.base_url}/messages", json=payload)
-            user_response.raise_for_status()
-            
-            # Save assistant message
-            payload["role"] = "assistant"
-            payload["content"] = assistant_msg
-            
-            assistant_response = await self.client.post(f"{self.base_url}/messages", json=payload)
-            assistant_response.raise_for_status()
+                "messages": [
+                    {"role": "user", "content": user_msg, "topics": topics or [], "keywords": keywords or []},
+                    {"role": "assistant", "content": assistant_msg, "topics": topics or [], "keywords": keywords or []}
+                ]
+            }
+            response = await self.client.post(f"{self.base_url}/messages/batch", json=payload)
+            response.raise_for_status()
+            user_item, assistant_item = response.json()["items"]
             
             return {
-                "user_message_id": user_response.json().get("message_id"),
-                "assistant_message_id": assistant_response.json().get("message_id"),
-                "compression_ratio": assistant_response.json().get("compression_ratio", 0),
-                "bytes_saved": assistant_response.json().get("bytes_saved", 0),
+                "user_message_id": user_item.get("message_id"),
+                "assistant_message_id": assistant_item.get("message_id"),
+                "compression_ratio": assistant_item.get("compression_ratio", 0),
+                "bytes_saved": response.json().get("bytes_saved", 0),
                 "status": "saved"
             }
         except httpx.TimeoutException as e:
@@ -101,13 +94,15 @@ class EnhancedConversationAPI:
             logger.error(f"Error getting analytics: {e}")
             raise
 
-    async def get_context(self, limit: int = 5, detail_level: str = "medium", format_type: str = "narrative") -> Dict[str, Any]:
+    async def get_context(self, limit: int = 5, detail_level: str = "medium", format_type: str = "narrative",
+                          token_budget: Optional[int] = None) -> Dict[str, Any]:
         """获取适应性上下文"""
         try:
             payload = {
             "limit": limit,
             "detail_level": detail_level,
-            "format_type": format_type
+            "format_type": format_type,
+            "token_budget": token_budget
         }
             response = await self.client.post(f"{self.base_url}/context", json=payload)
             response.raise_for_status()
@@ -116,13 +111,30 @@ class EnhancedConversationAPI:
             logger.error(f"Error getting context: {e}")
             raise
 
-    async def search_conversations(self, query_terms: List[str], limit: int = 10, search_scope: str = "all") -> List[Dict[str, Any]]:
-        """搜索会话增强版"""
+    async def get_context_delta(self, since: Optional[str] = None, limit: int = 20, detail_level: str = "medium") -> Dict[str, Any]:
+        """获取游标之后的新消息（增量上下文）"""
+        try:
+            payload = {
+                "since": since,
+                "limit": limit,
+                "detail_level": detail_level
+            }
+            response = await self.client.post(f"{self.base_url}/context/delta", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error getting context delta: {e}")
+            raise
+
+    async def search_conversations(self, query_terms: Optional[List[str]] = None, limit: int = 10, search_scope: str = "all",
+                                   query: Optional[str] = None) -> List[Dict[str, Any]]:
+        """搜索会话增强版（query: AND/OR/NOT 布尔查询，替代 query_terms）"""
         try:
             payload = {
-            "query_terms": query_terms,
+            "query_terms": query_terms or [],
             "limit": limit,
-            "search_scope": search_scope
+            "search_scope": search_scope,
+            "query": query
         }
             response = await self.client.post(f"{self.base_url}/search", json=payload)
             response.raise_for_status()
@@ -131,6 +143,21 @@ class EnhancedConversationAPI:
             logger.error(f"Error searching conversations: {e}")
             raise
 
+    async def find_similar(self, text: Optional[str] = None, message_id: Optional[str] = None, limit: int = 10) -> Dict[str, Any]:
+        """相似消息检索（向量余弦相似度）"""
+        try:
+            payload = {
+                "text": text,
+                "message_id": message_id,
+                "limit": limit
+            }
+            response = await self.client.post(f"{self.base_url}/search/similar", json=payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            logger.error(f"Error finding similar messages: {e}")
+            raise
+
     async def save_message(self, role: str, content: str, topics: List[str] = None, keywords: List[str] = None) -> Dict[str, Any]:
         """保存消息增强版"""
         try:
@@ -247,10 +274,12 @@ async def get_analytics_tool() -> str:
         logger.error(f"Error getting analytics: {e}")
         return f"❌ Failed to get analytics: {str(e)}"
 
-async def get_context_tool(limit: int = 5, detail_level: str = "medium", format_type: str = "narrative") -> str:
+async def get_context_tool(limit: int = 5, detail_level: str = "medium", format_type: str = "narrative",
+                           token_budget: Optional[int] = None) -> str:
     """获取适应性上下文信息"""
     try:
-        context = await api.get_context(limit=limit, detail_level=detail_level, format_type=format_type)
+        context = await api.get_context(limit=limit, detail_level=detail_level, format_type=format_type,
+                                        token_budget=token_budget)
         
         context_text = context.get('context', '')
         compression_stats = context.get('compression_stats', {})
@@ -271,24 +300,60 @@ async def get_context_tool(limit: int = 5, detail_level: str = "medium", format_
         logger.error(f"Error getting context: {e}")
         return f"❌ Failed to get context: {str(e)}"
 
-async def search_conversations_tool(query_terms: List[str], limit: int = 10, search_scope: str = "all") -> str:
+async def get_context_delta_tool(since: Optional[str] = None, limit: int = 20, detail_level: str = "medium") -> str:
+    """获取增量上下文（仅返回游标之后的新消息）"""
+    try:
+        delta = await api.get_context_delta(since=since, limit=limit, detail_level=detail_level)
+        messages = delta.get('messages', [])
+        
+        response = f"🔄 Context Delta (Detail: {detail_level})\n\n"
+        response += f"🆕 New Messages: {len(messages)}"
+        if delta.get('has_more'):
+            response += f" ({delta.get('remaining', 0)} more, call again with the new cursor)"
+        response += "\n"
+        response += f"📍 Next Cursor: {delta.get('cursor')}\n"
+        
+        for msg in messages:
+            response += f"\n[{msg['role']}] {msg['timestamp']}\n{msg['content']}\n"
+        
+        tech_terms = [term for term, _ in delta.get('technical_terms', [])]
+        if tech_terms:
+            response += f"\n🔧 Top terms: {', '.join(tech_terms[:5])}\n"
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error getting context delta: {e}")
+        return f"❌ Failed to get context delta: {str(e)}"
+
+async def search_conversations_tool(query_terms: Optional[List[str]] = None, limit: int = 10, search_scope: str = "all",
+                                    query: Optional[str] = None) -> str:
     """搜索会话内容"""
     try:
-        results = await api.search_conversations(query_terms=query_terms, limit=limit, search_scope=search_scope)
+        results = await api.search_conversations(query_terms=query_terms, limit=limit, search_scope=search_scope, query=query)
         
         response = f"🔍 Search Results (Scope: {search_scope})\n\n"
+        if query:
+            response += f"🔎 Query: {query}\n"
         response += f"📊 Found {len(results)} conversations\n\n"
         
         for i, result in enumerate(results[:5], 1):  # Show top 5 results
             response += f"{i}. "
             if 'summary' in result:
                 response += f"{result['summary'][:100]}...\n"
+            elif 'summary_short' in result:
+                response += f"{result['summary_short'][:100]}...\n"
+                for point in result.get('key_points', [])[:2]:
+                    response += f"   • {point}\n"
             elif 'content' in result:
                 response += f"{result['content'][:100]}...\n"
             
             if 'technical_terms' in result and result['technical_terms']:
                 response += f"   🔧 Tech terms: {', '.join(result['technical_terms'][:3])}\n"
             
+            if 'score' in result:
+                response += f"   🎯 Relevance: {result['score']:.2f}\n"
+            
             if 'compression_ratio' in result and result['compression_ratio'] < 1.0:
                 savings = int((1 - result['compression_ratio']) * 100)
                 response += f"   💾 Compression: {savings}% savings\n"
@@ -304,6 +369,32 @@ async def search_conversations_tool(query_terms: List[str], limit: int = 10, sea
         logger.error(f"Error searching conversations: {e}")
         return f"❌ Failed to search conversations: {str(e)}"
 
+async def find_similar_tool(text: Optional[str] = None, message_id: Optional[str] = None, limit: int = 10) -> str:
+    """查找相似的会话消息"""
+    try:
+        similar = await api.find_similar(text=text, message_id=message_id, limit=limit)
+        results = similar.get('results', [])
+        
+        response = "🧭 Similar Messages\n\n"
+        if message_id:
+            response += f"📌 Similar to message: {message_id}\n"
+        response += f"📊 Found {len(results)} of {similar.get('matches', 0)} related messages\n\n"
+        
+        for i, result in enumerate(results[:5], 1):  # Show top 5 results
+            response += f"{i}. [{result.get('id', '')}] {result.get('content', '')[:100]}...\n"
+            if result.get('technical_terms'):
+                response += f"   🔧 Tech terms: {', '.join(result['technical_terms'][:3])}\n"
+            response += f"   🎯 Similarity: {result.get('score', 0):.2f}\n\n"
+        
+        if len(results) > 5:
+            response += f"... and {len(results) - 5} more results\n"
+        
+        return response
+        
+    except Exception as e:
+        logger.error(f"Error finding similar messages: {e}")
+        return f"❌ Failed to find similar messages: {str(e)}"
+
 async def save_message_tool(role: str, content: str, topics: Optional[List[str]] = None, keywords: Optional[List[str]] = None) -> str:
     """保存消息到系统"""
     try:
@@ -436,7 +527,21 @@ MCP_TOOLS = {
             "properties": {
                 "limit": {"type": "integer", "description": "Number of context items to retrieve", "default": 5},
                 "detail_level": {"type": "string", "enum": ["short", "medium", "full", "adaptive"], "description": "Level of detail for context", "default": "medium"},
-                "format_type": {"type": "string", "enum": ["narrative", "bullet", "structured"], "description": "Format type for context", "default": "narrative"}
+                "format_type": {"type": "string", "enum": ["narrative", "bullet", "structured"], "description": "Format type for context", "default": "narrative"},
+                "token_budget": {"type": "integer", "description": "Optional token budget for the messages; overrides detail_level by choosing full/medium/short per message"}
+            },
+            "required": []
+        }
+    },
+    "get_context_delta_tool": {
+        "function": get_context_delta_tool,
+        "description": "Retrieve only the messages added since a cursor returned by a previous call (omit since on the first call)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "since": {"type": "string", "description": "Cursor from the previous call (message id) or a timeline score"},
+                "limit": {"type": "integer", "description": "Maximum number of new messages", "default": 20},
+                "detail_level": {"type": "string", "enum": ["short", "medium", "full", "adaptive"], "description": "Level of detail for context", "default": "medium"}
             },
             "required": []
         }
@@ -447,11 +552,25 @@ MCP_TOOLS = {
         "inputSchema": {
             "type": "object",
             "properties": {
-                "query_terms": {"type": "array", "items": {"type": "string"}, "description": "Search terms to find"},
+                "query_terms": {"type": "array", "items": {"type": "string"}, "description": "Search terms to find (matches any of them)"},
+                "query": {"type": "string", "description": "Boolean query instead of query_terms (not for fulltext/summaries/similar), e.g. redis AND (docker OR kubernetes) NOT legacy; operators are uppercase, quote tags with spaces"},
                 "limit": {"type": "integer", "description": "Maximum number of results", "default": 10},
-                "search_scope": {"type": "string", "enum": ["all", "technical", "topics", "summaries"], "description": "Search scope", "default": "all"}
+                "search_scope": {"type": "string", "enum": ["all", "technical", "topics", "summaries", "fulltext", "similar"], "description": "Search scope; fulltext ranks message bodies and summaries ranks summaries/key points by BM25 relevance (summaries returns summaries only, a much smaller payload); similar ranks bodies by vector similarity to the terms", "default": "all"}
             },
-            "required": ["query_terms"]
+            "required": []
+        }
+    },
+    "find_similar_tool": {
+        "function": find_similar_tool,
+        "description": "Find messages similar to a text or to a stored message (cosine similarity of term vectors, no exact word match needed)",
+        "inputSchema": {
+            "type": "object",
+            "properties": {
+                "text": {"type": "string", "description": "Text to find similar messages for"},
+                "message_id": {"type": "string", "description": "Stored message to find similar messages for (instead of text)"},
+                "limit": {"type": "integer", "description": "Maximum number of results", "default": 10}
+            },
+            "required": []
         }
     },
     "save_message_tool": {
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+テキスト解析ベンチマーク：旧実装（メソッドごとに複数回の re 走査）と単一パス解析器の比較
+- 既定の入力はリポジトリ直下の llms-full.txt
+- 全文1件と、段落単位のメッセージ群（通常の会話メッセージ相当）の両方で計測
+
+Usage: python scripts/benchmark_text_analyzer.py [path] [--repeat N]
+"""
+
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "app"))
+
+from conversation_redis_manager import SmartTextProcessor  # noqa: E402
+
+
+class LegacyTextProcessor:
+    """Extraction methods as they were before the single-pass analyzer (kept for comparison)"""
+
+    @staticmethod
+    def generate_summary_short(text):
+        if len(text) <= 150:
+            return text
+        sentences = re.split(r'[.。!！?？\n]', text)
+        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 20]
+        if meaningful_sentences:
+            summary = meaningful_sentences[0]
+            if len(summary) > 150:
+                words = summary.split()
+                truncated = ""
+                for word in words:
+                    if len(truncated + word + " ") <= 147:
+                        truncated += word + " "
+                    else:
+                        break
+                summary = truncated.strip() + "..."
+            elif len(summary) < 80 and len(meaningful_sentences) > 1:
+                additional = meaningful_sentences[1]
+                if len(summary + " " + additional) <= 150:
+                    summary += " " + additional
+                else:
+                    remaining_space = 147 - len(summary + " ")
+                    if remaining_space > 10:
+                        summary += " " + additional[:remaining_space] + "..."
+        else:
+            summary = text[:147].rsplit(' ', 1)[0] + "..." if len(text) > 150 else text
+        return summary
+
+    @staticmethod
+    def generate_summary_medium(text):
+        if len(text) <= 400:
+            return text
+        sentences = re.split(r'[.。!！?？]', text)
+        meaningful_sentences = [s.strip() for s in sentences if len(s.strip()) > 10]
+        summary = ""
+        for sentence in meaningful_sentences:
+            if len(summary + sentence + "。") <= 300:
+                summary += sentence + "。"
+            else:
+                break
+        remaining_text = text[len(summary):]
+        tech_patterns = [
+            r'\b[A-Z][a-z]*[A-Z][a-zA-Z]*\b',
+            r'\b[A-Z]{2,}\b',
+            r'\b\w+\.[a-z]+\b',
+            r'(?:Docker|Kubernetes|Redis|PostgreSQL|MySQL|MongoDB|AWS|Azure|GCP|GoogleCloud|Terraform|FastAPI|React|Vue|Angular)',
+            r'(?:システム|データベース|サーバー|API|エラー|実装|設定|最適化|解決)'
+        ]
+        tech_terms = set()
+        for pattern in tech_patterns:
+            matches = re.findall(pattern, remaining_text, re.IGNORECASE)
+            tech_terms.update(matches[:5])
+        if tech_terms and len(summary) < 350:
+            tech_info = " [技術要素: " + ", ".join(list(tech_terms)[:3]) + "]"
+            if len(summary + tech_info) <= 400:
+                summary += tech_info
+        return summary if summary else text[:397] + "..."
+
+    @staticmethod
+    def extract_key_points(text):
+        points = []
+        numbered_items = re.findall(r'(?:^|\n)\s*[0-9]+\.\s*([^.。\n]+[.。]?)', text, re.MULTILINE)
+        points.extend([item.strip() for item in numbered_items[:5]])
+        bullet_patterns = [
+            r'(?:^|\n)\s*[•\-\*]\s*([^.。\n]+)',
+            r'(?:^|\n)\s*-\s+([^.。\n]+)',
+            r'(?:^|\n)\s*\*\s+([^.。\n]+)'
+        ]
+        for pattern in bullet_patterns:
+            bullet_items = re.findall(pattern, text, re.MULTILINE)
+            points.extend([item.strip() for item in bullet_items[:3]])
+        important_keywords = [
+            '実装', '解決', '課題', '改善', '最適化', '設計', 'エラー', '修正',
+            '構築', '開発', '導入', '設定', '統合', 'デプロイ', 'システム',
+            'データベース', 'API', 'フレームワーク', 'インフラ', 'セキュリティ'
+        ]
+        sentences = re.split(r'[.。!！]', text)
+        for sentence in sentences:
+            if any(keyword in sentence for keyword in important_keywords):
+                if 10 < len(sentence.strip()) < 120:
+                    points.append(sentence.strip())
+        return list(set(points))[:8]
+
+    @staticmethod
+    def extract_technical_terms(text):
+        tech_patterns = [
+            r'\b[A-Z][a-z]*[A-Z][a-zA-Z]*\b',
+            r'\b[A-Z]{2,}\b',
+            r'\b\w+\.(js|py|java|go|rs|cpp|hpp|ts|jsx|tsx)\b',
+            r'\b(?:API|SDK|CLI|GPU|CPU|RAM|SSD|HDD|HTTP|HTTPS|TCP|UDP|SSL|TLS|JWT)\b',
+            r'\b(?:Docker|Kubernetes|Redis|PostgreSQL|MySQL|MongoDB|SQLite|MariaDB)\b',
+            r'\b(?:AWS|Azure|GCP|GoogleCloud|Terraform|Ansible|Jenkins|GitHub|GitLab)\b',
+            r'\b(?:React|Vue|Angular|FastAPI|Django|Flask|Spring|Express|Laravel)\b',
+            r'\b(?:Node\.js|Python|JavaScript|TypeScript|Java|C\+\+|Rust|Go)\b',
+            r'\b(?:Linux|Ubuntu|CentOS|Docker|Container|Microservice)\b'
+        ]
+        terms = set()
+        for pattern in tech_patterns:
+            matches = re.findall(pattern, text, re.IGNORECASE)
+            terms.update(matches)
+        jp_tech_terms = re.findall(r'(?:システム|データベース|サーバー|クライアント|フレームワーク|ライブラリ|アルゴリズム|アーキテクチャ|インフラ|セキュリティ|最適化)', text)
+        terms.update(jp_tech_terms)
+        return list(terms)[:12]
+
+    @staticmethod
+    def analyze(text):
+        return {
+            'summary_short': LegacyTextProcessor.generate_summary_short(text),
+            'summary_medium': LegacyTextProcessor.generate_summary_medium(text),
+            'key_points': LegacyTextProcessor.extract_key_points(text),
+            'technical_terms': LegacyTextProcessor.extract_technical_terms(text)
+        }
+
+
+def measure(func, texts, repeat):
+    """Best-of-repeat wall time in ms for running func over all texts"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            func(text)
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark SmartTextProcessor against the legacy regex passes")
+    parser.add_argument("path", nargs="?", default=str(PROJECT_ROOT / "llms-full.txt"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = Path(args.path).read_text(encoding="utf-8")
+    messages = [block for block in text.split("\n\n") if block.strip()]
+    workloads = [
+        (f"whole file ({len(text):,} chars)", [text]),
+        (f"paragraphs ({len(messages):,} messages)", messages)
+    ]
+
+    print(f"{'workload':<34} {'legacy ms':>10} {'single-pass ms':>15} {'speedup':>8}")
+    for name, texts in workloads:
+        legacy_best, _ = measure(LegacyTextProcessor.analyze, texts, args.repeat)
+        current_best, _ = measure(SmartTextProcessor.analyze, texts, args.repeat)
+        print(f"{name:<34} {legacy_best:>10.1f} {current_best:>15.1f} {legacy_best / current_best:>7.1f}x")
+
+    # Per-method breakdown on the whole file (each method rescans when called on its own)
+    print()
+    print(f"{'method (whole file)':<34} {'legacy ms':>10} {'standalone ms':>15}")
+    for method in ("generate_summary_short", "generate_summary_medium", "extract_key_points", "extract_technical_terms"):
+        legacy_best, _ = measure(getattr(LegacyTextProcessor, method), [text], args.repeat)
+        current_best, _ = measure(getattr(SmartTextProcessor, method), [text], args.repeat)
+        print(f"{method:<34} {legacy_best:>10.1f} {current_best:>15.1f}")
+
+    current = SmartTextProcessor.analyze(text)
+    print()
+    print(f"technical terms: {current['technical_terms']}")
+    print(f"key points: {len(current['key_points'])}")
+
+
+if __name__ == "__main__":
+    main()
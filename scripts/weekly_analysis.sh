@@ -21,6 +21,20 @@ curl -s http://localhost:8000/analytics | jq -r '.top_topics[] |
 ' | head -10
 echo ""
 
+# 過去7日間の活動（/timeline をカーソルでページング、1ページ500件）
+echo "## 🗓️ 過去7日間の日別メッセージ数"
+WEEK_START=$(date -d '7 days ago' '+%Y-%m-%dT%H:%M:%S' 2>/dev/null || date -v-7d '+%Y-%m-%dT%H:%M:%S')
+PAGE_ARGS=(--data-urlencode "start=$WEEK_START")
+while :; do
+  PAGE=$(curl -s -G http://localhost:8000/timeline "${PAGE_ARGS[@]}" \
+    --data-urlencode "fields=role,timestamp" --data-urlencode "limit=500")
+  echo "$PAGE" | jq -r '.messages[] | "\(.timestamp[0:10]) \(.role)"'
+  CURSOR=$(echo "$PAGE" | jq -r '.next_cursor // empty')
+  [ -z "$CURSOR" ] && break
+  PAGE_ARGS=(--data-urlencode "cursor=$CURSOR")
+done | sort | uniq -c | awk '{printf "%s %s: %d件\n", $2, $3, $1}'
+echo ""
+
 # 最新コンテキスト
 echo "## 💭 最新の議論コンテキスト"
 curl -X POST http://localhost:8000/context \